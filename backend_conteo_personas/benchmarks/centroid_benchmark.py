@@ -0,0 +1,94 @@
+# backend_conteo_personas/benchmarks/centroid_benchmark.py
+#
+# Mide el coste de CentroidTracker.update (asociación "dense" y "grid") con entre
+# 10 y 500 objetos simultáneos.
+# La densidad de la escena se mantiene constante (el área crece con el número de
+# personas) y en cada frame se pierde un pequeño porcentaje de detecciones.
+#
+# Uso (desde backend_conteo_personas/):
+#   python benchmarks/centroid_benchmark.py --objects 10 50 100 250 500
+#
+# Resultados de referencia forzando la rejilla (--grid-min-pairs 0, 200 frames),
+# ms p50 por update:
+#
+#   objetos    10     50    100    200    250    300    400    500
+#   dense    0.05   0.12   0.26   0.86   1.44   2.62   3.81   6.87
+#   grid     0.72   1.01   0.91   1.42   2.36   2.83   2.49   2.82
+#
+# La rejilla solo compensa a partir de ~350 objetos, de ahí el umbral
+# GRID_MIN_PAIRS = 350 x 350 parejas: por debajo, "grid" usa la matriz completa.
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tracker.centroidtracker import CentroidTracker, GRID_MIN_PAIRS
+
+
+def parse_arguments():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", "--objects", type=int, nargs="+", default=[10, 50, 100, 250, 500],
+        help="número de objetos simultáneos")
+    ap.add_argument("-f", "--frames", type=int, default=300,
+        help="frames simulados por escenario")
+    ap.add_argument("-d", "--max-distance", type=int, default=50,
+        help="distancia máxima de asociación del tracker")
+    ap.add_argument("-a", "--association", nargs="+", default=["dense", "grid"],
+        help="modos de asociación a comparar")
+    ap.add_argument("--grid-min-pairs", type=int, default=GRID_MIN_PAIRS,
+        help="parejas (objetos x detecciones) a partir de las que 'grid' deja la matriz completa; 0 fuerza la rejilla")
+    ap.add_argument("--miss-rate", type=float, default=0.05,
+        help="fracción de detecciones perdidas por frame")
+    ap.add_argument("--seed", type=int, default=42)
+    return vars(ap.parse_args())
+
+
+def run_scenario(objects, frames, max_distance, miss_rate, seed, association="dense",
+                 grid_min_pairs=GRID_MIN_PAIRS):
+    rng = np.random.default_rng(seed)
+    side = 60.0 * np.sqrt(objects)
+    position = rng.uniform(0, side, size=(objects, 2))
+    velocity = rng.uniform(-3, 3, size=(objects, 2))
+    ct = CentroidTracker(maxDisappeared=40, maxDistance=max_distance, association=association,
+                         gridMinPairs=grid_min_pairs)
+
+    times = np.empty(frames)
+    for i in range(frames):
+        position += velocity
+        bounced = (position < 0) | (position > side)
+        velocity[bounced] *= -1
+        np.clip(position, 0, side, out=position)
+        visible = position[rng.random(objects) >= miss_rate]
+        rects = np.hstack([visible - [10, 20], visible + [10, 20]])
+
+        start = time.perf_counter()
+        ct.update(rects)
+        times[i] = time.perf_counter() - start
+
+    return {
+        "ms_p50": 1000.0 * np.percentile(times, 50),
+        "ms_p95": 1000.0 * np.percentile(times, 95),
+        "fps": frames / times.sum(),
+        "ids": ct.nextObjectID,
+    }
+
+
+def main():
+    args = parse_arguments()
+    print(f"{'modo':<6} {'objetos':>8} {'ms p50':>10} {'ms p95':>10} {'FPS':>10} {'IDs':>8}")
+    for objects in args["objects"]:
+        for association in args["association"]:
+            result = run_scenario(objects, args["frames"], args["max_distance"],
+                                  args["miss_rate"], args["seed"], association,
+                                  args["grid_min_pairs"])
+            print(f"{association:<6} {objects:>8} {result['ms_p50']:>10.3f} {result['ms_p95']:>10.3f} "
+                  f"{result['fps']:>10.1f} {result['ids']:>8}")
+
+
+if __name__ == "__main__":
+    main()
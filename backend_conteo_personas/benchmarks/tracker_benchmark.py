@@ -0,0 +1,129 @@
+# backend_conteo_personas/benchmarks/tracker_benchmark.py
+#
+# Compara los motores de seguimiento ("dlib" y "kalman") sobre una escena
+# sintética con N personas en movimiento. Mide los FPS del paso de seguimiento
+# (los frames entre detecciones) y el IoU medio contra las posiciones reales.
+# Las detecciones se pueden degradar con ruido en las cajas (--noise) y con
+# personas no detectadas (--miss-rate), como las de un detector real.
+#
+# Uso (desde backend_conteo_personas/):
+#   python benchmarks/tracker_benchmark.py --people 5 20 50
+#   python benchmarks/tracker_benchmark.py --engines kalman --noise 4 --miss-rate 0.1 --skip-frames 30 10
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detector.postprocess import box_iou
+from people_counter_service import TRACKER_ENGINES, create_tracker_set
+
+
+def parse_arguments():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", "--people", type=int, nargs="+", default=[5, 20, 50],
+        help="número de personas en la escena")
+    ap.add_argument("-e", "--engines", nargs="+", default=list(TRACKER_ENGINES),
+        help="motores de seguimiento a comparar")
+    ap.add_argument("-f", "--frames", type=int, default=300,
+        help="frames simulados por escenario")
+    ap.add_argument("-s", "--skip-frames", type=int, nargs="+", default=[30],
+        help="frames entre detecciones (p. ej. 30 10 5)")
+    ap.add_argument("--noise", type=float, default=0.0,
+        help="desviación típica (px) del ruido de las cajas detectadas")
+    ap.add_argument("--miss-rate", type=float, default=0.0,
+        help="probabilidad de que una persona no se detecte en un frame de detección")
+    ap.add_argument("-t", "--tracker-threads", type=int, nargs="+", default=[1],
+        help="hilos para las actualizaciones de dlib (p. ej. 1 2 4 8)")
+    ap.add_argument("--seed", type=int, default=42)
+    return vars(ap.parse_args())
+
+
+class SyntheticScene:
+    """Personas (rectángulos texturizados) que se mueven en línea recta y rebotan en los bordes."""
+
+    def __init__(self, people, W=500, H=375, seed=42):
+        rng = np.random.default_rng(seed)
+        self.W, self.H = W, H
+        self.size = np.array([30, 70])
+        self.position = rng.uniform([0, 0], [W - 30, H - 70], size=(people, 2))
+        self.velocity = rng.uniform(-3, 3, size=(people, 2))
+        self.patches = rng.integers(0, 256, size=(people, 70, 30, 3), dtype=np.uint8)
+        self.background = rng.integers(0, 60, size=(H, W, 3), dtype=np.uint8)
+        self.frame = np.empty_like(self.background)
+
+    def boxes(self):
+        start = self.position.astype(int)
+        return np.hstack([start, start + self.size])
+
+    def step(self):
+        self.position += self.velocity
+        limit = np.array([self.W, self.H]) - self.size
+        bounced = (self.position < 0) | (self.position > limit)
+        self.velocity[bounced] *= -1
+        np.clip(self.position, 0, limit, out=self.position)
+
+        np.copyto(self.frame, self.background)
+        for (patch, (x, y)) in zip(self.patches, self.position.astype(int)):
+            self.frame[y:y + 70, x:x + 30] = patch
+        return self.frame
+
+
+def detect(truth, rng, noise=0.0, miss_rate=0.0):
+    """Detecciones simuladas: las cajas reales con ruido y sin las personas perdidas."""
+    boxes = truth + np.rint(rng.normal(0.0, noise, size=truth.shape)).astype(int) if noise else truth
+    return boxes[rng.random(len(boxes)) >= miss_rate]
+
+
+def run_scenario(engine, people, frames, skip_frames, seed, threads=1, noise=0.0, miss_rate=0.0):
+    scene = SyntheticScene(people, seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    trackers = create_tracker_set({"tracker_engine": engine, "tracker_threads": threads})
+    track_time = 0.0
+    track_frames = 0
+    ious = []
+
+    for i in range(frames):
+        rgb = scene.step()
+        truth = scene.boxes()
+        if i % skip_frames == 0:
+            # Sin ruido ni pérdidas la "detección" es la posición real, para aislar
+            # el coste del seguimiento
+            trackers.reconcile(rgb, detect(truth, rng, noise, miss_rate))
+            continue
+
+        start = time.perf_counter()
+        trackers.update(rgb)
+        track_time += time.perf_counter() - start
+        track_frames += 1
+
+        if len(trackers) > 0:
+            ious.append(box_iou(trackers.boxes, truth).max(axis=1).mean())
+
+    return {
+        "fps": track_frames / track_time if track_time > 0 else float("inf"),
+        "ms_per_frame": 1000.0 * track_time / max(track_frames, 1),
+        "mean_iou": float(np.mean(ious)) if ious else 0.0,
+    }
+
+
+def main():
+    args = parse_arguments()
+    print(f"{'motor':<8} {'hilos':>6} {'personas':>8} {'skip':>5} {'FPS':>10} {'ms/frame':>10} {'IoU medio':>10}")
+    for people in args["people"]:
+        for skip_frames in args["skip_frames"]:
+            for engine in args["engines"]:
+                # Los hilos solo afectan al motor dlib
+                for threads in (args["tracker_threads"] if engine == "dlib" else [1]):
+                    result = run_scenario(engine, people, args["frames"], skip_frames,
+                                          args["seed"], threads, args["noise"], args["miss_rate"])
+                    print(f"{engine:<8} {threads:>6} {people:>8} {skip_frames:>5} {result['fps']:>10.1f} "
+                          f"{result['ms_per_frame']:>10.3f} {result['mean_iou']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
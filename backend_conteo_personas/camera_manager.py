@@ -0,0 +1,212 @@
+# backend_conteo_personas/camera_manager.py
+
+import datetime
+import logging
+import os
+import threading
+import time
+
+from detector.pool import DetectionPool
+from detector.batching import BatchingDetector
+from people_counter_service import PeopleCounterService, get_current_config_from_file
+
+logger = logging.getLogger(__name__)
+
+# Identificador de la cámara definida por la "url" principal de config.json
+DEFAULT_CAMERA_ID = "0"
+
+
+def camera_configs(base_config: dict) -> dict:
+    """
+    Devuelve la configuración efectiva de cada cámara, indexada por su ID.
+    La cámara por defecto usa la "url" principal; las de la lista "cameras"
+    heredan la configuración global y sobrescriben lo que definan.
+    """
+    cameras = {}
+    base = {k: v for k, v in base_config.items() if k != "cameras"}
+    if base.get("url"):
+        cameras[DEFAULT_CAMERA_ID] = dict(base)
+    for camera in base_config.get("cameras", []):
+        camera_id = str(camera.get("id", ""))
+        if not camera_id:
+            logger.warning("Cámara sin 'id' en config.json, se ignora.")
+            continue
+        merged = dict(base)
+        merged.update(camera)
+        cameras[camera_id] = merged
+    return cameras
+
+
+class CameraSession:
+    """Estado de una cámara: su servicio de conteo, su hilo y sus contadores."""
+
+    def __init__(self, camera_id: str, config: dict):
+        self.camera_id = camera_id
+        self.config = config
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.service = None
+        self.thread = None
+        self.counts = {
+            "totalUp": 0,
+            "totalDown": 0,
+            "totalInside": 0,
+            "status": "Inactivo",
+            "last_update": None,
+        }
+
+    def update_counts(self, total_up, total_down, total_inside, status):
+        # Callback llamado desde el hilo de conteo de esta cámara
+        with self.lock:
+            self.counts["totalUp"] = total_up
+            self.counts["totalDown"] = total_down
+            self.counts["totalInside"] = total_inside
+            self.counts["status"] = status
+            self.counts["last_update"] = datetime.datetime.now().isoformat()
+
+    def set_status(self, status):
+        with self.lock:
+            self.counts["status"] = status
+            self.counts["last_update"] = datetime.datetime.now().isoformat()
+
+    def get_counts(self):
+        with self.lock:
+            return dict(self.counts)
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+
+class CameraManager:
+    """
+    Gestiona N pipelines de PeopleCounterService en un mismo proceso.
+    Todas las cámaras comparten un pool de detección con un modelo por cámara configurada
+    (acotado al número de núcleos), en lugar de cargar un modelo por hilo de cámara.
+    """
+
+    def __init__(self, config_loader=get_current_config_from_file):
+        self.config_loader = config_loader
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.pool = None
+
+    def _get_pool(self, config: dict):
+        if self.pool is None:
+            batching = config.get("batching", {})
+            if batching.get("enabled", False):
+                # Un único modelo que agrupa las peticiones de todas las cámaras en lotes
+                self.pool = BatchingDetector(config.get("detector", {}),
+                                             maxBatch=batching.get("max_batch", 8),
+                                             maxWaitMs=batching.get("max_wait_ms", 10))
+                logger.info(f"Detección por lotes entre cámaras (lote máximo {self.pool.maxBatch}).")
+            else:
+                # Un worker (un modelo) por cámara configurada, sin pasar del número de núcleos,
+                # salvo que "detection_workers" lo fije; cada worker usa su parte de los núcleos
+                workers = config.get("detection_workers") or min(
+                    max(1, len(camera_configs(config))), os.cpu_count() or 1)
+                self.pool = DetectionPool(config.get("detector", {}), workers=workers)
+                logger.info(f"Pool de detección compartido con {self.pool.workers} workers "
+                            f"de {self.pool.settings['threads']} hilos.")
+        return self.pool
+
+    def warmup(self):
+        """Crea el pool de detección y carga un detector por worker."""
+        return self._get_pool(self.config_loader()).warmup()
+
+    def list_cameras(self):
+        configured = camera_configs(self.config_loader())
+        with self.lock:
+            ids = sorted(set(configured) | set(self.sessions))
+            return [{
+                "id": camera_id,
+                "url": configured.get(camera_id, {}).get("url"),
+                "running": camera_id in self.sessions and self.sessions[camera_id].is_running(),
+            } for camera_id in ids]
+
+    def start(self, camera_id: str = DEFAULT_CAMERA_ID):
+        """
+        Inicia el conteo de una cámara. Devuelve la latencia de arranque, si los detectores
+        del pool ya estaban cargados (`model_cache_hit`) y el tiempo de carga del modelo.
+        """
+        config = self.config_loader()
+        cameras = camera_configs(config)
+        if camera_id not in cameras:
+            raise KeyError(f"Cámara '{camera_id}' no configurada en utils/config.json.")
+
+        with self.lock:
+            session = self.sessions.get(camera_id)
+            if session is not None and session.is_running():
+                return {"camera_id": camera_id, "already_running": True}
+
+            start = time.perf_counter()
+            # Los detectores del pool se cargan antes de arrancar: sin caché el arranque
+            # incluye la carga del modelo, con caché solo el servicio
+            pool = self._get_pool(config)
+            model = pool.warmup()
+            session = CameraSession(camera_id, cameras[camera_id])
+            session.service = PeopleCounterService(
+                camera_url=session.config["url"],
+                update_callback=session.update_counts,
+                stop_event=session.stop_event,
+                current_config=session.config,
+                camera_id=camera_id,
+                detection_pool=pool,
+            )
+            session.thread = threading.Thread(target=session.service.run,
+                                              name=f"camera-{camera_id}", daemon=True)
+            session.thread.start()
+            session.set_status("Iniciando...")
+            self.sessions[camera_id] = session
+
+        return {
+            "camera_id": camera_id,
+            "already_running": False,
+            "start_latency_ms": round((time.perf_counter() - start) * 1000, 2),
+            "model_cache_hit": model["model_cache_hit"],
+            "model_load_ms": model["model_load_ms"],
+        }
+
+    def stop(self, camera_id: str = DEFAULT_CAMERA_ID, timeout: float = 10):
+        """Detiene el conteo de una cámara. Devuelve False si no estaba activa."""
+        with self.lock:
+            session = self.sessions.get(camera_id)
+        if session is None or not session.is_running():
+            return False
+
+        logger.info(f"Solicitando detener el hilo de conteo de la cámara {camera_id}...")
+        session.stop_event.set()
+        session.thread.join(timeout=timeout)
+        if session.thread.is_alive():
+            raise RuntimeError(f"No se pudo detener la cámara {camera_id} de forma limpia.")
+        session.set_status("Detenido")
+        return True
+
+    def stop_all(self):
+        with self.lock:
+            ids = list(self.sessions)
+        for camera_id in ids:
+            self.stop(camera_id)
+
+    def is_running(self, camera_id: str = DEFAULT_CAMERA_ID):
+        with self.lock:
+            session = self.sessions.get(camera_id)
+        return session is not None and session.is_running()
+
+    def counts(self, camera_id: str = DEFAULT_CAMERA_ID):
+        with self.lock:
+            session = self.sessions.get(camera_id)
+        if session is None:
+            return {"totalUp": 0, "totalDown": 0, "totalInside": 0,
+                    "status": "Inactivo", "last_update": None}
+        return session.get_counts()
+
+    def metrics(self, camera_id: str = None):
+        with self.lock:
+            sessions = dict(self.sessions)
+        if camera_id is not None:
+            session = sessions.get(camera_id)
+            return session.service.get_metrics() if session is not None else None
+        return {
+            "detection_pool": self.pool.stats() if self.pool is not None else None,
+            "cameras": {cid: s.service.get_metrics() for cid, s in sessions.items()},
+        }
@@ -0,0 +1,91 @@
+# import the necessary packages
+from detector.postprocess import box_iou
+from scipy.optimize import linear_sum_assignment
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+def follow_motion(boxes, before, after, iouThreshold=0.3):
+	# shift detections made on an older frame by the motion of the
+	# tracks they overlap: `before` and `after` are the (N, 4) track
+	# boxes on the detection frame and on the current one, row for row.
+	# Detections without a matching track, or all of them when the
+	# tracks changed in between, are returned unchanged
+	boxes = np.asarray(boxes, dtype=int).reshape(-1, 4)
+	before = np.asarray(before, dtype=int).reshape(-1, 4)
+	after = np.asarray(after, dtype=int).reshape(-1, 4)
+	if len(boxes) == 0 or len(before) == 0 or before.shape != after.shape:
+		return boxes
+	iou = box_iou(before, boxes)
+	(rows, cols) = linear_sum_assignment(-iou)
+	matched = iou[rows, cols] >= iouThreshold
+	shifted = boxes.copy()
+	shifted[cols[matched]] += after[rows[matched]] - before[rows[matched]]
+	return shifted
+
+class AsyncDetector:
+	def __init__(self, detect, executor=None, camera=None, maxAge=None,
+		iouThreshold=0.3):
+		# store the detection function (frame -> (N, 4) boxes) and the
+		# executor running it -- a shared detection pool if given,
+		# otherwise a private single background worker. Either way at
+		# most one detection per camera is in flight at any time
+		self.detect = detect
+		self.camera = camera
+
+		# a result more than `maxAge` frames old is dropped, a younger
+		# one is moved along with the tracks it overlaps
+		self.maxAge = maxAge
+		self.iouThreshold = iouThreshold
+		self.trackBoxes = None
+		self.ownsExecutor = executor is None
+		if executor is None:
+			executor = ThreadPoolExecutor(max_workers=1,
+				thread_name_prefix="detector")
+		self.executor = executor
+		self.future = None
+		self.frameIndex = None
+
+	@property
+	def busy(self):
+		# a detection has been submitted and its result not collected
+		return self.future is not None
+
+	def submit(self, frame, frameIndex, trackBoxes=None):
+		# run the detector against a snapshot of the frame; ignored if
+		# the previous detection has not been collected yet.
+		# `trackBoxes` are the track positions on that frame
+		if self.busy:
+			return False
+		self.frameIndex = frameIndex
+		self.trackBoxes = None if trackBoxes is None else np.array(trackBoxes, dtype=int)
+		if self.ownsExecutor:
+			self.future = self.executor.submit(self.detect, frame.copy())
+		else:
+			self.future = self.executor.submit(self.detect, frame.copy(),
+				camera=self.camera)
+		return True
+
+	def poll(self, frameIndex=None, trackBoxes=None):
+		# return (frameIndex, boxes) once the pending detection is done,
+		# otherwise None -- this never blocks the frame loop. Given the
+		# current `frameIndex` and `trackBoxes`, the boxes are brought
+		# to the current frame, or are None if the result is too old
+		if self.future is None or not self.future.done():
+			return None
+		(future, self.future) = (self.future, None)
+		boxes = future.result()
+		if (frameIndex is not None and self.maxAge is not None and
+			frameIndex - self.frameIndex > self.maxAge):
+			return (self.frameIndex, None)
+		if trackBoxes is not None and self.trackBoxes is not None:
+			boxes = follow_motion(boxes, self.trackBoxes, trackBoxes,
+				self.iouThreshold)
+		return (self.frameIndex, boxes)
+
+	def close(self):
+		# a shared pool outlives the camera, only wait for our request
+		if self.ownsExecutor:
+			self.executor.shutdown(wait=True, cancel_futures=True)
+		elif self.future is not None:
+			self.future.exception()
+		self.future = None
@@ -0,0 +1,226 @@
+# import the necessary packages
+from detector.postprocess import filter_detections, PERSON_CLASS
+import numpy as np
+import threading
+import cv2
+import os
+
+try:
+	import onnxruntime
+except ImportError:
+	onnxruntime = None
+
+# registry mapping the "backend" name used in utils/config.json to the
+# class implementing it
+BACKENDS = {}
+
+def register_backend(name):
+	# class decorator adding a detector backend to the registry
+	def decorator(cls):
+		cls.name = name
+		BACKENDS[name] = cls
+		return cls
+	return decorator
+
+def available_backends():
+	# names of the registered backends that can run on this machine
+	return [name for (name, cls) in BACKENDS.items() if cls.available()]
+
+def create_detector(settings=None, confidence=0.4, nmsThreshold=0.45):
+	# build the detector described by the "detector" section of the
+	# config, e.g. {"backend": "onnx", "model": "detector/ssd.onnx"}
+	settings = dict(settings or {})
+	name = settings.pop("backend", "caffe")
+	if name not in BACKENDS:
+		raise ValueError("Backend de detección desconocido: {} (disponibles: {})".format(
+			name, ", ".join(sorted(BACKENDS))))
+	cls = BACKENDS[name]
+	if not cls.available():
+		raise RuntimeError("El backend de detección '{}' no está disponible en este equipo".format(name))
+	return cls(settings, confidence=confidence, nmsThreshold=nmsThreshold)
+
+def configure_opencv_threads(threads):
+	# OpenCV's thread pool is process wide, so it is sized once for the
+	# whole process rather than by every model (0 keeps the default)
+	if threads and int(threads) > 0:
+		cv2.setNumThreads(int(threads))
+
+def _require_file(path, kind):
+	if not path or not os.path.exists(path):
+		raise FileNotFoundError("{} no encontrado: {}".format(kind, path))
+	return path
+
+class DetectorBackend:
+	# preprocessing defaults, overridable per backend and per config
+	scale = 0.007843
+	mean = 127.5
+	swapRB = False
+	inputSize = None
+
+	# whether the network accepts a batch of images in one forward pass
+	# and tags every output row with the index of its image
+	supportsBatch = False
+
+	def __init__(self, settings, confidence=0.4, nmsThreshold=0.45):
+		# store the preprocessing parameters -- an input size of None
+		# feeds the network at the resolution of the frame itself
+		self.scale = float(settings.get("scale", self.scale))
+		self.mean = settings.get("mean", self.mean)
+		self.swapRB = bool(settings.get("swap_rb", self.swapRB))
+		inputSize = settings.get("input_size", self.inputSize)
+		self.inputSize = tuple(inputSize) if inputSize else None
+		self.threads = int(settings.get("threads", 0))
+		self.classID = int(settings.get("class_id", PERSON_CLASS))
+		self.supportsBatch = bool(settings.get("batch", self.supportsBatch))
+		self.confidence = confidence
+		self.nmsThreshold = nmsThreshold
+
+		# a network is not thread-safe: the forward passes of the
+		# sessions sharing this instance are serialized
+		self.lock = threading.Lock()
+
+	@classmethod
+	def available(cls):
+		return True
+
+	def _mean(self):
+		return tuple(self.mean) if isinstance(self.mean, (list, tuple)) else (self.mean,) * 3
+
+	def preprocess(self, frame):
+		# convert the frame to a blob using this backend's parameters
+		(H, W) = frame.shape[:2]
+		size = self.inputSize or (W, H)
+		return cv2.dnn.blobFromImage(frame, self.scale, size, self._mean(),
+			swapRB=self.swapRB, crop=False)
+
+	def preprocess_batch(self, frames):
+		# convert several frames to a single (N, C, H, W) blob; without
+		# a fixed input size the first frame sets the batch resolution
+		(H, W) = frames[0].shape[:2]
+		size = self.inputSize or (W, H)
+		return cv2.dnn.blobFromImages(frames, self.scale, size, self._mean(),
+			swapRB=self.swapRB, crop=False)
+
+	def forward(self, blob):
+		# run the network and return its raw output in the SSD layout,
+		# i.e. rows of [imageID, classID, score, startX, startY, endX,
+		# endY] with coordinates relative to the input
+		raise NotImplementedError
+
+	def detect(self, frame, confidence=None, nmsThreshold=None):
+		# run the full detector on a frame and return an (N, 4) int
+		# array of person boxes in frame coordinates; the thresholds
+		# default to the ones the backend was created with
+		(H, W) = frame.shape[:2]
+		return self.detect_blob(self.preprocess(frame), W, H,
+			confidence, nmsThreshold)
+
+	def detect_blob(self, blob, W, H, confidence=None, nmsThreshold=None):
+		# same as detect() for a blob that was already built from a
+		# W x H frame, e.g. into a buffer reused across frames
+		with self.lock:
+			detections = self.forward(blob)
+		return filter_detections(detections, W, H,
+			self.confidence if confidence is None else confidence,
+			classID=self.classID,
+			nmsThreshold=self.nmsThreshold if nmsThreshold is None else nmsThreshold)
+
+	def detect_batch(self, frames, thresholds):
+		# detect on several frames with one forward pass when the model
+		# supports it; `thresholds` holds one (confidence, nmsThreshold)
+		# pair per frame. Returns one (N, 4) box array per frame
+		if not self.supportsBatch:
+			return [self.detect(frame, c, n) for (frame, (c, n)) in zip(frames, thresholds)]
+
+		sizes = [frame.shape[1::-1] for frame in frames]
+		return self._detect_stacked(self.preprocess_batch(frames), sizes,
+			thresholds)
+
+	def detect_blob_batch(self, blobs, sizes, thresholds):
+		# same as detect_batch() for (1, C, H, W) blobs that were already
+		# built, e.g. in the per-camera buffers; `sizes` holds the W x H
+		# of the frame behind every blob
+		if not self.supportsBatch:
+			return [self.detect_blob(blob, W, H, c, n)
+				for (blob, (W, H), (c, n)) in zip(blobs, sizes, thresholds)]
+		return self._detect_stacked(np.concatenate(blobs), sizes, thresholds)
+
+	def _detect_stacked(self, blob, sizes, thresholds):
+		# one forward pass over an (N, C, H, W) blob, split per image
+		with self.lock:
+			rows = self.forward(blob).reshape(-1, 7)
+		results = []
+		for (i, ((W, H), (c, n))) in enumerate(zip(sizes, thresholds)):
+			results.append(filter_detections(rows[rows[:, 0] == i], W, H,
+				self.confidence if c is None else c, classID=self.classID,
+				nmsThreshold=self.nmsThreshold if n is None else n))
+		return results
+
+	def warmup(self, W=500, H=375):
+		# run a dummy forward pass so the first real frame does not pay
+		# for lazy allocations inside the runtime
+		self.detect(np.zeros((H, W, 3), dtype=np.uint8))
+
+class OpenCVDNNBackend(DetectorBackend):
+	def _configure(self, net):
+		# pin the network to the OpenCV CPU implementation; its thread
+		# pool is process wide, see configure_opencv_threads()
+		net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+		net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+		return net
+
+	def forward(self, blob):
+		self.net.setInput(blob)
+		return self.net.forward()
+
+@register_backend("caffe")
+class CaffeBackend(OpenCVDNNBackend):
+	# the SSD DetectionOutput layer handles batches natively
+	supportsBatch = True
+
+	def __init__(self, settings, **kwargs):
+		super().__init__(settings, **kwargs)
+		prototxt = _require_file(settings.get("prototxt",
+			"detector/MobileNetSSD_deploy.prototxt"), "Prototxt")
+		model = _require_file(settings.get("model",
+			"detector/MobileNetSSD_deploy.caffemodel"), "Modelo")
+		self.net = self._configure(cv2.dnn.readNetFromCaffe(prototxt, model))
+
+@register_backend("onnx")
+class ONNXBackend(OpenCVDNNBackend):
+	# typical SSD exports expect a fixed-size RGB input in [-1, 1]
+	scale = 1.0 / 127.5
+	swapRB = True
+	inputSize = (300, 300)
+
+	def __init__(self, settings, **kwargs):
+		super().__init__(settings, **kwargs)
+		model = _require_file(settings.get("model"), "Modelo ONNX")
+		self.net = self._configure(cv2.dnn.readNetFromONNX(model))
+
+@register_backend("onnxruntime")
+class ONNXRuntimeBackend(DetectorBackend):
+	scale = 1.0 / 127.5
+	swapRB = True
+	inputSize = (300, 300)
+
+	def __init__(self, settings, **kwargs):
+		super().__init__(settings, **kwargs)
+		model = _require_file(settings.get("model"), "Modelo ONNX")
+
+		# unlike OpenCV, ONNX Runtime lets every session have its own
+		# intra- and inter-op thread pools
+		options = onnxruntime.SessionOptions()
+		if self.threads > 0:
+			options.intra_op_num_threads = self.threads
+		options.inter_op_num_threads = int(settings.get("inter_threads", 1))
+		self.session = onnxruntime.InferenceSession(model, options,
+			providers=["CPUExecutionProvider"])
+		self.inputName = self.session.get_inputs()[0].name
+
+	@classmethod
+	def available(cls):
+		return onnxruntime is not None
+
+	def forward(self, blob):
+		return self.session.run(None, {self.inputName: blob})[0]
@@ -0,0 +1,192 @@
+# import the necessary packages
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import defaultdict
+from detector.cache import MODEL_CACHE
+from utils.metrics import Histogram, RollingWindow
+import threading
+import queue
+import time
+
+class _Request:
+	__slots__ = ("frame", "blob", "size", "thresholds", "camera", "enqueued",
+		"future")
+
+	def __init__(self, frame, thresholds, camera, blob=None, size=None):
+		# either a frame or a blob already built from a `size` frame
+		self.frame = frame
+		self.blob = blob
+		self.size = size
+		self.thresholds = thresholds
+		self.camera = camera
+		self.enqueued = time.perf_counter()
+		self.future = Future()
+
+class _BatchedDetector:
+	# stands in for a detector inside the functions submitted by the
+	# cameras: `detect` queues the frame for the next batch and waits.
+	# It carries the preprocessing parameters of the shared network so
+	# the cameras can build its blob in their own buffers and queue
+	# that instead, through `detect_blob`
+	def __init__(self, batcher, camera):
+		self.batcher = batcher
+		self.camera = camera
+		detector = batcher.detector
+		(self.scale, self.mean) = (detector.scale, detector.mean)
+		(self.swapRB, self.inputSize) = (detector.swapRB, detector.inputSize)
+
+	def detect(self, frame, confidence=None, nmsThreshold=None):
+		return self.batcher.detect(frame, confidence, nmsThreshold, self.camera)
+
+	def detect_blob(self, blob, W, H, confidence=None, nmsThreshold=None):
+		return self.batcher.detect_blob(blob, W, H, confidence, nmsThreshold,
+			self.camera)
+
+class BatchingDetector:
+	def __init__(self, settings=None, maxBatch=8, maxWaitMs=10, maxPending=None):
+		# one network shared by every camera: requests arriving within
+		# `maxWaitMs` of the first one (up to `maxBatch` frames) go
+		# through a single blobFromImages + forward pass
+		(self.detector, self.loadSeconds) = MODEL_CACHE.get(settings, slot="batch")
+		self.maxBatch = max(1, int(maxBatch))
+		self.maxWait = max(0.0, float(maxWaitMs)) / 1000.0
+		self.maxPending = int(maxPending or 4 * self.maxBatch)
+
+		# a single inference worker runs the batches
+		self.workers = 1
+
+		# the per-camera detection functions (ROI cropping, mapping the
+		# boxes back) run on their own threads and block on the batch
+		self.callers = ThreadPoolExecutor(max_workers=self.maxPending,
+			thread_name_prefix="batch-caller")
+		self.slots = threading.BoundedSemaphore(self.maxPending)
+		self.requests = queue.Queue()
+
+		self.batchSizes = Histogram()
+		self.queueDelay = defaultdict(lambda: RollingWindow(500))
+		self.forwardTime = RollingWindow(500)
+
+		self.running = True
+		self.thread = threading.Thread(target=self._loop,
+			name="batching-detector", daemon=True)
+		self.thread.start()
+
+	def _call(self, fn, frame, camera):
+		try:
+			return fn(frame, _BatchedDetector(self, camera))
+		finally:
+			self.slots.release()
+
+	def submit(self, fn, frame, camera=None):
+		# same contract as DetectionPool.submit: run `fn(frame,
+		# detector)` and return its Future
+		self.slots.acquire()
+		try:
+			return self.callers.submit(self._call, fn, frame, camera)
+		except Exception:
+			self.slots.release()
+			raise
+
+	def detect(self, frame, confidence=None, nmsThreshold=None, camera=None):
+		request = _Request(frame, (confidence, nmsThreshold), camera)
+		self.requests.put(request)
+		return request.future.result()
+
+	def detect_blob(self, blob, W, H, confidence=None, nmsThreshold=None,
+		camera=None):
+		# the caller's blob buffer is only read by the batch, which
+		# copies it into the stacked blob before this returns
+		request = _Request(None, (confidence, nmsThreshold), camera,
+			blob=blob, size=(W, H))
+		self.requests.put(request)
+		return request.future.result()
+
+	def _collect(self):
+		# block for the first request, then gather more until the batch
+		# is full or the first request has waited `maxWait`
+		try:
+			first = self.requests.get(timeout=0.1)
+		except queue.Empty:
+			return []
+		batch = [first]
+		deadline = first.enqueued + self.maxWait
+		while len(batch) < self.maxBatch:
+			remaining = deadline - time.perf_counter()
+			if remaining <= 0:
+				break
+			try:
+				batch.append(self.requests.get(timeout=remaining))
+			except queue.Empty:
+				break
+		return batch
+
+	def _loop(self):
+		while self.running:
+			batch = self._collect()
+			if not batch:
+				continue
+
+			# without a fixed input size only frames of the same
+			# resolution can share a blob; prebuilt blobs are stacked
+			# apart from the frames
+			groups = defaultdict(list)
+			for request in batch:
+				if request.blob is not None:
+					key = ("blob", request.blob.shape)
+				else:
+					key = None if self.detector.inputSize else request.frame.shape
+				groups[key].append(request)
+			for requests in groups.values():
+				self._run(requests)
+
+	def _run(self, requests):
+		start = time.perf_counter()
+		for request in requests:
+			self.queueDelay[request.camera].add(start - request.enqueued)
+		self.batchSizes.add(len(requests))
+
+		try:
+			thresholds = [r.thresholds for r in requests]
+			if requests[0].blob is not None:
+				results = self.detector.detect_blob_batch([r.blob for r in requests],
+					[r.size for r in requests], thresholds)
+			else:
+				results = self.detector.detect_batch([r.frame for r in requests],
+					thresholds)
+		except Exception as e:
+			for request in requests:
+				request.future.set_exception(e)
+			return
+
+		self.forwardTime.add(time.perf_counter() - start)
+		for (request, boxes) in zip(requests, results):
+			request.future.set_result(boxes)
+
+	def warmup(self):
+		# the shared network is loaded (and warmed) by the constructor,
+		# whose load time is reported once, like DetectionPool.warmup()
+		(loadSeconds, self.loadSeconds) = (self.loadSeconds, 0.0)
+		return {"model_cache_hit": not loadSeconds,
+			"model_load_ms": round(loadSeconds * 1000, 2)}
+
+	def shutdown(self):
+		self.running = False
+		self.thread.join(timeout=1.0)
+
+		# release the callers still waiting for a batch
+		while True:
+			try:
+				request = self.requests.get_nowait()
+			except queue.Empty:
+				break
+			request.future.set_exception(RuntimeError("Detector por lotes detenido"))
+		self.callers.shutdown(wait=True, cancel_futures=True)
+
+	def stats(self):
+		return {
+			"max_batch": self.maxBatch,
+			"max_wait_ms": self.maxWait * 1000.0,
+			"batch_sizes": self.batchSizes.as_dict(),
+			"forward_ms": self.forwardTime.summary(scale=1000),
+			"queue_delay_ms": {str(camera): window.summary(scale=1000)
+				for (camera, window) in list(self.queueDelay.items())},
+		}
@@ -0,0 +1,54 @@
+# import the necessary packages
+from detector.backends import create_detector
+import threading
+import json
+import time
+
+class ModelCache:
+	def __init__(self, warmupSize=(500, 375)):
+		# loaded detectors keyed by their (serialized) settings, so that
+		# every counting session started by this process reuses the same
+		# warmed network instead of reading it from disk again
+		self.models = {}
+		self.lock = threading.Lock()
+		self.warmupSize = warmupSize
+		self.hits = 0
+		self.misses = 0
+
+	@staticmethod
+	def key(settings, slot=0):
+		return (json.dumps(settings or {}, sort_keys=True), slot)
+
+	def get(self, settings=None, confidence=0.4, nmsThreshold=0.45, slot=0):
+		# return (detector, loadSeconds); `loadSeconds` is 0 on a cache
+		# hit. `slot` lets callers hold several independent instances of
+		# the same model, e.g. one per detection worker
+		key = self.key(settings, slot)
+		with self.lock:
+			detector = self.models.get(key)
+			if detector is None:
+				start = time.perf_counter()
+				detector = create_detector(settings, confidence, nmsThreshold)
+				(W, H) = self.warmupSize
+				detector.warmup(W, H)
+				loadSeconds = time.perf_counter() - start
+				self.models[key] = detector
+				self.misses += 1
+			else:
+				loadSeconds = 0.0
+				self.hits += 1
+
+		# the instance is shared by every session with these settings:
+		# `confidence` and `nmsThreshold` are only its defaults, sessions
+		# pass their own thresholds to detect() instead of changing them
+		return (detector, loadSeconds)
+
+	def clear(self):
+		with self.lock:
+			self.models.clear()
+
+	def stats(self):
+		return {"models": len(self.models), "hits": self.hits, "misses": self.misses}
+
+# process-wide cache shared by every PeopleCounterService
+MODEL_CACHE = ModelCache()
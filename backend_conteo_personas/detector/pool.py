@@ -0,0 +1,92 @@
+# import the necessary packages
+from concurrent.futures import ThreadPoolExecutor
+from detector.backends import configure_opencv_threads
+from detector.cache import MODEL_CACHE
+import threading
+import os
+
+class DetectionPool:
+	def __init__(self, settings=None, workers=None, maxPending=None):
+		# a bounded pool of detection workers shared by every camera of
+		# the process: each worker thread owns one warmed detector (taken
+		# from the model cache) instead of one model per camera thread
+		self.settings = dict(settings or {})
+		self.workers = max(1, int(workers or 1))
+
+		# a forward pass is parallelized internally: the cores are split
+		# between the workers so they do not oversubscribe the CPU, and
+		# a single worker still gets all of them (an explicit "threads"
+		# setting wins). OpenCV's pool is process wide, so it is sized
+		# here once instead of by every model
+		if not self.settings.get("threads"):
+			self.settings["threads"] = max(1, (os.cpu_count() or 1) // self.workers)
+		configure_opencv_threads(self.settings["threads"])
+		self.executor = ThreadPoolExecutor(max_workers=self.workers,
+			thread_name_prefix="detection-pool")
+
+		# bound the number of queued plus running requests so a slow
+		# model applies backpressure to the cameras instead of queueing
+		# an ever-growing backlog of stale frames
+		self.maxPending = max(int(maxPending or 2 * self.workers), self.workers)
+		self.slots = threading.BoundedSemaphore(self.maxPending)
+		self.local = threading.local()
+		self.slotLock = threading.Lock()
+		self.nextSlot = 0
+
+		# load time of every worker's detector (0 when it came from the
+		# model cache), reported by warmup()
+		self.loads = []
+		self.warmupLock = threading.Lock()
+
+	def _detector(self):
+		# the detector owned by the calling worker thread
+		detector = getattr(self.local, "detector", None)
+		if detector is None:
+			with self.slotLock:
+				slot = self.nextSlot
+				self.nextSlot += 1
+			(detector, loadSeconds) = MODEL_CACHE.get(self.settings, slot=slot)
+			self.loads.append(loadSeconds)
+			self.local.detector = detector
+		return detector
+
+	def _run(self, fn, frame):
+		try:
+			return fn(frame, self._detector())
+		finally:
+			self.slots.release()
+
+	def submit(self, fn, frame, camera=None):
+		# run `fn(frame, detector)` on a worker and return its Future;
+		# blocks while the pool already holds `maxPending` requests
+		# (`camera` is only used by the batching detector's metrics)
+		self.slots.acquire()
+		try:
+			return self.executor.submit(self._run, fn, frame)
+		except Exception:
+			self.slots.release()
+			raise
+
+	def warmup(self):
+		# load one detector per worker ahead of the first camera and
+		# return whether every one of them came warm from the model
+		# cache, along with the time spent loading the others
+		with self.warmupLock:
+			before = len(self.loads)
+			if before < self.workers:
+				barrier = threading.Barrier(self.workers)
+				def load(frame, detector):
+					barrier.wait(timeout=60)
+				futures = [self.submit(load, None) for _ in range(self.workers)]
+				for future in futures:
+					future.result()
+			loads = self.loads[before:]
+		return {"model_cache_hit": not any(loads),
+			"model_load_ms": round(sum(loads) * 1000, 2)}
+
+	def shutdown(self):
+		self.executor.shutdown(wait=True, cancel_futures=True)
+
+	def stats(self):
+		return {"workers": self.workers, "threads_per_worker": self.settings["threads"],
+			"max_pending": self.maxPending}
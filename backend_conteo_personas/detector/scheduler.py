@@ -0,0 +1,111 @@
+# import the necessary packages
+import math
+import time
+
+class AdaptiveDetectionScheduler:
+	def __init__(self, minInterval=5, maxInterval=60, cpuBudget=None,
+		backoff=1.5, lowConfidence=7.0, smoothing=0.1):
+		# store the bounds (in frames) between two detections: the
+		# interval drops to `minInterval` whenever the scene is active
+		# and grows by `backoff` after every detection cycle without
+		# activity, up to `maxInterval`
+		self.minInterval = max(1, int(minInterval))
+		self.maxInterval = max(self.minInterval, int(maxInterval))
+		self.backoff = float(backoff)
+		self.lowConfidence = lowConfidence
+
+		# the CPU budget is the fraction of wall time this camera may
+		# spend inside the detector, e.g. 0.25 for a quarter of a core
+		self.cpuBudget = cpuBudget
+		self.smoothing = smoothing
+		self.detectCost = None
+		self.framePeriod = None
+		self.lastTick = None
+
+		self.interval = float(self.minInterval)
+		self.lastDetection = None
+		self.detections = 0
+		self.quiet = True
+
+	@classmethod
+	def fixed(cls, interval):
+		# a scheduler that always waits `interval` frames, i.e. the
+		# classic `skip_frames` behaviour
+		return cls(interval, interval)
+
+	@classmethod
+	def from_config(cls, settings, skipFrames=30):
+		if not settings.get("enabled", False):
+			return cls.fixed(skipFrames)
+		return cls(minInterval=settings.get("min_interval", 5),
+			maxInterval=settings.get("max_interval", 60),
+			cpuBudget=settings.get("cpu_budget"),
+			backoff=settings.get("backoff", 1.5),
+			lowConfidence=settings.get("low_confidence", 7.0))
+
+	def _ewma(self, current, sample):
+		if current is None:
+			return sample
+		return current + self.smoothing * (sample - current)
+
+	def tick(self, now=None):
+		# called once per frame to estimate the frame period
+		now = time.perf_counter() if now is None else now
+		if self.lastTick is not None:
+			self.framePeriod = self._ewma(self.framePeriod, now - self.lastTick)
+		self.lastTick = now
+
+	def record_cost(self, seconds):
+		# called with the duration of every detector run
+		self.detectCost = self._ewma(self.detectCost, seconds)
+
+	def budget_interval(self):
+		# smallest interval keeping the detector within the CPU budget
+		if not self.cpuBudget or not self.detectCost or not self.framePeriod:
+			return self.minInterval
+		return math.ceil(self.detectCost / (self.cpuBudget * self.framePeriod))
+
+	def current_interval(self):
+		interval = max(int(self.interval), self.budget_interval())
+		return min(interval, self.maxInterval)
+
+	def due(self, frameIndex):
+		return (self.lastDetection is None or
+			frameIndex - self.lastDetection >= self.current_interval())
+
+	def mark(self, frameIndex):
+		# a detection has been run (or submitted) on `frameIndex`; back
+		# off if nothing happened since the previous one
+		if self.quiet and self.lastDetection is not None:
+			self.interval = min(self.interval * self.backoff, float(self.maxInterval))
+		self.lastDetection = frameIndex
+		self.detections += 1
+		self.quiet = True
+
+	def force(self):
+		# detect on the very next frame
+		self.lastDetection = None
+
+	def observe(self, created, lost, nearLine, minConfidence=None):
+		# adapt the interval to the activity of the tracked set: tracks
+		# being created or lost, a track close to the counting line or
+		# a tracker losing confidence all ask for frequent detections
+		active = created > 0 or lost > 0 or nearLine
+		if (minConfidence is not None and self.lowConfidence is not None
+			and minConfidence < self.lowConfidence):
+			active = True
+
+		if active:
+			self.interval = float(self.minInterval)
+			self.quiet = False
+		return active
+
+	def stats(self):
+		return {
+			"interval": self.current_interval(),
+			"min_interval": self.minInterval,
+			"max_interval": self.maxInterval,
+			"budget_interval": self.budget_interval(),
+			"detections": self.detections,
+			"detect_ms": round(self.detectCost * 1000, 2) if self.detectCost else None,
+		}
@@ -2,38 +2,30 @@
 
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
+from typing import Optional
 from report_service import send_daily_report_email
 import uvicorn
 import os
 import json
 import threading
 import time
-import datetime
+import logging
 # import cv2 # No necesitas importar cv2 directamente aquí si PeopleCounterService lo maneja internamente
 
 # Importar tus módulos locales
 # Asegúrate de que la ruta sea correcta a tu nuevo archivo
-from people_counter_service import PeopleCounterService, get_current_config_from_file # Importa la nueva clase y función
+from camera_manager import CameraManager, DEFAULT_CAMERA_ID
+from detector.cache import MODEL_CACHE
+
+logger = logging.getLogger(__name__)
 
 # --- Carga de configuración global (ajustaremos esto para que sea dinámico) ---
 CONFIG_FILE_PATH = "utils/config.json"
 SCHEDULE_CONFIG_PATH = "utils/schedule_config.json"
 
-# Variables globales para el estado del conteo y los datos
-# Usaremos un bloqueo para la seguridad de hilos si se acceden desde múltiples lugares
-count_lock = threading.Lock()
-current_counts = {
-    "totalUp": 0,
-    "totalDown": 0,
-    "totalInside": 0,
-    "status": "Inactivo",
-    "last_update": None
-}
-
-# Variable para controlar el hilo de conteo y la instancia del servicio
-counting_thread = None
-people_counter_instance = None # Para almacenar la instancia de PeopleCounterService
-stop_counting_event = threading.Event() # Evento para detener el hilo de forma segura
+# Gestor de cámaras: un PeopleCounterService por cámara, con un pool de detección compartido
+# Los endpoints /start_counting, /stop_counting y /get_counts operan sobre la cámara por defecto
+camera_manager = CameraManager()
 
 # --- Modelo Pydantic para la configuración (ya lo tenías) ---
 class CameraConfig(BaseModel):
@@ -45,6 +37,13 @@ class CameraConfig(BaseModel):
     # Puedes añadir más campos de config.json si son relevantes para el frontend
     skip_frames: int = 30 # Añadido según people_counter_service
     confidence: float = 0.4 # Añadido según people_counter_service
+    nms_threshold: float = 0.45 # Supresión de no-máximos del post-procesado vectorizado
+    async_detection: bool = False # Detección en segundo plano sin bloquear el seguimiento
+    async_max_age: int = 15 # Frames tras los que una detección asíncrona se descarta por antigua
+    tracker_engine: str = "dlib" # "dlib" (correlation trackers) o "kalman" (seguimiento vectorizado)
+    kalman_max_skip: int = 10 # Intervalo máximo entre detecciones con el motor "kalman" (0: sin límite)
+    tracker_threads: int = 1 # Hilos para repartir las actualizaciones de los trackers dlib
+    capture_fps: Optional[float] = None # Frames/s a decodificar con ThreadingClass (None: todos)
 
 
 class ScheduleRange(BaseModel):
@@ -63,6 +62,20 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# --- Precarga del modelo al arrancar la API ---
+def warm_model_cache():
+    """Carga y calienta un detector por worker del pool para que el primer arranque sea inmediato."""
+    try:
+        camera_manager.warmup()
+        logger.info("Modelo de detección precargado en el pool compartido.")
+    except Exception as e:
+        logger.error(f"No se pudo precargar el modelo de detección: {e}")
+
+@app.on_event("startup")
+async def preload_model():
+    # En segundo plano para no retrasar el arranque del servidor
+    threading.Thread(target=warm_model_cache, daemon=True).start()
+
 # --- Endpoint de prueba (ya lo tenías) ---
 @app.get("/")
 async def root():
@@ -120,89 +133,79 @@ async def update_schedule_config(new_schedule: ScheduleConfig):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al escribir el archivo de horario: {e}")
 
-# --- Callback para que el hilo de conteo actualice los contadores globales ---
-def update_global_counts(total_up, total_down, total_inside, status):
-    with count_lock:
-        current_counts["totalUp"] = total_up
-        current_counts["totalDown"] = total_down
-        current_counts["totalInside"] = total_inside
-        current_counts["status"] = status
-        current_counts["last_update"] = datetime.datetime.now().isoformat()
-
-# --- Endpoints para el control del conteo (modificados) ---
+# --- Endpoints para el control del conteo (cámara por defecto) ---
 @app.post("/start_counting")
 async def start_counting():
     """Inicia el proceso de conteo de personas."""
-    global counting_thread
-    global people_counter_instance
-    global stop_counting_event
-
-    if counting_thread is not None and counting_thread.is_alive():
+    result = await start_camera(DEFAULT_CAMERA_ID)
+    if result.get("already_running"):
         return {"message": "El conteo de personas ya está en marcha."}
-
-    # Restablece el evento de parada
-    stop_counting_event.clear()
-
-    try:
-        # Cargar la configuración actual desde el archivo para el servicio
-        current_app_config = get_current_config_from_file()
-        camera_url = current_app_config.get("url")
-        if not camera_url:
-            raise HTTPException(status_code=400, detail="URL de la cámara no configurada en utils/config.json.")
-
-        # Crear una instancia del servicio de conteo
-        people_counter_instance = PeopleCounterService(
-            camera_url=camera_url,
-            update_callback=update_global_counts, # Pasa la función de callback
-            stop_event=stop_counting_event,
-            current_config=current_app_config # Pasa la configuración actual
-        )
-
-        # Iniciar el hilo que ejecuta el método run() del servicio
-        counting_thread = threading.Thread(target=people_counter_instance.run)
-        counting_thread.daemon = True
-        counting_thread.start()
-
-        with count_lock:
-            current_counts["status"] = "Iniciando..." # Estado inicial mientras se conecta
-            current_counts["last_update"] = datetime.datetime.now().isoformat()
-
-        return {"message": "Iniciando el conteo de personas..."}
-    except FileNotFoundError as e:
-        raise HTTPException(status_code=500, detail=f"Error de archivo: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al iniciar el conteo: {e}")
+    result["message"] = "Iniciando el conteo de personas..."
+    return result
 
 @app.post("/stop_counting")
 async def stop_counting():
     """Detiene el proceso de conteo de personas."""
-    global counting_thread
-    global people_counter_instance
-    global stop_counting_event
-
-    if counting_thread is None or not counting_thread.is_alive():
+    if not camera_manager.is_running(DEFAULT_CAMERA_ID):
         return {"message": "El conteo de personas no está activo."}
-
-    logger.info("Solicitando detener el hilo de conteo...")
-    stop_counting_event.set() # Señala al hilo que debe detenerse
-    counting_thread.join(timeout=10) # Espera a que el hilo termine (con timeout)
-
-    if counting_thread.is_alive():
-        logger.error("No se pudo detener el conteo de personas de forma limpia.")
-        raise HTTPException(status_code=500, detail="No se pudo detener el conteo de personas de forma limpia.")
-
-    with count_lock:
-        current_counts["status"] = "Detenido"
-        current_counts["last_update"] = datetime.datetime.now().isoformat()
-
-    logger.info("Conteo de personas detenido exitosamente.")
+    await stop_camera(DEFAULT_CAMERA_ID)
     return {"message": "Conteo de personas detenido."}
 
 @app.get("/get_counts")
 async def get_counts():
     """Obtiene los datos de conteo actuales."""
-    with count_lock:
-        return current_counts
+    return camera_manager.counts(DEFAULT_CAMERA_ID)
+
+# --- Endpoints multi-cámara ---
+@app.get("/cameras")
+async def list_cameras():
+    """Lista las cámaras configuradas y si están contando."""
+    return camera_manager.list_cameras()
+
+@app.post("/cameras/{camera_id}/start")
+async def start_camera(camera_id: str):
+    """Inicia el conteo de una cámara."""
+    try:
+        return camera_manager.start(camera_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=500, detail=f"Error de archivo: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al iniciar el conteo: {e}")
+
+@app.post("/cameras/{camera_id}/stop")
+async def stop_camera(camera_id: str):
+    """Detiene el conteo de una cámara."""
+    try:
+        stopped = camera_manager.stop(camera_id)
+    except RuntimeError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+    if not stopped:
+        return {"camera_id": camera_id, "message": "La cámara no está activa."}
+    logger.info(f"Conteo de la cámara {camera_id} detenido exitosamente.")
+    return {"camera_id": camera_id, "message": "Conteo detenido."}
+
+@app.get("/cameras/{camera_id}/counts")
+async def get_camera_counts(camera_id: str):
+    """Obtiene los datos de conteo de una cámara."""
+    return camera_manager.counts(camera_id)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Obtiene las métricas de rendimiento de todas las cámaras."""
+    metrics = camera_manager.metrics()
+    metrics["model_cache"] = MODEL_CACHE.stats()
+    return metrics
+
+@app.get("/cameras/{camera_id}/metrics")
+async def get_camera_metrics(camera_id: str):
+    """Obtiene las métricas de rendimiento de una cámara."""
+    metrics = camera_manager.metrics(camera_id)
+    if metrics is None:
+        raise HTTPException(status_code=404, detail=f"La cámara '{camera_id}' no ha sido iniciada.")
+    return metrics
 
 @app.post("/generate_report")
 async def generate_report():
@@ -220,6 +223,5 @@ async def generate_report():
 
 # --- Iniciar el servidor Uvicorn ---
 if __name__ == "__main__":
-    # La configuración inicial de config.json se cargará automáticamente
-    # cuando PeopleCounterService se inicialice en /start_counting
+    # La configuración de config.json se carga cada vez que se inicia una cámara
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
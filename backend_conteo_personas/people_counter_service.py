@@ -1,24 +1,36 @@
 # backend_conteo_personas/people_counter_service.py
 
 # Importaciones necesarias (mantén las que ya tenías y elimina las de GUI)
-from tracker.centroidtracker import CentroidTracker
-from tracker.trackableobject import TrackableObject
-from imutils.video import VideoStream # Aunque usaremos cv2.VideoCapture directamente, imutils.video.FPS es útil
-from itertools import zip_longest
+from tracker.centroidtracker import CentroidTracker, GRID_MIN_PAIRS
+from tracker.trackableobject import TrackableStore
+from tracker.correlation import CorrelationTrackerSet
+from tracker.kalman import KalmanTrackerSet
+from detector.backends import configure_opencv_threads
+from detector.cache import MODEL_CACHE
+from detector.async_detector import AsyncDetector
+from detector.scheduler import AdaptiveDetectionScheduler
+from utils.journal import CountingJournal, ENTRADA, SALIDA
 from utils.mailer import Mailer
+from utils.motion import MotionGate
+from utils.roi import DetectionROI
+from utils.zones import CountingZones
+from utils.counting import line_crossings, zone_crossings
+from utils.snapshot import StateSnapshotter, snapshot_path
+from utils.metrics import RollingWindow
+from utils.preprocess import FramePreprocessor
+from utils.pipeline import StageQueue, PipelineStage, FrameSlot, BLOCK, DROP_OLDEST
 from imutils.video import FPS
 from utils import thread # Si config["Thread"] es True
+from collections import deque
 import numpy as np
+import functools
 import threading
+import queue
 import datetime
 import logging
-import imutils
 import time
-import dlib
 import json
-import csv
 import cv2
-import os
 
 # Suponiendo que config.json y schedule_config.json están en utils/
 CONFIG_FILE_PATH = "utils/config.json"
@@ -40,7 +52,7 @@ except json.JSONDecodeError:
     logger.error(f"Error: {CONFIG_FILE_PATH} no es un JSON válido.")
     config = {}
 
-# Clases y funciones auxiliares (Mailer, log_data, etc. si se usan directamente aquí)
+# Clases y funciones auxiliares (Mailer, diario de conteo, etc. si se usan directamente aquí)
 # No necesitas redefinir Mailer si lo importas.
 
 # Función para enviar correo (puede ser llamada por Mailer().send)
@@ -60,37 +72,50 @@ def send_mail_alert(receiver_email, threshold):
     except Exception as e:
         logger.error(f"Error al enviar alerta por correo: {e}")
 
-# Función para registrar datos (simplificada, `report_generator.py` se encargará de los finales)
-def log_counting_data(move_in_data, in_time_data, move_out_data, out_time_data):
+# Diario de conteo (un registro por cruce, en lugar de reescribir el CSV en cada frame)
+def open_counting_journal(current_config: dict, camera: str):
     """
-    Registra datos de conteo en un archivo CSV.
-    Esta función podría ser invocada por report_generator.py al final.
+    Abre el diario de conteo append-only si el log está habilitado.
+    Los cruces se escriben por lotes (ver CountingJournal para la política de durabilidad).
     """
-    if not config.get("Log", False):
-        return
+    if not current_config.get("Log", False):
+        return None
 
     try:
-        data = [move_in_data, in_time_data, move_out_data, out_time_data]
-        export_data = zip_longest(*data, fillvalue='')
-
-        # Usar 'a' para append si quieres registrar cada evento, 'w' para sobrescribir
-        # Si quieres un log constante de los totales, esto debería ser más complejo.
-        # Por ahora, mantendremos la lógica original de sobrescribir en people_counter.py
-        # Pero considera usar un enfoque de append para mantener un historial.
-        with open('utils/data/logs/counting_data.csv', 'w', newline='') as myfile:
-            wr = csv.writer(myfile, quoting=csv.QUOTE_ALL)
-            # Solo escribe el encabezado si el archivo está vacío
-            if myfile.tell() == 0:
-                wr.writerow(("Entradas", "Hora Entrada", "Salidas", "Hora Salida"))
-            wr.writerows(export_data)
-        logger.debug("Datos de conteo registrados en CSV.")
-    except Exception as e:
-        logger.error(f"Error al registrar datos de conteo: {e}")
+        return CountingJournal(
+            camera=camera,
+            batch_size=current_config.get("log_batch_size", 32),
+            max_delay=current_config.get("log_flush_seconds", 2.0),
+        )
+    except OSError as e:
+        logger.error(f"Error al abrir el diario de conteo: {e}")
+        return None
+
+
+# Motores de seguimiento entre detecciones, seleccionables con "tracker_engine"
+TRACKER_ENGINES = {
+    "dlib": CorrelationTrackerSet,
+    "kalman": KalmanTrackerSet,
+}
+
+def create_tracker_set(current_config: dict):
+    """
+    Crea el conjunto de trackers configurado: "dlib" (un correlation tracker por persona)
+    o "kalman" (modelo de movimiento vectorizado, todas las personas en un solo paso).
+    """
+    engine = current_config.get("tracker_engine", "dlib")
+    if engine not in TRACKER_ENGINES:
+        raise ValueError(f"Motor de seguimiento desconocido '{engine}' (disponibles: {', '.join(TRACKER_ENGINES)})")
+    if engine == "dlib":
+        # Las actualizaciones de dlib se pueden repartir entre varios hilos
+        return CorrelationTrackerSet(threads=current_config.get("tracker_threads", 1))
+    return TRACKER_ENGINES[engine]()
 
 
 # --- Clase principal de People Counter como un Servicio ---
 class PeopleCounterService:
-    def __init__(self, camera_url: str, update_callback, stop_event: threading.Event, current_config: dict):
+    def __init__(self, camera_url: str, update_callback, stop_event: threading.Event, current_config: dict,
+                 camera_id: str = "0", detection_pool=None):
         """
         Inicializa el servicio de conteo de personas.
         Args:
@@ -98,199 +123,533 @@ class PeopleCounterService:
             update_callback (callable): Una función de callback para actualizar los contadores en el hilo principal.
             stop_event (threading.Event): Un evento para señalizar al hilo de conteo que debe detenerse.
             current_config (dict): La configuración actual cargada de config.json.
+            camera_id (str): Identificador de la cámara (se guarda en el diario de conteo).
+            detection_pool (DetectionPool | BatchingDetector): Pool de detección compartido entre
+                cámaras; si es None el servicio usa su propio detector.
         """
         self.camera_url = camera_url
+        self.camera_id = str(camera_id)
         self.update_callback = update_callback
         self.stop_event = stop_event
         self.config = current_config # La configuración actual cargada de main.py
-
-        # Cargar el modelo (rutas relativas a la ejecución de main.py)
-        # Asegúrate de que estos archivos estén accesibles
-        prototxt_path = "detector/MobileNetSSD_deploy.prototxt"
-        model_path = "detector/MobileNetSSD_deploy.caffemodel"
-
-        if not os.path.exists(prototxt_path):
-            logger.error(f"Error: Prototxt no encontrado en {prototxt_path}")
-            raise FileNotFoundError(f"Prototxt no encontrado: {prototxt_path}")
-        if not os.path.exists(model_path):
-            logger.error(f"Error: Modelo no encontrado en {model_path}")
-            raise FileNotFoundError(f"Modelo no encontrado: {model_path}")
-
-        self.net = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
-        logger.info("Modelo de detección de objetos cargado.")
-
-        self.CLASSES = ["fondo", "aeroplane", "bicycle", "bird", "boat",
-                        "bottle", "bus", "car", "cat", "chair", "cow", "diningtable",
-                        "dog", "horse", "motorbike", "person", "pottedplant", "sheep",
-                        "sofa", "train", "tvmonitor"]
-
-        self.ct = CentroidTracker(maxDisappeared=40, maxDistance=50)
-        self.trackers = []
-        self.trackableObjects = {}
+        self.detection_pool = detection_pool
+
+        # Obtener el detector configurado desde la caché del proceso: solo la primera
+        # sesión lee el modelo de disco y lo calienta con una pasada de prueba
+        # Los backends disponibles están en detector/backends.py (caffe, onnx, onnxruntime)
+        # Con un pool compartido, cada worker del pool tiene su propio detector.
+        self.detector = None
+        self.model_load_seconds = 0.0
+        if self.detection_pool is None:
+            detector_settings = self.config.get("detector", {})
+            try:
+                self.detector, self.model_load_seconds = MODEL_CACHE.get(
+                    detector_settings,
+                    confidence=self.config.get("confidence", 0.4),
+                    nmsThreshold=self.config.get("nms_threshold", 0.45),
+                )
+            except FileNotFoundError as e:
+                logger.error(f"Error: {e}")
+                raise
+            configure_opencv_threads(detector_settings.get("threads", 0))
+            if self.model_load_seconds > 0:
+                logger.info(f"Modelo de detección cargado y calentado en {self.model_load_seconds:.2f}s (backend: {self.detector.name}).")
+            else:
+                logger.info(f"Modelo de detección reutilizado desde la caché (backend: {self.detector.name}).")
+
+        self.trackers = create_tracker_set(self.config)
+        # Las detecciones se reconcilian con los trackers existentes en lugar de reconstruirlos
+        # todos; el modelo de movimiento lo necesita siempre para conservar la velocidad
+        self.reconcile_detections = (self.config.get("reuse_trackers", True)
+                                     or isinstance(self.trackers, KalmanTrackerSet))
+        self.tracking_time = RollingWindow(500)
+        # Zonas de conteo opcionales (líneas y polígonos); sin ellas se usa la línea en H // 2
+        self.zones = CountingZones.from_config(self.config.get("counting_zones", []))
+        self._new_counting_state()
+        self.async_detector = None
+        self.stale_detections = 0 # Detecciones asíncronas descartadas por antiguas
+        # Captura con hilo lector (ThreadingClass) si `Thread` está activo; expone sus contadores
+        self.capture = None
+        # Redimensionado, conversión a RGB y blob del detector sobre buffers reutilizados
+        self.preprocessor = FramePreprocessor(width=500)
+        # Etapas y colas del pipeline (`pipeline.enabled`); vacías en el bucle clásico
+        self.pipeline_stages = []
+        self.pipeline_queues = []
+        # Señales de actividad del conteo para el planificador (solo en el pipeline)
+        self.activity_signals = None
+        # Modo de presupuesto de latencia: los frames más viejos que el presupuesto se
+        # descartan y se salta siempre al más reciente; la latencia captura -> conteo
+        # se mide siempre
+        latency_settings = self.config.get("latency_budget", {})
+        self.latency_budget = (latency_settings.get("budget_ms", 250) / 1000.0
+                               if latency_settings.get("enabled", False) else None)
+        self.capture_to_count = RollingWindow(1000)
+        self.expired_frames = {"preprocess": 0, "track": 0}
+
+        # Planificador de detecciones: intervalo fijo (`skip_frames`) o adaptativo a la actividad
+        skip_frames = self.config.get("skip_frames", 30)
+        adaptive_settings = dict(self.config.get("adaptive_skip", {}))
+        kalman_max_skip = self.config.get("kalman_max_skip", 10)
+        if isinstance(self.trackers, KalmanTrackerSet) and kalman_max_skip:
+            # El modelo de movimiento solo se corrige en los frames de detección y entre
+            # ellos extrapola a velocidad constante: con intervalos largos las cajas se
+            # alejan de las personas, así que se limita el intervalo entre detecciones
+            skip_frames = min(skip_frames, kalman_max_skip)
+            for key, default in (("min_interval", 5), ("max_interval", 60)):
+                adaptive_settings[key] = min(adaptive_settings.get(key, default), kalman_max_skip)
+            logger.info(f"Motor kalman: intervalo entre detecciones limitado a {kalman_max_skip} frames.")
+        self.scheduler = AdaptiveDetectionScheduler.from_config(adaptive_settings, skip_frames)
+        self.line_band = self.config.get("adaptive_skip", {}).get("line_band", 0.1)
+
+        # Compuerta de movimiento opcional: en escenas estáticas evita el DNN y los trackers
+        gate_settings = self.config.get("motion_gate", {})
+        self.motion_gate = MotionGate.from_config(gate_settings) if gate_settings.get("enabled", False) else None
+        self.motion_idle = False
+
+        # Región de interés opcional alrededor de la línea de conteo
+        self.roi = DetectionROI.from_config(self.config.get("roi", {}))
 
         self.totalFrames = 0
         self.totalDown = 0  # Entradas
         self.totalUp = 0    # Salidas
-        self.move_out_timestamps = []
-        self.move_in_timestamps = []
+        # Últimos cruces (el histórico completo está en el diario de conteo)
+        self.move_out_timestamps = deque(maxlen=1000)
+        self.move_in_timestamps = deque(maxlen=1000)
 
         self.W = None
         self.H = None
 
+        # Instantáneas del estado (tracker, objetos y totales) para sobrevivir a reinicios
+        self.snapshotter = None
+        snapshot_settings = self.config.get("snapshot", {})
+        if snapshot_settings.get("enabled", False):
+            self.snapshotter = StateSnapshotter(
+                snapshot_path(self.camera_id),
+                interval=snapshot_settings.get("interval_seconds", 5.0),
+                max_age=snapshot_settings.get("max_age_seconds", 120.0),
+            )
+            self._restore_snapshot()
+
         logger.info(f"Servicio de conteo inicializado con URL: {self.camera_url}")
 
-    def run(self):
+    def _detect(self, frame, detector=None, rgb=None):
         """
-        Bucle principal para la lectura de frames y el procesamiento.
+        Ejecuta el detector sobre un frame y devuelve las cajas de personas como array (N, 4).
+        En modo asíncrono o con pool se llama desde el hilo del detector (con una copia del frame
+        en modo asíncrono), y `detector` es el detector propio de ese worker. El blob siempre se
+        construye en el buffer reutilizado del preprocesador, desde `rgb` si se pasa; cada cámara
+        tiene como mucho una detección en curso, así que nadie más usa ese buffer a la vez.
+        """
+        detector = detector or self.detector
+        confidence = self.config.get("confidence", 0.4)
+        nms_threshold = self.config.get("nms_threshold", 0.45)
+        start = time.perf_counter()
+        if self.roi is not None:
+            # Solo se detecta dentro de la ROI (vista sin copia del frame)
+            frame = self.roi.crop(frame)
+            rgb = self.roi.crop(rgb) if rgb is not None else None
+        (H, W) = frame.shape[:2]
+        blob = self.preprocessor.blob(detector, frame, rgb)
+        boxes = detector.detect_blob(blob, W, H, confidence, nms_threshold)
+        if self.roi is not None:
+            # Las cajas se llevan a coordenadas del frame
+            boxes = self.roi.to_frame(boxes)
+            boxes = boxes[self.roi.contains(boxes)]
+        self.scheduler.record_cost(time.perf_counter() - start)
+        return boxes
+
+    def _track(self, rgb):
+        """
+        Actualiza los trackers; con ROI se retiran los que salen de la región.
+        """
+        start = time.perf_counter()
+        rects = self.trackers.update(rgb)
+        self.tracking_time.add(time.perf_counter() - start)
+        if self.roi is not None and len(self.trackers) > 0:
+            inside = self.roi.contains(self.trackers.boxes)
+            if not inside.all():
+                self.trackers.retain(inside)
+                rects = self.trackers.rects()
+        return rects
+
+    def _snapshot_state(self):
+        """
+        Estado del conteo como arrays planos: totales, CentroidTracker y objetos seguidos.
+        """
+        state = {"totals": np.array([self.totalUp, self.totalDown], dtype=np.int64)}
+        state.update({f"ct_{k}": v for k, v in self.ct.get_state().items()})
+        state.update({f"to_{k}": v for k, v in self.trackableObjects.get_state().items()})
+        if self.zones is not None:
+            state["zone_counts"] = self.zones.counts.copy()
+        return state
+
+    def _new_counting_state(self):
+        """
+        Crea el CentroidTracker y el almacén de objetos vacíos (al iniciar, o si no se
+        puede restaurar la instantánea).
+        """
+        # Asociación de centroides: "dense" (matriz completa) o "grid" (solo celdas vecinas,
+        # para multitudes densas). "grid" usa la matriz completa mientras haya menos de
+        # `centroid_grid_min_pairs` parejas (objetos x detecciones; por defecto 350 x 350,
+        # por debajo de las cuales la matriz completa es más rápida según centroid_benchmark)
+        self.ct = CentroidTracker(maxDisappeared=40, maxDistance=50,
+                                  association=self.config.get("centroid_association", "dense"),
+                                  gridMinPairs=self.config.get("centroid_grid_min_pairs", GRID_MIN_PAIRS),
+                                  onDeregister=self._forget_object)
+        # Almacén por columnas de los objetos seguidos (historial acotado por objeto);
+        # el objeto se elimina cuando el CentroidTracker lo da de baja
+        self.trackableObjects = TrackableStore(maxHistory=self.config.get("track_history", 32),
+                                               zones=len(self.zones) if self.zones is not None else 0)
+
+    def _restore_snapshot(self):
+        """
+        Restaura la última instantánea si es reciente, para que un reinicio del hilo
+        no reinicie los totales ni cuente dos veces a quien estaba cruzando. Si la
+        instantánea es antigua, parcial o ilegible se empieza con un estado nuevo.
         """
-        logger.info("Iniciando la transmisión de video...")
         try:
-            if self.config.get("Thread", False):
-                # Usar tu ThreadingClass para la lectura de frames
-                vs = thread.ThreadingClass(self.camera_url)
-                logger.info("Usando ThreadingClass para la captura de video.")
-            else:
-                vs = cv2.VideoCapture(self.camera_url)
-                logger.info("Usando cv2.VideoCapture estándar para la captura de video.")
-
-            # Esperar un momento para que la cámara se inicialice
-            time.sleep(2.0)
-
-            if not vs.isOpened():
-                logger.error(f"No se pudo abrir la cámara en {self.camera_url}. Verifique la URL y la conexión.")
-                self.stop_event.set() # Señalar un error para detener
+            state = self.snapshotter.load()
+            if state is None:
                 return
 
+            self.totalUp, self.totalDown = (int(v) for v in state["totals"])
+            self.ct.set_state({k[3:]: v for k, v in state.items() if k.startswith("ct_")})
+            try:
+                self.trackableObjects.set_state({k[3:]: v for k, v in state.items() if k.startswith("to_")})
+            except ValueError:
+                # Cambió el historial o las zonas: los objetos empiezan de cero, los totales se conservan
+                logger.warning("Instantánea incompatible con la configuración actual; se restauran solo los totales.")
+            if self.zones is not None and state.get("zone_counts", np.empty(0)).shape == self.zones.counts.shape:
+                self.zones.counts[:] = state["zone_counts"]
         except Exception as e:
-            logger.error(f"Error al inicializar la captura de video: {e}")
-            self.stop_event.set()
+            logger.warning(f"No se pudo restaurar la instantánea de la cámara {self.camera_id}: {e!r}; "
+                           "se empieza con un estado nuevo.")
+            self.totalUp = 0
+            self.totalDown = 0
+            self._new_counting_state()
+            if self.zones is not None:
+                self.zones.counts[:] = 0
             return
+        logger.info(f"Estado restaurado de una instantánea de hace {self.snapshotter.restored_age}s "
+                    f"({self.totalDown} entradas, {self.totalUp} salidas, {len(self.ct.objects)} objetos).")
 
-        fps = FPS().start() # Iniciar el contador de FPS
+    def _forget_object(self, object_id):
+        """
+        Callback del CentroidTracker: descarta el historial de un objeto dado de baja.
+        """
+        self.trackableObjects.remove(object_id)
 
-        while not self.stop_event.is_set():
-            frame = vs.read()
-            # Si usas ThreadingClass, frame es directamente la imagen
-            # Si usas cv2.VideoCapture, frame = frame[1] si el primer elemento es el ret, y el segundo el frame
-            # En la forma actual, vs.read() para VideoCapture devuelve (ret, frame)
-            # Y para ThreadingClass.read() devuelve solo el frame
-            # Necesitamos unificar esto.
-
-            # Si es cv2.VideoCapture, necesitamos extraer el frame y verificar 'ret'
-            if isinstance(vs, cv2.VideoCapture):
-                ret, frame = frame
-                if not ret or frame is None:
-                    logger.warning("No se pudo capturar el frame de la cámara. Reintentando...")
-                    time.sleep(0.5) # Esperar un poco antes de reintentar
-                    continue
-            elif frame is None: # Para ThreadingClass si devuelve None
-                logger.warning("No se recibió frame de ThreadingClass. Reintentando...")
-                time.sleep(0.5)
-                continue
+    def _reconcile(self, rgb, boxes):
+        """
+        Une las detecciones con los trackers actuales: los emparejados por IoU se conservan
+        (o se reinician sobre la detección si se han desviado), los demás se retiran.
+        """
+        self.trackers.reconcile(rgb, boxes,
+                                iouThreshold=self.config.get("reconcile_iou", 0.3),
+                                reseedIoU=self.config.get("reseed_iou", 0.6))
 
+    def _detect_and_track(self, frame, rgb):
+        """
+        Obtiene las cajas del frame actual, ya sea detectando o actualizando los trackers.
+        Devuelve (status, rects).
+        """
+        due = self.scheduler.due(self.totalFrames)
+
+        if self.async_detector is None:
+            # Modo clásico: cada cierto número de frames se detiene el bucle para detectar
+            if due:
+                self.scheduler.mark(self.totalFrames)
+                if self.detection_pool is not None:
+                    # El hilo espera al resultado, así que el worker puede leer `rgb` sin copiarlo
+                    detect = functools.partial(self._detect, rgb=rgb)
+                    boxes = self.detection_pool.submit(detect, frame, camera=self.camera_id).result()
+                else:
+                    boxes = self._detect(frame, rgb=rgb)
+                if self.reconcile_detections:
+                    # Los trackers conservados siguen aportando su posición en este frame
+                    self._reconcile(rgb, boxes)
+                    return "Detectando", self.trackers.rects()
+                self.trackers.reset(rgb, boxes)
+                return "Detectando", []
+            return "Rastreando", self._track(rgb)
+
+        # Modo en pipeline: los trackers avanzan en todos los frames mientras el
+        # detector trabaja en segundo plano sobre una copia de un frame anterior
+        status = "Esperando"
+        rects = []
+        if len(self.trackers) > 0:
+            status = "Rastreando"
+            rects = self._track(rgb)
+
+        # Reconciliar las detecciones que hayan llegado con los trackers actuales. Son de un
+        # frame anterior: se desplazan con el movimiento de los trackers que solapan y, si
+        # son más viejas que `async_max_age` frames, se descartan y se detecta de nuevo
+        result = self.async_detector.poll(self.totalFrames, self.trackers.boxes)
+        if result is not None:
+            (_, boxes) = result
+            if boxes is None:
+                self.stale_detections += 1
+                self.scheduler.force()
+                due = True
+            else:
+                self._reconcile(rgb, boxes)
+                rects = self.trackers.rects()
 
-            frame = imutils.resize(frame, width=500)
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if due and self.async_detector.submit(frame, self.totalFrames, self.trackers.boxes):
+            self.scheduler.mark(self.totalFrames)
+        if self.async_detector.busy:
+            status = "Detectando"
+        return status, rects
 
-            if self.W is None or self.H is None:
-                (self.H, self.W) = frame.shape[:2]
+    def _count_crossings(self, objects, journal):
+        """
+        Actualiza el historial de los objetos del frame y cuenta los que cruzan la línea
+        (o las zonas de conteo configuradas). La decisión "ha cruzado y no estaba contado"
+        se evalúa de forma vectorizada sobre todos los objetos; solo los cruces pasan por
+        el bucle de registro y alertas.
+        """
+        if len(objects) == 0:
+            return
+        object_ids = np.fromiter(objects.keys(), dtype=np.int64, count=len(objects))
+        centroids = np.array(list(objects.values()), dtype=np.int64).reshape(-1, 2)
+        rows, direction = self.trackableObjects.update(object_ids, centroids)
 
-            status = "Esperando"
-            rects = []
+        if self.zones is not None:
+            self._count_zone_crossings(object_ids, rows, centroids, journal)
+            return
 
-            if self.totalFrames % self.config.get("skip_frames", 30) == 0:
-                status = "Detectando"
-                self.trackers = []
+        up, down = line_crossings(self.trackableObjects.counted[rows], direction, centroids, self.H // 2)
+        crossed = np.flatnonzero(up | down)
+        if len(crossed) == 0:
+            return
+        self.trackableObjects.mark_counted(rows[crossed], time.time())
 
-                blob = cv2.dnn.blobFromImage(frame, 0.007843, (self.W, self.H), 127.5)
-                self.net.setInput(blob)
-                detections = self.net.forward()
+        for i in crossed.tolist():
+            self._record_crossing(SALIDA if up[i] else ENTRADA, int(object_ids[i]), journal)
 
-                for i in np.arange(0, detections.shape[2]):
-                    confidence = detections[0, 0, i, 2]
-                    if confidence > self.config.get("confidence", 0.4):
-                        idx = int(detections[0, 0, i, 1])
-                        if self.CLASSES[idx] != "person":
-                            continue
+    def _count_zone_crossings(self, object_ids, rows, centroids, journal):
+        """
+        Cuenta los cruces de las zonas de conteo (líneas y polígonos) con un único test
+        vectorizado sobre el desplazamiento anterior -> actual de cada objeto.
+        Un objeto solo se cuenta de nuevo en una zona si cruza en el sentido contrario.
+        """
+        now = time.time()
+        for (t, z, direction) in zone_crossings(self.trackableObjects, self.zones, rows, centroids, now):
+            self._record_crossing(direction, int(object_ids[t]), journal)
 
-                        box = detections[0, 0, i, 3:7] * np.array([self.W, self.H, self.W, self.H])
-                        (startX, startY, endX, endY) = box.astype("int")
+    def _record_crossing(self, direction, object_id, journal):
+        """
+        Registra un cruce: totales, diario de conteo y alerta por umbral.
+        """
+        date_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+
+        # Contar 'Salidas' (totalUp)
+        if direction == SALIDA:
+            self.totalUp += 1
+            self.move_out_timestamps.append(date_time)
+            if journal is not None:
+                journal.append(SALIDA, object_id)
+            logger.info(f"Persona saliendo: {self.totalUp} salidas")
+            return
 
-                        tracker = dlib.correlation_tracker()
-                        rect = dlib.rectangle(startX, startY, endX, endY)
-                        tracker.start_track(rgb, rect)
-                        self.trackers.append(tracker)
-            else:
-                status = "Rastreando"
-                for tracker in self.trackers:
-                    tracker.update(rgb)
-                    pos = tracker.get_position()
+        # Contar 'Entradas' (totalDown)
+        self.totalDown += 1
+        self.move_in_timestamps.append(date_time)
+        if journal is not None:
+            journal.append(ENTRADA, object_id)
+        logger.info(f"Persona entrando: {self.totalDown} entradas")
+
+        # Alerta por umbral
+        total_inside = self.totalDown - self.totalUp
+        if total_inside >= self.config.get("Threshold", 10) and self.config.get("ALERT", False):
+            logger.info("¡ALERTA: Límite de personas superado!")
+            # Lanza un hilo separado para enviar el correo para no bloquear el procesamiento
+            threading.Thread(target=send_mail_alert,
+                             args=(self.config.get("Email_Receive"), self.config.get("Threshold"))).start()
+
+    def _observe_activity(self, objects, next_object_id, known_objects, min_confidence=None):
+        """
+        Informa al planificador de la actividad del frame: tracks creados o perdidos,
+        tracks cerca de la línea de conteo y confianza de los trackers (`min_confidence`,
+        tomada por la etapa de seguimiento tras actualizarlos).
+        """
+        created = self.ct.nextObjectID - next_object_id
+        lost = known_objects + created - len(objects)
+        near_line = False
+        if len(objects) > 0:
+            cy = np.fromiter((c[1] for c in objects.values()), dtype=float, count=len(objects))
+            near_line = bool((np.abs(cy - self.H // 2) <= self.line_band * self.H).any())
+        signal = (created, lost, near_line, min_confidence)
+        if self.activity_signals is not None:
+            # En el pipeline el planificador es de la etapa de seguimiento: se le envía la señal
+            self.activity_signals.append(signal)
+        else:
+            self.scheduler.observe(*signal)
+
+    def _apply_activity(self):
+        """
+        Etapa de seguimiento del pipeline: aplica al planificador las señales de actividad
+        que ha enviado la etapa de conteo desde el último frame.
+        """
+        while self.activity_signals:
+            self.scheduler.observe(*self.activity_signals.popleft())
 
-                    startX = int(pos.left())
-                    startY = int(pos.top())
-                    endX = int(pos.right())
-                    endY = int(pos.bottom())
-                    rects.append((startX, startY, endX, endY))
+    def get_metrics(self):
+        """
+        Devuelve métricas de rendimiento del servicio (frames procesados, compuerta de movimiento...).
+        """
+        return {
+            "camera_id": self.camera_id,
+            "frames": self.totalFrames,
+            "tracker_engine": self.config.get("tracker_engine", "dlib"),
+            "tracked_objects": len(self.trackers),
+            "trackable_objects": len(self.trackableObjects),
+            "tracker_reuse": self.trackers.stats(),
+            "tracking_ms": self.tracking_time.summary(scale=1000),
+            "motion_gate": self.motion_gate.stats() if self.motion_gate is not None else None,
+            "scheduler": self.scheduler.stats(),
+            "stale_detections": self.stale_detections,
+            "roi_area_ratio": self.roi.area_ratio() if self.roi is not None else None,
+            "zones": self.zones.stats() if self.zones is not None else None,
+            "snapshot": self.snapshotter.stats() if self.snapshotter is not None else None,
+            "capture": self.capture.stats() if self.capture is not None else None,
+            "preprocess": self.preprocessor.stats(),
+            "pipeline": self._pipeline_stats(),
+            "latency": {
+                "budget_ms": round(self.latency_budget * 1000, 1) if self.latency_budget is not None else None,
+                "capture_to_count_ms": self.capture_to_count.summary(scale=1000),
+                "expired_frames": dict(self.expired_frames),
+            },
+        }
+
+    def _read_frame(self, vs):
+        """
+        Etapa de captura: devuelve (frame, timestamp) o None si no se pudo leer. `timestamp` es el
+        instante de captura (time.monotonic()): el de decodificación con ThreadingClass, el de
+        lectura con cv2.VideoCapture.
+        """
+        # cv2.VideoCapture y ThreadingClass devuelven (ret, frame); ThreadingClass
+        # entrega el último frame de su buffer circular (válido hasta la siguiente
+        # lectura) y espera como mucho 1 s para no bloquear la parada del servicio
+        if isinstance(vs, thread.ThreadingClass):
+            ret, frame = vs.read(timeout=1.0)
+        else:
+            ret, frame = vs.read()
+        if not ret or frame is None:
+            logger.warning("No se pudo capturar el frame de la cámara. Reintentando...")
+            time.sleep(0.5) # Esperar un poco antes de reintentar
+            return None
+        if isinstance(vs, thread.ThreadingClass):
+            return frame, vs.lastTimestamp
+        return frame, time.monotonic()
 
-            objects = self.ct.update(rects)
+    def _expired(self, timestamp, stage):
+        """
+        True si, en modo de presupuesto de latencia, el frame capturado en `timestamp` ya es
+        más viejo que el presupuesto y la etapa `stage` debe descartarlo.
+        """
+        if self.latency_budget is None or time.monotonic() - timestamp <= self.latency_budget:
+            return False
+        self.expired_frames[stage] += 1
+        return True
 
-            for (objectID, centroid) in objects.items():
-                to = self.trackableObjects.get(objectID, None)
+    def _prepare_frame(self, frame, slot=None):
+        """
+        Etapa de preprocesado: redimensiona el frame a 500 px de ancho, fija la geometría del
+        stream la primera vez y consulta la compuerta de movimiento. Devuelve (frame, rgb, moving);
+        `rgb` es None si la escena está estática. Sin `slot` se usan los buffers del preprocesador
+        (válidos hasta el siguiente frame); en el pipeline, los buffers propios del slot.
+        """
+        if slot is None:
+            frame = self.preprocessor.resize(frame)
+        else:
+            frame = slot.frame = self.preprocessor.resize(frame, dst=slot.frame)
+
+        if self.W is None or self.H is None:
+            (self.H, self.W) = frame.shape[:2]
+            if self.roi is not None:
+                self.roi.setup(self.W, self.H)
+            if self.zones is not None:
+                self.zones.setup(self.W, self.H)
+
+        moving = self.motion_gate is None or self.motion_gate.update(frame)
+        rgb = None
+        if moving:
+            if slot is None:
+                rgb = self.preprocessor.to_rgb()
+            else:
+                rgb = slot.rgb = self.preprocessor.to_rgb(frame, dst=slot.rgb)
+        return frame, rgb, moving
 
-                if to is None:
-                    to = TrackableObject(objectID, centroid)
-                else:
-                    y = [c[1] for c in to.centroids]
-                    direction = centroid[1] - np.mean(y)
-                    to.centroids.append(centroid)
-
-                    if not to.counted:
-                        # Contar 'Salidas' (totalUp)
-                        if direction < 0 and centroid[1] < self.H // 2:
-                            self.totalUp += 1
-                            date_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-                            self.move_out_timestamps.append(date_time)
-                            to.counted = True
-                            logger.info(f"Persona saliendo: {self.totalUp} salidas")
-
-                        # Contar 'Entradas' (totalDown)
-                        elif direction > 0 and centroid[1] > self.H // 2:
-                            self.totalDown += 1
-                            date_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-                            self.move_in_timestamps.append(date_time)
-                            to.counted = True
-                            logger.info(f"Persona entrando: {self.totalDown} entradas")
-
-                            # Alerta por umbral
-                            total_inside = self.totalDown - self.totalUp
-                            if total_inside >= self.config.get("Threshold", 10) and self.config.get("ALERT", False):
-                                logger.info("¡ALERTA: Límite de personas superado!")
-                                # Lanza un hilo separado para enviar el correo para no bloquear el procesamiento
-                                threading.Thread(target=send_mail_alert,
-                                                 args=(self.config.get("Email_Receive"), self.config.get("Threshold"))).start()
-
-
-                self.trackableObjects[objectID] = to
-
-            # Calcular total dentro
-            total_inside = self.totalDown - self.totalUp
+    def _track_frame(self, frame, rgb, moving):
+        """
+        Etapa de detección y seguimiento. Devuelve (status, rects, min_confidence).
+        """
+        if not moving:
+            # Escena estática: ni detección ni seguimiento, las cajas se mantienen
+            status, rects = "Sin movimiento", self.trackers.rects()
+            self.motion_idle = True
+        else:
+            if self.motion_idle:
+                # Al volver el movimiento se detecta de inmediato
+                self.scheduler.force()
+                self.motion_idle = False
+            status, rects = self._detect_and_track(frame, rgb)
+        self.scheduler.tick()
+        self.totalFrames += 1
+        return status, rects, self.trackers.min_confidence()
+
+    def _count_frame(self, rects, min_confidence, journal, timestamp):
+        """
+        Etapa de conteo: asociación de centroides, cruces de la línea o de las zonas, diario
+        e instantánea del estado. Devuelve los totales (totalUp, totalDown) tras el frame y
+        registra la latencia desde la captura del frame (`timestamp`) hasta su conteo.
+        """
+        known_objects = len(self.ct.objects)
+        next_object_id = self.ct.nextObjectID
+        objects = self.ct.update(rects)
+        self._observe_activity(objects, next_object_id, known_objects, min_confidence)
+
+        self._count_crossings(objects, journal)
+        self.capture_to_count.add(time.monotonic() - timestamp)
+
+        # El diario solo escribe cuando hay cruces pendientes con suficiente antigüedad
+        if journal is not None:
+            journal.maybe_flush()
+        if self.snapshotter is not None:
+            self.snapshotter.maybe_save(self._snapshot_state)
+        return self.totalUp, self.totalDown
+
+    def _publish(self, total_up, total_down, status):
+        """
+        Etapa de publicación: entrega los contadores al callback de FastAPI.
+        """
+        # Calcular total dentro
+        total_inside = total_down - total_up
+        self.update_callback(total_up, total_down, total_inside, status)
+
+    def _run_serial(self, vs, journal, fps):
+        """
+        Bucle clásico: todas las etapas se ejecutan en orden en el hilo del servicio.
+        """
+        while not self.stop_event.is_set():
+            captured = self._read_frame(vs)
+            if captured is None:
+                continue
+            frame, timestamp = captured
+            if self._expired(timestamp, "preprocess"):
+                continue
+
+            frame, rgb, moving = self._prepare_frame(frame)
+            status, rects, min_confidence = self._track_frame(frame, rgb, moving)
+            total_up, total_down = self._count_frame(rects, min_confidence, journal, timestamp)
 
             # Actualizar los contadores en el hilo principal de FastAPI de forma segura
-            self.update_callback(self.totalUp, self.totalDown, total_inside, status)
+            self._publish(total_up, total_down, status)
 
             # --- Eliminado: cv2.imshow(), cv2.waitKey() ---
             # La visualización ahora será responsabilidad de Flutter
 
-            # Actualizar el log de datos (esto podría ser más eficiente o manejado por report_generator)
-            if self.config.get("Log", False):
-                log_counting_data(
-                    list(range(1, self.totalDown + 1)), # Simular lista para Entradas
-                    self.move_in_timestamps,
-                    list(range(1, self.totalUp + 1)),   # Simular lista para Salidas
-                    self.move_out_timestamps
-                )
-
-            self.totalFrames += 1
             fps.update()
 
             # Lógica de "Timer" si está habilitada (similar a lo que estaba en people_counter.py)
@@ -301,11 +660,195 @@ class PeopleCounterService:
                 pass # Por ahora, omitimos la lógica de temporizador dentro del bucle de frames.
                      # Es mejor que el "scheduler" o el "main" de FastAPI gestionen cuándo se detiene.
 
-        # Fuera del bucle while not self.stop_event.is_set():
+    def _run_pipeline(self, vs, journal, fps):
+        """
+        Pipeline por etapas, cada una en su propio hilo y unidas por colas acotadas:
+        captura -> preprocesado -> detección/seguimiento -> conteo -> publicación.
+
+        Cada etapa es dueña de su estado (la compuerta de movimiento en el preprocesado; los
+        trackers y el planificador en el seguimiento; el CentroidTracker, el almacén de objetos,
+        el diario y la instantánea en el conteo) y se comunican solo por colas: la actividad que
+        observa el conteo vuelve al planificador por `activity_signals`, que la etapa de
+        seguimiento vacía antes de cada frame. Las dimensiones del frame las fija el preprocesado
+        una sola vez, antes de que el primer frame llegue al conteo. Los frames viajan en slots
+        preasignados que se reciclan en cuanto el seguimiento termina con ellos: si se agotan, la
+        captura espera (contrapresión).
+
+        Devuelve False si alguna etapa sigue viva tras pedir la parada: su estado no se puede
+        leer sin riesgo (p. ej. para la instantánea final).
+
+        Política de las colas con frames (`pipeline.drop_policy`): "block" propaga la espera
+        hasta la captura (y ThreadingClass descarta entonces los frames viejos) y "drop_oldest"
+        descarta el frame más antiguo en espera. La cola hacia el conteo siempre bloquea para
+        no romper la continuidad de los IDs, y la de publicación solo guarda los últimos totales.
+        """
+        settings = self.config.get("pipeline", {})
+        queue_size = int(settings.get("queue_size", 2))
+        policy = settings.get("drop_policy", BLOCK)
+        # En modo de presupuesto de latencia las colas con frames nunca bloquean y cada etapa
+        # salta al frame más reciente; los frames caducados se descartan en cada etapa
+        freshest = self.latency_budget is not None
+        if freshest:
+            policy = DROP_OLDEST
+
+        # Slots suficientes para llenar las dos colas con frames y uno por etapa en curso
+        free = queue.Queue()
+        for _ in range(2 * queue_size + 4):
+            free.put(FrameSlot())
+        frames = StageQueue("preprocess", queue_size, policy, on_drop=free.put, freshest=freshest)
+        prepared = StageQueue("track", queue_size, policy, on_drop=free.put, freshest=freshest)
+        tracked = StageQueue("count", queue_size, BLOCK)
+        counted = StageQueue("publish", 1, DROP_OLDEST)
+        self.activity_signals = deque()
+
+        def capture(_):
+            try:
+                slot = free.get(timeout=0.1)
+            except queue.Empty:
+                return None
+            captured = self._read_frame(vs)
+            if captured is None:
+                free.put(slot)
+                return None
+            (frame, slot.timestamp) = captured
+            # Copia al slot: el buffer de ThreadingClass se reutiliza en la siguiente lectura
+            if slot.raw is None or slot.raw.shape != frame.shape:
+                slot.raw = np.empty_like(frame)
+            np.copyto(slot.raw, frame)
+            return slot
+
+        def preprocess(slot):
+            if self._expired(slot.timestamp, "preprocess"):
+                free.put(slot)
+                return None
+            (_, _, slot.moving) = self._prepare_frame(slot.raw, slot)
+            return slot
+
+        def track(slot):
+            self._apply_activity()
+            if self._expired(slot.timestamp, "track"):
+                free.put(slot)
+                return None
+            (status, rects, min_confidence) = self._track_frame(
+                slot.frame, slot.rgb if slot.moving else None, slot.moving)
+            timestamp = slot.timestamp
+            free.put(slot)
+            return (status, rects, min_confidence, timestamp)
+
+        def count(item):
+            (status, rects, min_confidence, timestamp) = item
+            (total_up, total_down) = self._count_frame(rects, min_confidence, journal, timestamp)
+            return (status, total_up, total_down)
+
+        def publish(item):
+            (status, total_up, total_down) = item
+            self._publish(total_up, total_down, status)
+            fps.update()
+            return item
+
+        stop = self.stop_event
+        self.pipeline_stages = [
+            PipelineStage("capture", capture, stop, outbox=frames),
+            PipelineStage("preprocess", preprocess, stop, inbox=frames, outbox=prepared),
+            PipelineStage("track", track, stop, inbox=prepared, outbox=tracked),
+            PipelineStage("count", count, stop, inbox=tracked, outbox=counted),
+            PipelineStage("publish", publish, stop, inbox=counted),
+        ]
+        self.pipeline_queues = [frames, prepared, tracked, counted]
+        logger.info(f"Pipeline por etapas habilitado (colas de {queue_size}, política '{policy}').")
+        for stage in self.pipeline_stages:
+            stage.start()
+
+        self.stop_event.wait()
+        stopped = True
+        for stage in self.pipeline_stages:
+            stage.join(timeout=2.0)
+            if stage.error is not None:
+                logger.error(f"Error en la etapa '{stage.name}' del pipeline: {stage.error!r}")
+            if stage.is_alive():
+                logger.error(f"La etapa '{stage.name}' del pipeline no se detuvo a tiempo.")
+                stopped = False
+        return stopped
+
+    def _pipeline_stats(self):
+        """
+        Rendimiento de cada etapa y profundidad de cada cola del pipeline (None sin pipeline).
+        """
+        if not self.pipeline_stages:
+            return None
+        return {
+            "stages": {stage.name: stage.stats() for stage in self.pipeline_stages},
+            "queues": {q.name: q.stats() for q in self.pipeline_queues},
+        }
+
+    def run(self):
+        """
+        Bucle principal para la lectura de frames y el procesamiento.
+        """
+        logger.info("Iniciando la transmisión de video...")
+        try:
+            if self.config.get("Thread", False):
+                # Usar tu ThreadingClass para la lectura de frames
+                # Con `capture_fps` el hilo lector hace grab() de todos los frames para
+                # vaciar el stream, pero solo decodifica (retrieve()) los que se van a procesar
+                capture_fps = self.config.get("capture_fps")
+                vs = thread.ThreadingClass(self.camera_url, fps=capture_fps)
+                self.capture = vs
+                logger.info("Usando ThreadingClass para la captura de video"
+                            + (f" (decodificando hasta {capture_fps} FPS)." if capture_fps else "."))
+            else:
+                vs = cv2.VideoCapture(self.camera_url)
+                logger.info("Usando cv2.VideoCapture estándar para la captura de video.")
+                if self.config.get("capture_fps"):
+                    logger.warning("`capture_fps` requiere `Thread`: se decodificarán todos los frames.")
+                if self.latency_budget is not None:
+                    logger.warning("`latency_budget` sin `Thread`: el búfer de cv2.VideoCapture no permite "
+                                   "saltar al frame más reciente y la latencia se mide desde la lectura.")
+
+            if not vs.isOpened():
+                logger.error(f"No se pudo abrir la cámara en {self.camera_url}. Verifique la URL y la conexión.")
+                vs.release()
+                self.stop_event.set() # Señalar un error para detener
+                return
+
+        except Exception as e:
+            logger.error(f"Error al inicializar la captura de video: {e}")
+            self.stop_event.set()
+            return
+
+        journal = open_counting_journal(self.config, self.camera_id)
+        if self.config.get("async_detection", False):
+            self.async_detector = AsyncDetector(self._detect, executor=self.detection_pool,
+                                                camera=self.camera_id,
+                                                maxAge=self.config.get("async_max_age", 15),
+                                                iouThreshold=self.config.get("reconcile_iou", 0.3))
+            logger.info("Detección asíncrona habilitada: el seguimiento no espera a net.forward().")
+        fps = FPS().start() # Iniciar el contador de FPS
+
+        stopped = True
+        if self.config.get("pipeline", {}).get("enabled", False):
+            stopped = self._run_pipeline(vs, journal, fps)
+        else:
+            self._run_serial(vs, journal, fps)
+
+        # Fuera del bucle de frames
         fps.stop()
         logger.info("Tiempo transcurrido: {:.2f}".format(fps.elapsed()))
         logger.info("FPS aproximado: {:.2f}".format(fps.fps()))
 
+        # Si la etapa de conteo sigue viva, el diario y el estado aún son suyos: no se tocan
+        if not stopped:
+            logger.warning("Pipeline sin detener: se omiten el cierre del diario y la instantánea final.")
+        elif journal is not None:
+            journal.close()
+
+        if self.snapshotter is not None and stopped:
+            self.snapshotter.save(self._snapshot_state())
+
+        if self.async_detector is not None:
+            self.async_detector.close()
+            self.async_detector = None
+
         if isinstance(vs, thread.ThreadingClass):
             vs.release()
         elif isinstance(vs, cv2.VideoCapture):
@@ -1,5 +1,4 @@
 # backend_conteo_personas/report_service.py
-import csv
 import smtplib
 import json
 from email.mime.text import MIMEText
@@ -7,6 +6,7 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
 from datetime import datetime
+from utils.journal import JOURNAL_PATH, count_events
 import os
 import logging # Añadimos logging para mejor trazabilidad
 
@@ -14,7 +14,7 @@ import logging # Añadimos logging para mejor trazabilidad
 logger = logging.getLogger(__name__)
 
 # Rutas de los archivos (relativas a donde se ejecuta el main.py de FastAPI)
-CSV_PATH = "utils/data/logs/counting_data.csv"
+CSV_PATH = JOURNAL_PATH # Diario de conteo (un registro por cruce)
 SCHEDULE_CONFIG_PATH = "utils/schedule_config.json" # Renombrado para consistencia
 EMAIL_CONFIG_PATH = "utils/config.json"
 
@@ -36,19 +36,11 @@ def generar_resumen_html():
         logger.warning(f"No hay archivo CSV de datos de conteo en {CSV_PATH}. No se puede generar resumen.")
         return "<p>No hay datos disponibles para hoy.</p>"
 
-    entradas = 0
-    salidas = 0
-
     try:
-        with open(CSV_PATH, newline='') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                # Asegurarse de que las claves existan antes de acceder
-                if row.get("Entradas") and row["Entradas"].strip():
-                    entradas += int(row["Entradas"])
-                if row.get("Salidas") and row["Salidas"].strip():
-                    salidas += int(row["Salidas"])
-        
+        # Cada fila del diario es un cruce: se cuentan por dirección. El diario puede
+        # acumular varios días (si falló un envío no se borra), así que solo se resume hoy
+        entradas, salidas = count_events(CSV_PATH, day=datetime.now().date())
+
         # Eliminar el archivo CSV después de generar el resumen para un nuevo día
         # Opcional: Podrías querer moverlo a una carpeta de históricos en lugar de borrarlo
         # os.remove(CSV_PATH) 
@@ -0,0 +1,113 @@
+import json
+import os
+import sys
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+# the modules are imported as in the service, relative to backend_conteo_personas/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detector.backends import BACKENDS, DetectorBackend, register_backend
+from detector.cache import MODEL_CACHE
+from detector.postprocess import PERSON_CLASS
+
+
+@pytest.fixture
+def ssd_output():
+    # build a raw MobileNet SSD output, shaped (1, 1, N, 7), from rows of
+    # (classID, score, startX, startY, endX, endY) in relative coordinates
+    def build(*rows):
+        detections = np.zeros((1, 1, len(rows), 7), dtype=np.float32)
+        if rows:
+            detections[0, 0, :, 1:] = rows
+        return detections
+    return build
+
+
+class BlobDetector(DetectorBackend):
+    """ Detector backend without a model: every bright blob of the input
+    is a person. Counts its forward passes and the images they held. """
+
+    def __init__(self, settings, **kwargs):
+        super().__init__(settings, **kwargs)
+        self.forwards = []
+
+    def forward(self, blob):
+        self.forwards.append(len(blob))
+        (H, W) = blob.shape[2:]
+        rows = []
+        for (i, image) in enumerate(blob):
+            mask = (image[0] > 0.5).astype(np.uint8)
+            (_, _, stats, _) = cv2.connectedComponentsWithStats(mask)
+            for (x, y, w, h, area) in stats[1:]:
+                if area > 20:
+                    rows.append((i, PERSON_CLASS, 0.99, x / W, y / H, (x + w) / W, (y + h) / H))
+        return np.array(rows, dtype=np.float32).reshape(1, 1, -1, 7)
+
+
+@pytest.fixture
+def blob_backend():
+    # register BlobDetector as the "blob" backend, with an empty model cache
+    register_backend("blob")(BlobDetector)
+    MODEL_CACHE.clear()
+    yield BlobDetector
+    MODEL_CACHE.clear()
+    BACKENDS.pop("blob", None)
+
+
+@pytest.fixture
+def person_frame():
+    # black frame with a white rectangle per (startX, startY, endX, endY) box
+    def build(boxes, shape=(240, 320)):
+        frame = np.zeros(shape + (3,), dtype=np.uint8)
+        for (startX, startY, endX, endY) in boxes:
+            frame[startY:endY, startX:endX] = 255
+        return frame
+    return build
+
+
+@pytest.fixture(scope="session")
+def walking_video(tmp_path_factory):
+    # short MJPG clip of two white "people" walking across the frame,
+    # one down and one up
+    path = str(tmp_path_factory.mktemp("video") / "walking.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (320, 240))
+    for i in range(90):
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        frame[10 + 2 * i:50 + 2 * i, 60:80] = 255
+        frame[190 - 2 * i:230 - 2 * i, 220:240] = 255
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def counting_config(blob_backend, walking_video):
+    # the shipped config.json, counting on `walking_video` with the blob
+    # backend and without logs, mails or snapshots
+    with open(os.path.join(os.path.dirname(os.path.dirname(__file__)), "utils", "config.json")) as f:
+        config = json.load(f)
+    config.update({"url": walking_video, "Log": False, "ALERT": False, "Thread": False,
+                   "cameras": [], "detection_workers": 1, "skip_frames": 5, "confidence": 0.5})
+    config["detector"] = {"backend": "blob"}
+    return config
+
+
+@pytest.fixture
+def make_service(counting_config):
+    # build PeopleCounterService instances (not started) on `counting_config`
+    # with extra settings; the service needs dlib for its correlation trackers
+    pytest.importorskip("dlib")
+    from people_counter_service import PeopleCounterService
+
+    def build(**settings):
+        config = dict(counting_config, **settings)
+        updates = []
+        service = PeopleCounterService(config["url"], lambda *counts: updates.append(counts),
+                                       threading.Event(), config)
+        service.updates = updates
+        return service
+    return build
@@ -0,0 +1,34 @@
+import numpy as np
+
+from detector.async_detector import AsyncDetector, follow_motion
+
+
+def test_follow_motion_moves_detections_with_their_track():
+    before = np.array([[0, 0, 20, 40], [100, 0, 120, 40]])
+    after = before + [[5, 2, 5, 2], [-3, 0, -3, 0]]
+    boxes = np.array([[101, 1, 121, 41], [300, 0, 320, 40], [1, 0, 21, 40]])
+    shifted = follow_motion(boxes, before, after)
+    assert shifted.tolist() == [[98, 1, 118, 41], [300, 0, 320, 40], [6, 2, 26, 42]]
+
+    # the tracks changed since the detection: nothing to follow
+    assert follow_motion(boxes, before, after[:1]).tolist() == boxes.tolist()
+    assert follow_motion(np.empty((0, 4)), before, after).shape == (0, 4)
+
+
+def test_poll_aligns_or_drops_late_results():
+    boxes = np.array([[0, 0, 20, 40]])
+    detector = AsyncDetector(lambda frame: boxes, maxAge=10)
+    try:
+        frame = np.zeros((4, 4, 3), dtype=np.uint8)
+        assert detector.submit(frame, 100, trackBoxes=boxes)
+        assert not detector.submit(frame, 101)
+        detector.future.result()
+        (index, result) = detector.poll(105, boxes + 4)
+        assert index == 100 and result.tolist() == [[4, 4, 24, 44]]
+        assert not detector.busy and detector.poll(106) is None
+
+        detector.submit(frame, 200, trackBoxes=boxes)
+        detector.future.result()
+        assert detector.poll(211, boxes) == (200, None)
+    finally:
+        detector.close()
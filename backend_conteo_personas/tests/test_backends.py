@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from detector.backends import (BACKENDS, CaffeBackend, DetectorBackend, ONNXBackend,
+                               available_backends, create_detector)
+
+
+def test_create_detector_picks_the_configured_backend(blob_backend):
+    detector = create_detector({"backend": "blob", "input_size": [300, 300], "threads": 2},
+                               confidence=0.6, nmsThreshold=0.3)
+    assert isinstance(detector, blob_backend) and detector.name == "blob"
+    assert detector.inputSize == (300, 300) and detector.threads == 2
+    assert (detector.confidence, detector.nmsThreshold) == (0.6, 0.3)
+    assert "blob" in available_backends()
+
+
+def test_backends_keep_their_preprocessing_defaults():
+    assert {"caffe", "onnx", "onnxruntime"} <= set(BACKENDS)
+    assert (CaffeBackend.inputSize, CaffeBackend.swapRB, CaffeBackend.supportsBatch) == (None, False, True)
+    assert (ONNXBackend.inputSize, ONNXBackend.swapRB) == ((300, 300), True)
+
+
+def test_unknown_unavailable_and_missing_backends(monkeypatch, tmp_path):
+    with pytest.raises(ValueError):
+        create_detector({"backend": "tensorrt"})
+
+    monkeypatch.setattr(BACKENDS["onnxruntime"], "available", classmethod(lambda cls: False))
+    with pytest.raises(RuntimeError):
+        create_detector({"backend": "onnxruntime", "model": "ssd.onnx"})
+    assert "onnxruntime" not in available_backends()
+
+    # without a "backend" key the Caffe model is used
+    with pytest.raises(FileNotFoundError):
+        create_detector({"prototxt": str(tmp_path / "missing.prototxt")})
+
+
+def test_detect_uses_the_session_thresholds(blob_backend, person_frame):
+    detector = create_detector({"backend": "blob"}, confidence=0.995)
+    frame = person_frame([(10, 10, 40, 90), (100, 20, 130, 100)])
+    assert len(detector.detect(frame)) == 0
+    boxes = detector.detect(frame, confidence=0.5)
+    assert sorted(boxes.tolist()) == [[10, 10, 40, 90], [100, 20, 130, 100]]
+
+
+def test_detect_batch_falls_back_to_one_pass_per_frame(blob_backend, person_frame):
+    frames = [person_frame([(10, 10, 40, 90)]), person_frame([(100, 20, 130, 100), (200, 20, 230, 100)])]
+    thresholds = [(0.5, None)] * 2
+
+    single = create_detector({"backend": "blob"})
+    assert [len(b) for b in single.detect_batch(frames, thresholds)] == [1, 2]
+    assert single.forwards == [1, 1]
+
+    batched = create_detector({"backend": "blob", "batch": True})
+    results = batched.detect_batch(frames, thresholds)
+    assert batched.forwards == [2]
+    for (a, b) in zip(results, single.detect_batch(frames, thresholds)):
+        np.testing.assert_array_equal(a, b)
@@ -0,0 +1,63 @@
+from detector.batching import BatchingDetector
+from utils.preprocess import FramePreprocessor
+
+
+def detect(frame, detector):
+    return detector.detect(frame, 0.5, None)
+
+
+def run_batch(batcher, frames):
+    # submit all the frames at once and wait for their boxes
+    batcher.detector.forwards.clear()
+    futures = [batcher.submit(detect, frame, camera=str(i)) for (i, frame) in enumerate(frames)]
+    return [future.result(timeout=5) for future in futures]
+
+
+def test_each_camera_gets_the_boxes_of_its_frame(blob_backend, person_frame):
+    batcher = BatchingDetector({"backend": "blob", "batch": True}, maxBatch=8, maxWaitMs=200)
+    try:
+        people = [[(10, 10, 40, 90)], [], [(100, 20, 130, 100), (200, 20, 230, 100)]]
+        results = run_batch(batcher, [person_frame(boxes) for boxes in people])
+        assert [sorted(r.tolist()) for r in results] == [sorted(map(list, b)) for b in people]
+        assert batcher.detector.forwards == [3]
+        assert batcher.stats()["batch_sizes"]
+        assert set(batcher.stats()["queue_delay_ms"]) == {"0", "1", "2"}
+    finally:
+        batcher.shutdown()
+
+
+def test_batches_are_split_by_size_and_resolution(blob_backend, person_frame):
+    batcher = BatchingDetector({"backend": "blob", "batch": True}, maxBatch=2, maxWaitMs=200)
+    try:
+        run_batch(batcher, [person_frame([(10, 10, 40, 90)]) for _ in range(5)])
+        assert sorted(batcher.detector.forwards) == [1, 2, 2]
+
+        frames = [person_frame([(10, 10, 40, 90)]), person_frame([(10, 10, 40, 90)], shape=(120, 160))]
+        results = run_batch(batcher, frames)
+        # without a fixed input size every resolution gets its own blob
+        assert batcher.detector.forwards == [1, 1]
+        assert [len(r) for r in results] == [1, 1]
+    finally:
+        batcher.shutdown()
+
+
+def test_cameras_can_queue_their_own_blobs(blob_backend, person_frame):
+    batcher = BatchingDetector({"backend": "blob", "batch": True}, maxBatch=8, maxWaitMs=200)
+    preprocessors = [FramePreprocessor(width=320) for _ in range(3)]
+
+    def detect_blob(pre):
+        def detect(frame, detector):
+            return detector.detect_blob(pre.blob(detector, frame), 320, 240, 0.5, None)
+        return detect
+
+    try:
+        batcher.detector.forwards.clear()
+        people = [[(10, 10, 40, 90)], [], [(100, 20, 130, 100), (200, 20, 230, 100)]]
+        futures = [batcher.submit(detect_blob(pre), person_frame(boxes), camera=str(i))
+                   for (i, (pre, boxes)) in enumerate(zip(preprocessors, people))]
+        results = [future.result(timeout=5) for future in futures]
+        assert [sorted(r.tolist()) for r in results] == [sorted(map(list, b)) for b in people]
+        assert batcher.detector.forwards == [3]
+        assert [pre.blobs for pre in preprocessors] == [1, 1, 1]
+    finally:
+        batcher.shutdown()
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+pytest.importorskip("dlib")
+
+from camera_manager import CameraManager
+from detector.cache import MODEL_CACHE
+
+
+@pytest.fixture
+def manager(counting_config):
+    manager = CameraManager(config_loader=lambda: counting_config)
+    yield manager
+    manager.stop_all()
+    if manager.pool is not None:
+        manager.pool.shutdown()
+
+
+def test_start_reports_the_model_load(manager, counting_config):
+    first = manager.start()
+    assert not first["already_running"]
+    assert first["model_cache_hit"] is False and first["model_load_ms"] >= 0
+    assert manager.start()["already_running"]
+    assert manager.stop()
+
+    # a restart, even through a new manager, reuses the warmed model
+    again = manager.start()
+    assert again["model_cache_hit"] is True and again["model_load_ms"] == 0
+    other = CameraManager(config_loader=lambda: counting_config)
+    try:
+        assert other.start()["model_cache_hit"] is True
+    finally:
+        other.stop_all()
+        other.pool.shutdown()
+
+
+@pytest.mark.parametrize("cameras, workers", [([], 1), ([{"id": "1"}, {"id": "2"}], 3)])
+def test_pool_is_sized_from_the_cameras(counting_config, monkeypatch, cameras, workers):
+    monkeypatch.setattr("os.cpu_count", lambda: 8)
+    counting_config.update({"cameras": cameras, "detection_workers": None})
+    manager = CameraManager(config_loader=lambda: counting_config)
+    try:
+        manager.warmup()
+        assert manager.pool.workers == workers
+        assert manager.pool.settings["threads"] == 8 // workers
+        assert MODEL_CACHE.stats()["models"] == workers
+    finally:
+        manager.pool.shutdown()
+
+
+@pytest.mark.parametrize("settings", [{}, {"async_detection": True}])
+def test_pool_detections_use_the_preallocated_blob(manager, counting_config, settings):
+    counting_config.update(settings)
+    manager.start()
+    deadline = time.monotonic() + 10
+    while manager.metrics("0")["frames"] < 60 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    stats = manager.metrics("0")["preprocess"]
+    assert stats["frames"] >= 60
+    assert stats["blobs"] > 0
+    # resized frame, RGB frame and blob, allocated once for the whole clip
+    assert stats["allocations"] == 3
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from tracker.centroidtracker import CentroidTracker
+
+
+def boxes_at(centroids, half=(10, 20)):
+    centroids = np.asarray(centroids, dtype=int).reshape(-1, 2)
+    return np.hstack([centroids - half, centroids + half])
+
+
+def crowd(objects=60, frames=40, seed=1):
+    # people on a regular grid (so no two pairs are at the same
+    # distance) walking with small random steps, with a few misses
+    rng = np.random.default_rng(seed)
+    (gx, gy) = np.meshgrid(np.arange(objects // 6), np.arange(6))
+    position = np.stack([gx.ravel(), gy.ravel()], axis=1) * 120.0 + 40
+    for _ in range(frames):
+        position += rng.uniform(-4, 4, size=position.shape)
+        visible = rng.random(len(position)) >= 0.1
+        yield boxes_at(position[visible])
+
+
+def test_update_registers_and_follows_objects():
+    ct = CentroidTracker(maxDistance=50)
+    objects = ct.update(boxes_at([[50, 50], [200, 200]]))
+    assert {k: tuple(v) for k, v in objects.items()} == {0: (50, 50), 1: (200, 200)}
+
+    objects = ct.update(boxes_at([[210, 195], [60, 45]]))
+    assert {k: tuple(v) for k, v in objects.items()} == {0: (60, 45), 1: (210, 195)}
+    assert ct.nextObjectID == 2
+
+
+def test_assignment_is_optimal_not_greedy():
+    # a greedy match gives input 5 to the closest object (8) and leaves
+    # object 0 without a partner within maxDistance; the optimal
+    # assignment keeps both objects
+    ct = CentroidTracker(maxDistance=40)
+    ct.update(boxes_at([[0, 100], [8, 100]]))
+    objects = ct.update(boxes_at([[5, 100], [45, 100]]))
+    assert {k: tuple(v) for k, v in objects.items()} == {0: (5, 100), 1: (45, 100)}
+    assert ct.nextObjectID == 2
+
+
+def test_far_input_is_a_new_object():
+    ct = CentroidTracker(maxDisappeared=5, maxDistance=50)
+    ct.update(boxes_at([[50, 50]]))
+    objects = ct.update(boxes_at([[300, 50]]))
+    assert sorted(objects) == [0, 1]
+    assert ct.disappeared == {0: 1, 1: 0}
+
+
+def test_missing_objects_are_deregistered():
+    gone = []
+    ct = CentroidTracker(maxDisappeared=2, onDeregister=gone.append)
+    ct.update(boxes_at([[50, 50], [200, 200]]))
+    for _ in range(2):
+        ct.update(boxes_at([[50, 50]]))
+    assert sorted(ct.objects) == [0, 1] and gone == []
+    ct.update([])
+    assert sorted(ct.objects) == [0]
+    assert gone == [1]
+
+
+def test_arrays_grow_past_the_initial_capacity():
+    ct = CentroidTracker(capacity=4)
+    centroids = [[100 * i + 50, 50] for i in range(10)]
+    ct.update(boxes_at(centroids))
+    objects = ct.update(boxes_at(centroids))
+    assert len(objects) == 10 and ct.nextObjectID == 10
+
+
+def test_state_round_trip():
+    ct = CentroidTracker(maxDisappeared=5)
+    ct.update(boxes_at([[50, 50], [200, 200], [400, 100]]))
+    ct.update(boxes_at([[55, 50], [400, 105]]))
+
+    restored = CentroidTracker(maxDisappeared=5)
+    restored.set_state(ct.get_state())
+    assert restored.disappeared == ct.disappeared
+    assert restored.nextObjectID == ct.nextObjectID
+
+    rects = boxes_at([[60, 52], [205, 200], [320, 320]])
+    a = ct.update(rects)
+    b = restored.update(rects)
+    assert {k: tuple(v) for k, v in a.items()} == {k: tuple(v) for k, v in b.items()}
+
+
+def test_grid_matches_dense_when_forced():
+    dense = CentroidTracker(maxDisappeared=5, maxDistance=50, association="dense")
+    grid = CentroidTracker(maxDisappeared=5, maxDistance=50, association="grid", gridMinPairs=0)
+    calls = []
+    match_grid = grid.match_grid
+    grid.match_grid = lambda *a: calls.append(1) or match_grid(*a)
+
+    for rects in crowd():
+        a = dense.update(rects)
+        b = grid.update(rects)
+        assert a.keys() == b.keys()
+        for objectID in a:
+            assert tuple(a[objectID]) == tuple(b[objectID])
+    assert calls, "the grid path never ran"
+    assert dense.nextObjectID == grid.nextObjectID
+
+
+def test_grid_falls_back_to_dense_below_threshold():
+    ct = CentroidTracker(association="grid")
+    ct.match_grid = lambda *a: pytest.fail("grid path used for a small frame")
+    ct.update(boxes_at([[50, 50], [200, 200]]))
+    ct.update(boxes_at([[55, 52], [205, 198]]))
+    assert len(ct.objects) == 2
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("dlib")
+
+from tracker.correlation import CorrelationTrackerSet
+
+
+def people(n):
+    return [(20 + 35 * i, 40 + 5 * i, 45 + 35 * i, 100 + 5 * i) for i in range(n)]
+
+
+def test_threaded_updates_keep_the_tracker_order(person_frame):
+    frame = person_frame(people(8))
+    (single, threaded) = (CorrelationTrackerSet(threads=1), CorrelationTrackerSet(threads=4))
+    for tracks in (single, threaded):
+        tracks.reset(frame, people(8))
+    for _ in range(3):
+        assert threaded.update(frame) == single.update(frame)
+    np.testing.assert_array_equal(threaded.confidences, single.confidences)
+    assert threaded.min_confidence() == single.min_confidence()
+    # pools are shared by the tracker sets with the same size
+    assert CorrelationTrackerSet(threads=4).executor is threaded.executor
+
+
+def test_reconcile_counts_kept_reseeded_retired_and_created(person_frame):
+    frame = person_frame([])
+    tracks = CorrelationTrackerSet()
+    tracks.reset(frame, [(0, 0, 30, 60), (100, 0, 130, 60), (200, 0, 230, 60)])
+    originals = list(tracks.trackers)
+
+    tracks.reconcile(frame, [
+        (1, 0, 31, 60),        # matches the first tracker: kept as is
+        (110, 0, 140, 60),     # overlaps the second one below reseed_iou: re-seeded
+        (300, 100, 330, 160),  # no tracker: a new one
+    ], iouThreshold=0.3, reseedIoU=0.6)   # the third tracker is retired
+
+    assert tracks.stats() == {"kept": 1, "reseeded": 1, "retired": 1, "created": 4}
+    assert tracks.trackers[0] is originals[0]
+    assert tracks.trackers[1] is not originals[1]
+    assert tracks.boxes.tolist() == [[0, 0, 30, 60], [110, 0, 140, 60], [300, 100, 330, 160]]
+
+    # without tracks (or without detections) reconciling is a reset
+    tracks.reconcile(frame, [])
+    assert len(tracks) == 0 and tracks.stats()["retired"] == 4
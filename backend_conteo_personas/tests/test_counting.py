@@ -0,0 +1,38 @@
+import numpy as np
+
+from tracker.trackableobject import TrackableStore
+from utils.counting import line_crossings, zone_crossings
+from utils.journal import ENTRADA, SALIDA
+from utils.zones import CountingZones
+
+
+def test_line_crossings():
+    counted = np.array([False, False, True, False])
+    direction = np.array([-5.0, 5.0, 5.0, np.nan])
+    centroids = np.array([[0, 40], [0, 60], [0, 60], [0, 60]])
+    (up, down) = line_crossings(counted, direction, centroids, 50)
+    assert up.tolist() == [True, False, False, False]
+    assert down.tolist() == [False, True, False, False]
+
+
+def test_line_zone_counts_each_way_once():
+    # walking from the first point to the second, "right" is below the line
+    zones = CountingZones([{"name": "puerta", "points": [[0, 0.5], [1, 0.5]]}])
+    zones.setup(100, 100)
+    store = TrackableStore(zones=len(zones))
+    crossings = []
+    for (y, t) in ((40, 0.0), (60, 1.0), (70, 2.0), (40, 3.0), (30, 4.0)):
+        (rows, _) = store.update([1], [[50, y]])
+        centroids = store.lastCentroid[rows]
+        crossings += [d for (_, _, d) in zone_crossings(store, zones, rows, centroids, t)]
+    assert crossings == [ENTRADA, SALIDA]
+    assert zones.stats() == {"puerta": {"entradas": 1, "salidas": 1}}
+    assert store.counted[store.rows[1]]
+
+
+def test_polygon_entries_and_exits():
+    zones = CountingZones([{"type": "polygon", "points": [[0.2, 0.2], [0.8, 0.2], [0.8, 0.8], [0.2, 0.8]]}])
+    zones.setup(100, 100)
+    (entries, exits) = zones.crossings([[10, 50], [50, 50], [50, 50]], [[50, 50], [90, 50], [60, 60]])
+    assert entries[:, 0].tolist() == [True, False, False]
+    assert exits[:, 0].tolist() == [False, True, False]
@@ -0,0 +1,22 @@
+import pytest
+
+from benchmarks.crowd_simulator import run_scenario
+
+
+@pytest.mark.parametrize("counting", ["line", "zones"])
+def test_run_scenario_smoke(counting):
+    result = run_scenario(people=5, frames=60, cross_rate=0.6, occluders=2, dropout=0.05,
+                          jitter=2.0, seed=42, counting=counting)
+    assert result["frames"] == 60
+    assert result["ids_created"] > 0
+    assert result["count_error"] >= 0
+    assert set(result["latency_ms"]) == {"p50", "p95", "p99"}
+
+
+def test_run_scenario_is_deterministic():
+    runs = [run_scenario(5, 60, 0.6, 2, 0.05, 2.0, seed=7) for _ in range(2)]
+    for r in runs:
+        # timings are the only thing allowed to change between runs
+        r.pop("fps")
+        r.pop("latency_ms")
+    assert runs[0] == runs[1]
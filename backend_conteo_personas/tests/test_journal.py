@@ -0,0 +1,33 @@
+import datetime
+
+from utils.journal import CountingJournal, count_events, ENTRADA, SALIDA
+
+
+def test_count_events_filters_by_day(tmp_path):
+    path = str(tmp_path / "logs" / "events.csv")
+    today = datetime.datetime(2024, 5, 2, 10, 0)
+    yesterday = today - datetime.timedelta(days=1)
+    with CountingJournal(path, camera="cam1", batch_size=10, fsync=False) as journal:
+        journal.append(ENTRADA, 1, yesterday)
+        journal.append(ENTRADA, 2, today)
+        journal.append(SALIDA, 3, today)
+        journal.append(ENTRADA, 4, today)
+
+    assert count_events(path) == (3, 1)
+    assert count_events(path, day=today.date()) == (2, 1)
+    assert count_events(path, day=yesterday.date()) == (1, 0)
+    with open(path) as f:
+        assert f.readline().strip() == '"Hora","Direccion","ID","Camara"'
+        assert f.readline().strip().endswith('"entrada","1","cam1"')
+
+
+def test_records_are_written_in_batches(tmp_path):
+    path = str(tmp_path / "events.csv")
+    journal = CountingJournal(path, batch_size=2, max_delay=60, fsync=False)
+    journal.append(ENTRADA, 1)
+    assert count_events(path) == (0, 0)
+    journal.append(SALIDA, 2)
+    assert count_events(path) == (1, 1)
+    journal.append(SALIDA, 3)
+    journal.close()
+    assert count_events(path) == (1, 2)
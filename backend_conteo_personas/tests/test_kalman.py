@@ -0,0 +1,56 @@
+import numpy as np
+
+from tracker.kalman import KalmanTrackerSet, boxes_to_measurements, states_to_boxes
+
+
+def test_measurement_round_trip():
+    boxes = np.array([[10, 20, 40, 100], [0, 0, 30, 30]])
+    states = np.zeros((2, 7))
+    states[:, :4] = boxes_to_measurements(boxes)
+    assert states_to_boxes(states).tolist() == boxes.tolist()
+
+
+def test_predicts_with_the_velocity_learnt_from_detections():
+    tracks = KalmanTrackerSet()
+    box = np.array([[100, 100, 130, 170]])
+    tracks.reset(None, box)
+    # a track starts still
+    assert tracks.update(None) == [(100, 100, 130, 170)]
+
+    for step in range(1, 6):
+        tracks.update(None)
+        tracks.reconcile(None, box + [10 * step, 0, 10 * step, 0])
+    before = tracks.boxes[0, 0]
+    tracks.update(None)
+    assert 5 <= tracks.boxes[0, 0] - before <= 15
+    assert tracks.stats() == {"kept": 5, "reseeded": 0, "retired": 0, "created": 1}
+
+
+def test_reconcile_keeps_retires_and_creates():
+    tracks = KalmanTrackerSet()
+    tracks.reset(None, [[0, 0, 30, 60], [200, 0, 230, 60]])
+    # the first track is matched by IoU, the second one has no detection
+    # and a detection far from both starts a new track
+    tracks.reconcile(None, [[2, 0, 32, 60], [400, 100, 430, 160]])
+    assert len(tracks) == 2
+    assert tracks.stats() == {"kept": 1, "reseeded": 0, "retired": 1, "created": 3}
+    assert tracks.boxes[1].tolist() == [400, 100, 430, 160]
+
+    # a track that drifted off its person is still matched by distance
+    tracks.reconcile(None, [[20, 0, 50, 60], [400, 100, 430, 160]])
+    assert tracks.stats()["kept"] == 3 and len(tracks) == 2
+
+    tracks.retain([False, True])
+    assert tracks.rects() == [tuple(tracks.boxes[0])]
+
+
+def test_service_caps_the_detection_interval(make_service):
+    service = make_service(tracker_engine="kalman", skip_frames=30, kalman_max_skip=10)
+    assert service.scheduler.current_interval() == 10
+
+    adaptive = {"enabled": True, "min_interval": 5, "max_interval": 60}
+    service = make_service(tracker_engine="kalman", adaptive_skip=adaptive, kalman_max_skip=4)
+    assert (service.scheduler.minInterval, service.scheduler.maxInterval) == (4, 4)
+
+    assert make_service(tracker_engine="kalman", skip_frames=30, kalman_max_skip=0).scheduler.current_interval() == 30
+    assert make_service(tracker_engine="dlib", skip_frames=30).scheduler.current_interval() == 30
@@ -0,0 +1,19 @@
+from utils.motion import MotionGate
+
+
+def test_gate_opens_on_motion_and_holds(person_frame):
+    gate = MotionGate(width=160, threshold=0.01, hold_frames=2)
+    empty = person_frame([])
+    # the first frame only sets the background (and opens the gate)
+    assert [gate.update(empty) for _ in range(4)] == [True, True, True, False]
+
+    assert gate.update(person_frame([(100, 50, 160, 200)]))
+    assert gate.score > 0.01
+    # the gate stays open for `hold_frames` static frames, then closes
+    assert [gate.update(empty) for _ in range(3)] == [True, True, False]
+    assert gate.stats()["skipped"] == 2 and gate.frames == 8
+
+
+def test_from_config():
+    gate = MotionGate.from_config({"width": 80, "threshold": 0.05, "hold_frames": 3})
+    assert (gate.width, gate.threshold, gate.pixel_delta, gate.hold_frames) == (80, 0.05, 25, 3)
@@ -0,0 +1,114 @@
+import threading
+import time
+
+from utils.pipeline import StageQueue, DROP_OLDEST
+
+
+def test_drop_oldest_hands_evicted_items_to_on_drop():
+    dropped = []
+    queue = StageQueue("q", maxsize=2, policy=DROP_OLDEST, on_drop=dropped.append)
+    for item in range(4):
+        assert queue.put(item)
+    assert dropped == [0, 1]
+    assert [queue.get(), queue.get(), queue.get(timeout=0.01)] == [2, 3, None]
+    assert queue.stats()["dropped"] == 2
+
+
+def test_freshest_queue_skips_to_the_newest_item():
+    dropped = []
+    queue = StageQueue("q", maxsize=3, on_drop=dropped.append, freshest=True)
+    for item in range(3):
+        queue.put(item)
+    assert queue.get() == 2
+    assert dropped == [0, 1] and len(queue) == 0
+
+
+def test_blocking_put_gives_up_when_stopped():
+    stop = threading.Event()
+    queue = StageQueue("q", maxsize=1)
+    queue.put("a")
+    stop.set()
+    assert not queue.put("b", stop_event=stop, timeout=0.01)
+    assert queue.stats()["blocked"] == 1 and queue.get() == "a"
+
+
+class RecordingSnapshotter:
+    def __init__(self):
+        self.saved = []
+
+    def maybe_save(self, state):
+        pass
+
+    def save(self, state):
+        self.saved.append(state)
+
+    def stats(self):
+        return {}
+
+
+def run_pipeline(service, frames=30, timeout=10, until=None):
+    # run the service in its own thread until it has tracked `frames`
+    # frames, or until `until(service)` holds
+    until = until or (lambda service: service.totalFrames >= frames)
+    runner = threading.Thread(target=service.run)
+    runner.start()
+    deadline = time.monotonic() + timeout
+    while not until(service) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    service.stop_event.set()
+    runner.join(timeout=timeout)
+    assert not runner.is_alive()
+
+
+def test_count_activity_reaches_the_scheduler_on_the_track_stage(make_service):
+    service = make_service(pipeline={"enabled": True, "queue_size": 2, "drop_policy": "block"})
+    service.snapshotter = RecordingSnapshotter()
+    observed = []
+    observe = service.scheduler.observe
+    service.scheduler.observe = lambda *signal: observed.append(threading.current_thread().name) or observe(*signal)
+
+    run_pipeline(service)
+    assert observed and set(observed) == {"stage-track"}
+    # every stage stopped, so the final snapshot was taken
+    assert len(service.snapshotter.saved) == 1
+
+
+def test_no_final_snapshot_while_the_count_stage_runs(make_service):
+    service = make_service(pipeline={"enabled": True, "queue_size": 2, "drop_policy": "block"})
+    service.snapshotter = RecordingSnapshotter()
+    release = threading.Event()
+
+    def hung_count(*args):
+        release.wait(10)
+        return (0, 0)
+
+    service._count_frame = hung_count
+    try:
+        run_pipeline(service, frames=2)
+        assert service.snapshotter.saved == []
+    finally:
+        release.set()
+
+
+def test_frames_older_than_the_budget_expire(make_service):
+    service = make_service(latency_budget={"enabled": True, "budget_ms": 100})
+    assert not service._expired(time.monotonic(), "track")
+    assert service._expired(time.monotonic() - 1, "track")
+    assert service.expired_frames == {"preprocess": 0, "track": 1}
+
+    unbounded = make_service()
+    assert not unbounded._expired(time.monotonic() - 60, "preprocess")
+    assert unbounded.expired_frames == {"preprocess": 0, "track": 0}
+
+
+def test_expired_frames_recycle_their_slots_in_freshest_mode(make_service):
+    # a budget no frame can meet: every frame is dropped at the first stage
+    service = make_service(pipeline={"enabled": True, "queue_size": 2, "drop_policy": "block"},
+                           latency_budget={"enabled": True, "budget_ms": 0.001})
+    run_pipeline(service, until=lambda service: service.expired_frames["preprocess"] >= 20)
+    assert service.expired_frames["preprocess"] >= 20
+    assert service.totalFrames == 0
+    # the capture kept going past the 8 preallocated slots, so the dropped
+    # frames went back to the free list
+    assert service.pipeline_stages[0].processed >= 20
+    assert [q.name for q in service.pipeline_queues if q.freshest] == ["preprocess", "track"]
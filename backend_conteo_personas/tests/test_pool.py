@@ -0,0 +1,37 @@
+import os
+
+import cv2
+import pytest
+
+from detector.cache import MODEL_CACHE
+from detector.pool import DetectionPool
+
+
+@pytest.fixture
+def opencv_threads(monkeypatch):
+    calls = []
+    monkeypatch.setattr(cv2, "setNumThreads", calls.append)
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+    return calls
+
+
+@pytest.mark.parametrize("workers, threads", [(1, 8), (2, 4), (3, 2), (16, 1)])
+def test_cores_are_split_between_the_workers(blob_backend, opencv_threads, workers, threads):
+    pool = DetectionPool({"backend": "blob", "threads": 0}, workers=workers)
+    try:
+        assert pool.settings["threads"] == threads
+        assert opencv_threads == [threads]
+    finally:
+        pool.shutdown()
+
+
+def test_explicit_threads_and_one_model_per_worker(blob_backend, opencv_threads):
+    pool = DetectionPool({"backend": "blob", "threads": 3}, workers=2)
+    try:
+        assert pool.warmup()["model_cache_hit"] is False
+        assert MODEL_CACHE.stats()["models"] == 2
+        # the models themselves never touch the global thread count
+        assert opencv_threads == [3]
+        assert pool.warmup() == {"model_cache_hit": True, "model_load_ms": 0}
+    finally:
+        pool.shutdown()
@@ -0,0 +1,38 @@
+import numpy as np
+
+from detector.postprocess import PERSON_CLASS, box_iou, filter_detections, non_max_suppression
+
+
+def test_box_iou():
+    iou = box_iou([[0, 0, 10, 10]], [[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]])
+    np.testing.assert_allclose(iou, [[1.0, 1 / 3.0, 0.0]], rtol=1e-6)
+
+
+def test_nms_keeps_the_best_of_each_cluster():
+    boxes = np.array([[0, 0, 10, 10], [1, 0, 11, 10], [50, 50, 60, 60], [0, 1, 10, 11]], dtype=np.float32)
+    scores = np.array([0.6, 0.9, 0.7, 0.8])
+    assert non_max_suppression(boxes, scores, 0.45).tolist() == [1, 2]
+    # with a loose threshold nothing overlaps enough to be dropped
+    assert sorted(non_max_suppression(boxes, scores, 0.99).tolist()) == [0, 1, 2, 3]
+
+
+def test_filter_detections(ssd_output):
+    detections = ssd_output(
+        (PERSON_CLASS, 0.9, 0.1, 0.1, 0.3, 0.5),
+        (PERSON_CLASS, 0.8, 0.11, 0.1, 0.31, 0.5),   # duplicate of the first box
+        (PERSON_CLASS, 0.3, 0.5, 0.5, 0.6, 0.9),     # below the confidence
+        (PERSON_CLASS - 1, 0.9, 0.5, 0.5, 0.6, 0.9), # not a person
+        (PERSON_CLASS, 0.7, 0.8, 0.2, 1.5, 0.9),     # clipped to the frame
+        (PERSON_CLASS, 0.7, 1.2, 0.2, 1.5, 0.9),     # empty once clipped
+    )
+    boxes = filter_detections(detections, 200, 100, confidence=0.4, nmsThreshold=0.45)
+    assert boxes.dtype.kind == "i"
+    assert boxes.tolist() == [[20, 10, 60, 50], [160, 20, 199, 90]]
+
+    boxes = filter_detections(detections, 200, 100, confidence=0.4, nmsThreshold=None)
+    assert len(boxes) == 3
+
+
+def test_filter_detections_without_people(ssd_output):
+    assert filter_detections(ssd_output(), 200, 100).shape == (0, 4)
+    assert filter_detections(ssd_output((PERSON_CLASS, 0.1, 0, 0, 1, 1)), 200, 100).shape == (0, 4)
@@ -0,0 +1,32 @@
+import cv2
+import numpy as np
+import pytest
+
+from detector.backends import DetectorBackend
+from utils.preprocess import FramePreprocessor
+
+
+@pytest.mark.parametrize("swap_rb", [False, True])
+@pytest.mark.parametrize("input_size", [None, (300, 300)])
+@pytest.mark.parametrize("with_rgb", [False, True])
+def test_blob_matches_blob_from_image(swap_rb, input_size, with_rgb):
+    detector = DetectorBackend({"swap_rb": swap_rb, "input_size": input_size,
+                                "scale": 0.007843, "mean": [127.5, 100.0, 80.0]})
+    pre = FramePreprocessor(width=320)
+    frame = pre.resize(np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8))
+    rgb = pre.to_rgb() if with_rgb else None
+    expected = cv2.dnn.blobFromImage(frame, detector.scale, input_size or frame.shape[1::-1],
+                                     tuple(detector.mean), swapRB=swap_rb, crop=False)
+    blob = pre.blob(detector, frame, rgb)
+    np.testing.assert_allclose(blob, expected, atol=0.01)
+
+
+def test_buffers_are_reused_across_frames():
+    detector = DetectorBackend({"input_size": (300, 300)})
+    pre = FramePreprocessor(width=320)
+    for _ in range(5):
+        frame = pre.resize(np.zeros((480, 640, 3), dtype=np.uint8))
+        pre.blob(detector, frame, pre.to_rgb())
+    # frame, RGB, resized blob input and blob
+    assert pre.stats()["allocations"] == 4
+    assert pre.stats()["blobs"] == 5
@@ -0,0 +1,23 @@
+import datetime
+
+import report_service
+from utils.journal import CountingJournal, ENTRADA, SALIDA
+
+
+def test_summary_only_counts_today(tmp_path, monkeypatch):
+    path = str(tmp_path / "events.csv")
+    now = datetime.datetime.now()
+    yesterday = now - datetime.timedelta(days=1)
+    with CountingJournal(path, camera="cam1", fsync=False) as journal:
+        for object_id in range(5):
+            journal.append(ENTRADA, object_id, yesterday)
+        journal.append(SALIDA, 5, yesterday)
+        journal.append(ENTRADA, 6, now)
+        journal.append(ENTRADA, 7, now)
+        journal.append(SALIDA, 8, now)
+    monkeypatch.setattr(report_service, "CSV_PATH", path)
+
+    html = report_service.generar_resumen_html()
+    assert "entraron</td><td>2</td>" in html
+    assert "salieron</td><td>1</td>" in html
+    assert "al cierre</td><td>1</td>" in html
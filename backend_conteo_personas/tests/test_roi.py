@@ -0,0 +1,29 @@
+import numpy as np
+
+from utils.roi import DetectionROI
+
+
+def test_band_crop_and_mapping():
+    roi = DetectionROI(band=0.25)
+    roi.setup(200, 100)
+    assert roi.rect == (0, 25, 200, 75)
+    frame = np.arange(100 * 200).reshape(100, 200)
+    crop = roi.crop(frame)
+    assert crop.shape == (50, 200) and np.shares_memory(crop, frame)
+    assert roi.to_frame([[10, 5, 30, 45]]).tolist() == [[10, 30, 30, 70]]
+    assert roi.area_ratio() == 0.5
+
+
+def test_contains_uses_the_box_centroid():
+    roi = DetectionROI(polygon=[[0.25, 0.0], [0.75, 0.0], [0.75, 1.0], [0.25, 1.0]])
+    roi.setup(200, 100)
+    assert roi.rect == (50, 0, 150, 100)
+    boxes = [[60, 10, 80, 40], [30, 10, 60, 40], [40, 10, 80, 40], [140, 60, 170, 90]]
+    assert roi.contains(boxes).tolist() == [True, False, True, False]
+    # crop -> detect -> back to the frame
+    assert roi.contains(roi.to_frame([[0, 0, 20, 20]])).tolist() == [True]
+
+
+def test_from_config():
+    assert DetectionROI.from_config({"enabled": False, "band": 0.2}) is None
+    assert DetectionROI.from_config({"enabled": True, "band": 0.2}).band == 0.2
@@ -0,0 +1,44 @@
+from detector.scheduler import AdaptiveDetectionScheduler
+
+
+def test_fixed_interval():
+    scheduler = AdaptiveDetectionScheduler.from_config({"enabled": False}, skipFrames=30)
+    assert scheduler.due(0)
+    scheduler.mark(0)
+    assert not scheduler.due(29) and scheduler.due(30)
+    scheduler.mark(30)
+    assert scheduler.current_interval() == 30
+
+
+def test_backs_off_while_quiet_and_resets_on_activity():
+    scheduler = AdaptiveDetectionScheduler(minInterval=4, maxInterval=20, backoff=2.0)
+    frame = 0
+    intervals = []
+    for _ in range(5):
+        scheduler.mark(frame)
+        intervals.append(scheduler.current_interval())
+        frame += scheduler.current_interval()
+    assert intervals == [4, 8, 16, 20, 20]
+
+    # a track created (or lost, or near the line) asks for frequent detections
+    assert scheduler.observe(created=1, lost=0, nearLine=False)
+    assert scheduler.current_interval() == 4
+    scheduler.mark(frame)
+    assert scheduler.current_interval() == 4
+
+    assert not scheduler.observe(0, 0, False, minConfidence=9.0)
+    assert scheduler.observe(0, 0, False, minConfidence=3.0)
+
+
+def test_force_and_cpu_budget():
+    scheduler = AdaptiveDetectionScheduler(minInterval=2, maxInterval=50, cpuBudget=0.25)
+    scheduler.mark(10)
+    scheduler.force()
+    assert scheduler.due(11)
+
+    # 40 ms detections at 100 fps within a quarter of a core: one every 16 frames
+    scheduler.record_cost(0.04)
+    scheduler.tick(0.0)
+    scheduler.tick(0.01)
+    assert scheduler.budget_interval() == 16
+    assert scheduler.current_interval() == 16
@@ -0,0 +1,63 @@
+import os
+import time
+
+import numpy as np
+
+import utils.snapshot
+from tracker.centroidtracker import CentroidTracker
+from tracker.trackableobject import TrackableStore
+from utils.snapshot import StateSnapshotter, snapshot_path
+
+
+def counting_state():
+    # the same flat layout as PeopleCounterService._snapshot_state
+    ct = CentroidTracker()
+    objects = ct.update([(0, 0, 20, 40), (100, 100, 120, 140)])
+    store = TrackableStore()
+    store.update(list(objects), list(objects.values()))
+    state = {"totals": np.array([3, 4], dtype=np.int64)}
+    state.update({f"ct_{k}": v for k, v in ct.get_state().items()})
+    state.update({f"to_{k}": v for k, v in store.get_state().items()})
+    return state
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = snapshot_path("cam1", directory=str(tmp_path))
+    state = counting_state()
+    StateSnapshotter(path).save(state)
+    assert os.listdir(tmp_path) == ["camera_cam1.npz"]
+
+    loaded = StateSnapshotter(path).load()
+    assert loaded.keys() == state.keys()
+    for key in state:
+        np.testing.assert_array_equal(loaded[key], state[key])
+
+    ct = CentroidTracker()
+    ct.set_state({k[3:]: v for k, v in loaded.items() if k.startswith("ct_")})
+    store = TrackableStore()
+    store.set_state({k[3:]: v for k, v in loaded.items() if k.startswith("to_")})
+    assert sorted(ct.objects) == sorted(store.rows) == [0, 1]
+
+
+def test_missing_and_stale_snapshots_are_ignored(tmp_path, monkeypatch):
+    path = str(tmp_path / "camera_0.npz")
+    assert StateSnapshotter(path).load() is None
+
+    StateSnapshotter(path).save(counting_state())
+    assert StateSnapshotter(path, max_age=-1).load() is None
+
+    # a snapshot from another day is never restored
+    now = time.time()
+    monkeypatch.setattr(utils.snapshot.time, "time", lambda: now - 2 * 86400)
+    StateSnapshotter(path).save(counting_state())
+    monkeypatch.setattr(utils.snapshot.time, "time", lambda: now)
+    assert StateSnapshotter(path, max_age=10 * 86400).load() is None
+
+
+def test_maybe_save_waits_for_the_interval(tmp_path):
+    snapshotter = StateSnapshotter(str(tmp_path / "camera_0.npz"), interval=60)
+    calls = []
+    assert not snapshotter.maybe_save(lambda: calls.append(1) or counting_state())
+    snapshotter.last_save -= 60
+    assert snapshotter.maybe_save(lambda: calls.append(1) or counting_state())
+    assert calls == [1] and snapshotter.saves == 1
@@ -0,0 +1,53 @@
+import time
+
+import numpy as np
+
+import utils.thread
+from utils.thread import ThreadingClass
+
+
+class FakeCapture:
+    # a stream with one frame per millisecond; every frame is filled
+    # with its index so the test can tell which one it got
+    def __init__(self, name, frames=400):
+        self.frames = frames
+        self.index = 0
+
+    def grab(self):
+        time.sleep(0.001)
+        if self.index >= self.frames:
+            return False
+        self.index += 1
+        return True
+
+    def retrieve(self, image=None):
+        if image is None:
+            image = np.empty((2, 2), dtype=np.int64)
+        image.fill(self.index)
+        return (True, image)
+
+    def read(self, image=None):
+        return self.retrieve(image) if self.grab() else (False, None)
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        pass
+
+
+def test_grab_mode_hands_out_the_freshest_frame(monkeypatch):
+    monkeypatch.setattr(utils.thread.cv2, "VideoCapture", FakeCapture)
+    stream = ThreadingClass("fake", fps=500)
+    try:
+        (ret, frame) = stream.read(timeout=1.0)
+        assert ret
+        time.sleep(0.1)
+        (ret, frame) = stream.read(timeout=1.0)
+        assert ret
+        # the frame decoded right after the first read is ~100 frames old
+        # by now; the consumer must get one decoded close to the request
+        assert stream.cap.index - int(frame[0, 0]) < 20
+        assert stream.stats()["dropped"] > 0
+    finally:
+        stream.release()
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from tracker.trackableobject import TrackableStore
+
+
+def test_direction_is_relative_to_recent_centroids():
+    store = TrackableStore(maxHistory=2)
+    (rows, direction) = store.update([7], [[10, 100]])
+    assert np.isnan(direction).all() and 7 in store
+
+    (rows, direction) = store.update([7], [[10, 80]])
+    assert direction.tolist() == [-20.0]
+    assert store.previousCentroid[rows].tolist() == [[10, 100]]
+
+    # the history only keeps the last 2 centroids
+    (rows, direction) = store.update([7], [[10, 60]])
+    assert direction.tolist() == [-30.0]
+
+
+def test_remove_moves_the_last_row():
+    store = TrackableStore()
+    store.update([1, 2, 3], [[0, 0], [0, 10], [0, 20]])
+    store.remove(1)
+    assert len(store) == 2 and 1 not in store
+    assert store.lastCentroid[store.rows[3]].tolist() == [0, 20]
+    assert store[2].centroids[-1] == (0, 10)
+
+
+def test_state_round_trip():
+    store = TrackableStore(maxHistory=4, zones=2)
+    store.update([1, 2], [[0, 0], [0, 10]])
+    (rows, _) = store.update([1, 2], [[5, 5], [5, 15]])
+    store.mark_counted(rows[:1], 123.0)
+
+    restored = TrackableStore(maxHistory=4, zones=2)
+    restored.set_state(store.get_state())
+    for name in TrackableStore.COLUMNS:
+        np.testing.assert_array_equal(getattr(restored, name)[:restored.count],
+                                      getattr(store, name)[:store.count])
+    assert restored[1].counted and not restored[2].counted
+
+    with pytest.raises(ValueError):
+        TrackableStore(maxHistory=8, zones=2).set_state(store.get_state())
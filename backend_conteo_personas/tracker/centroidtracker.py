@@ -1,17 +1,43 @@
 # import the necessary packages
 from scipy.spatial import distance as dist
-from collections import OrderedDict
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse import coo_matrix
 import numpy as np
 
+# the 3x3 block of grid cells around (and including) a cell
+NEIGHBOUR_CELLS = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+
+# below this many (object, input) pairs the full distance matrix is
+# cheaper than building the grid, so the grid mode falls back to it --
+# i.e. by default the grid only runs with more than ~350 people in view
+# on both sides of the association; pass `gridMinPairs=0` to always use it.
+# benchmarks/centroid_benchmark.py with the grid forced puts the crossover
+# between 300 objects (dense 2.6 ms, grid 2.8 ms) and 400 (3.8 vs 2.5 ms)
+GRID_MIN_PAIRS = 350 * 350
+
+def group_by_label(labels, k):
+	# order the items by label and return that order, the offset of
+	# each label in it and the index of every item within its label
+	order = np.argsort(labels, kind="stable")
+	start = np.searchsorted(labels[order], np.arange(k))
+	local = np.empty(len(labels), dtype=np.int64)
+	local[order] = np.arange(len(labels)) - start[labels[order]]
+	return (order, start, local)
+
 class CentroidTracker:
-	def __init__(self, maxDisappeared=50, maxDistance=50):
-		# initialize the next unique object ID along with two ordered
-		# dictionaries used to keep track of mapping a given object
-		# ID to its centroid and number of consecutive frames it has
-		# been marked as "disappeared", respectively
+	def __init__(self, maxDisappeared=50, maxDistance=50, capacity=64,
+		onDeregister=None, association="dense", gridMinPairs=GRID_MIN_PAIRS):
+		# initialize the next unique object ID along with preallocated
+		# arrays holding, for each tracked object, its ID, its centroid
+		# and the number of consecutive frames it has been marked as
+		# "disappeared" -- the first `count` rows are the live objects,
+		# kept in registration order
 		self.nextObjectID = 0
-		self.objects = OrderedDict()
-		self.disappeared = OrderedDict()
+		self.count = 0
+		self.ids = np.empty((capacity,), dtype=np.int64)
+		self.centroids = np.empty((capacity, 2), dtype=int)
+		self.disappearedFrames = np.empty((capacity,), dtype=np.int64)
 
 		# store the number of maximum consecutive frames a given
 		# object is allowed to be marked as "disappeared" until we
@@ -23,141 +49,264 @@ class CentroidTracker:
 		# distance we'll start to mark the object as "disappeared"
 		self.maxDistance = maxDistance
 
+		# "dense" compares every object with every input centroid,
+		# "grid" buckets the centroids into cells of `maxDistance` and
+		# only compares neighbouring cells, which scales near-linearly
+		# with the number of people in dense crowds; below
+		# `gridMinPairs` (object, input) pairs it uses the dense path
+		if association not in ("dense", "grid"):
+			raise ValueError("unknown association mode '{}'".format(association))
+		self.association = association
+		self.gridMinPairs = gridMinPairs
+
+		# optional callback invoked with the ID of every deregistered
+		# object, so callers can drop their own per-object state
+		self.onDeregister = onDeregister
+
+		# the {objectID: centroid} mapping handed to the callers
+		self._objects = {}
+
+	@property
+	def objects(self):
+		# mapping of object ID to centroid, as of the last update
+		return self._objects
+
+	@property
+	def disappeared(self):
+		# mapping of object ID to consecutive "disappeared" frames
+		return dict(zip(self.ids[:self.count].tolist(),
+			self.disappearedFrames[:self.count].tolist()))
+
+	def _grow(self, needed):
+		# double the capacity of the arrays until `needed` rows fit
+		capacity = len(self.ids)
+		while capacity < needed:
+			capacity *= 2
+		if capacity == len(self.ids):
+			return
+		for name in ("ids", "centroids", "disappearedFrames"):
+			old = getattr(self, name)
+			new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+			new[:self.count] = old[:self.count]
+			setattr(self, name, new)
+
+	def _register(self, centroids):
+		# register a batch of centroids with consecutive new IDs
+		m = len(centroids)
+		if m == 0:
+			return
+		self._grow(self.count + m)
+		(start, end) = (self.count, self.count + m)
+		self.ids[start:end] = np.arange(self.nextObjectID, self.nextObjectID + m)
+		self.centroids[start:end] = centroids
+		self.disappearedFrames[start:end] = 0
+		self.nextObjectID += m
+		self.count = end
+
+	def _remove(self, mask):
+		# deregister the live objects selected by the boolean `mask`,
+		# compacting the arrays so the survivors keep their order
+		if not mask.any():
+			return
+		if self.onDeregister is not None:
+			for objectID in self.ids[:self.count][mask].tolist():
+				self.onDeregister(objectID)
+		keep = ~mask
+		k = int(keep.sum())
+		self.ids[:k] = self.ids[:self.count][keep]
+		self.centroids[:k] = self.centroids[:self.count][keep]
+		self.disappearedFrames[:k] = self.disappearedFrames[:self.count][keep]
+		self.count = k
+
+	def _mark_disappeared(self, rows):
+		# increment the "disappeared" counter of the given rows and
+		# deregister the objects that have been missing for too long
+		self.disappearedFrames[rows] += 1
+		self._remove(self.disappearedFrames[:self.count] > self.maxDisappeared)
+
+	def _publish(self):
+		# rebuild the {objectID: centroid} mapping; the centroids are
+		# copied so callers never see the arrays being updated in place
+		self._objects = dict(zip(self.ids[:self.count].tolist(),
+			self.centroids[:self.count].copy()))
+		return self._objects
+
 	def register(self, centroid):
 		# when registering an object we use the next available object
 		# ID to store the centroid
-		self.objects[self.nextObjectID] = centroid
-		self.disappeared[self.nextObjectID] = 0
-		self.nextObjectID += 1
+		self._register(np.asarray(centroid, dtype=int).reshape(1, 2))
+		self._publish()
 
 	def deregister(self, objectID):
-		# to deregister an object ID we delete the object ID from
-		# both of our respective dictionaries
-		del self.objects[objectID]
-		del self.disappeared[objectID]
+		# to deregister an object ID we drop its row from the arrays
+		self._remove(self.ids[:self.count] == objectID)
+		self._publish()
+
+	def get_state(self):
+		# copy of the tracker state as plain arrays, e.g. to snapshot it
+		return {
+			"ids": self.ids[:self.count].copy(),
+			"centroids": self.centroids[:self.count].copy(),
+			"disappeared": self.disappearedFrames[:self.count].copy(),
+			"nextObjectID": np.int64(self.nextObjectID),
+		}
+
+	def set_state(self, state):
+		# restore a state produced by `get_state`
+		count = len(state["ids"])
+		self.count = 0
+		self._grow(count)
+		self.ids[:count] = state["ids"]
+		self.centroids[:count] = state["centroids"]
+		self.disappearedFrames[:count] = state["disappeared"]
+		self.count = count
+		self.nextObjectID = int(state["nextObjectID"])
+		self._publish()
+
+	def match(self, objectCentroids, inputCentroids):
+		# return the (rows, cols) pairs of object and input centroids
+		# associated on this frame
+		if (self.association == "grid" and
+			len(objectCentroids) * len(inputCentroids) > self.gridMinPairs):
+			return self.match_grid(objectCentroids, inputCentroids)
+		return self.match_dense(objectCentroids, inputCentroids)
+
+	def match_dense(self, objectCentroids, inputCentroids):
+		# compute the distance between each pair of object centroids
+		# and input centroids and solve the optimal one-to-one
+		# assignment; pairs further apart than the maximum distance
+		# are priced so high that they are only chosen when nothing
+		# else is possible, and are then discarded
+		D = dist.cdist(objectCentroids, inputCentroids)
+		gated = D > self.maxDistance
+		cost = np.where(gated, 1e9, D)
+		(rows, cols) = linear_sum_assignment(cost)
+		valid = ~gated[rows, cols]
+		return (rows[valid], cols[valid])
+
+	def candidate_pairs(self, objectCentroids, inputCentroids):
+		# find every (object, input) pair within the maximum distance
+		# by bucketing the centroids into a uniform grid with cells of
+		# `maxDistance`: such pairs always lie in neighbouring cells
+		cell = max(float(self.maxDistance), 1.0)
+		objectCells = np.floor(objectCentroids / cell).astype(np.int64)
+		inputCells = np.floor(inputCentroids / cell).astype(np.int64)
+
+		# flatten the (x, y) cells into a single sortable key, with a
+		# one cell margin so the neighbours of every cell are valid
+		origin = np.minimum(objectCells.min(axis=0), inputCells.min(axis=0)) - 1
+		stride = int(max(objectCells[:, 1].max(), inputCells[:, 1].max()) - origin[1]) + 2
+		key = lambda cells: (cells[:, 0] - origin[0]) * stride + (cells[:, 1] - origin[1])
+
+		order = np.argsort(key(inputCells), kind="stable")
+		sortedKeys = key(inputCells)[order]
+
+		# for each object and each of its 9 neighbouring cells, the
+		# inputs in that cell form a contiguous range of `order`
+		neighbours = (objectCells[:, np.newaxis, :] + NEIGHBOUR_CELLS).reshape(-1, 2)
+		neighbourKeys = key(neighbours)
+		lo = np.searchsorted(sortedKeys, neighbourKeys, side="left")
+		hi = np.searchsorted(sortedKeys, neighbourKeys, side="right")
+		counts = hi - lo
+
+		# expand the ranges into explicit pairs
+		rows = np.repeat(np.arange(len(neighbours)) // len(NEIGHBOUR_CELLS), counts)
+		offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+		cols = order[np.repeat(lo, counts) + offsets]
+
+		# keep the pairs within the maximum distance
+		D = np.linalg.norm(objectCentroids[rows] - inputCentroids[cols], axis=1)
+		close = D <= self.maxDistance
+		return (rows[close], cols[close], D[close])
+
+	def match_grid(self, objectCentroids, inputCentroids):
+		# the candidate pairs form a bipartite graph whose connected
+		# components can be solved independently -- each one with the
+		# same gated assignment as the dense mode, so both modes
+		# return the same matches
+		objectCentroids = np.asarray(objectCentroids, dtype=np.float64)
+		inputCentroids = np.asarray(inputCentroids, dtype=np.float64)
+		(rows, cols, D) = self.candidate_pairs(objectCentroids, inputCentroids)
+		if len(rows) == 0:
+			return (rows, cols)
+
+		(n, m) = (len(objectCentroids), len(inputCentroids))
+		graph = coo_matrix((np.ones(len(rows)), (rows, n + cols)), shape=(n + m, n + m))
+		(k, labels) = connected_components(graph, directed=False)
+
+		# index the objects and inputs of each component: `byLabel`
+		# lists them grouped by component, starting at `start[label]`
+		(rowsByLabel, rowStart, localRow) = group_by_label(labels[:n], k)
+		(colsByLabel, colStart, localCol) = group_by_label(labels[n:], k)
+		nRows = np.bincount(labels[:n], minlength=k)
+		nCols = np.bincount(labels[n:], minlength=k)
+		edgeLabels = labels[rows]
+
+		# a component with a single object (or a single input) simply
+		# takes its closest pair
+		simple = (nRows[edgeLabels] == 1) | (nCols[edgeLabels] == 1)
+		order = np.lexsort((D[simple], edgeLabels[simple]))
+		(simpleLabels, first) = np.unique(edgeLabels[simple][order], return_index=True)
+		matchedRows = [rows[simple][order][first]]
+		matchedCols = [cols[simple][order][first]]
+
+		# the others are solved with the gated assignment on their own
+		# (small) distance matrix
+		complexEdges = np.flatnonzero(~simple)
+		complexEdges = complexEdges[np.argsort(edgeLabels[complexEdges], kind="stable")]
+		bounds = np.flatnonzero(np.diff(edgeLabels[complexEdges])) + 1
+		for edges in np.split(complexEdges, bounds):
+			if len(edges) == 0:
+				continue
+			label = edgeLabels[edges[0]]
+			cost = np.full((nRows[label], nCols[label]), 1e9)
+			cost[localRow[rows[edges]], localCol[cols[edges]]] = D[edges]
+			(i, j) = linear_sum_assignment(cost)
+			valid = cost[i, j] < 1e9
+			matchedRows.append(rowsByLabel[rowStart[label] + i[valid]])
+			matchedCols.append(colsByLabel[colStart[label] + j[valid]])
+
+		return (np.concatenate(matchedRows), np.concatenate(matchedCols))
 
 	def update(self, rects):
 		# check to see if the list of input bounding box rectangles
 		# is empty
 		if len(rects) == 0:
-			# loop over any existing tracked objects and mark them
-			# as disappeared
-			for objectID in list(self.disappeared.keys()):
-				self.disappeared[objectID] += 1
-
-				# if we have reached a maximum number of consecutive
-				# frames where a given object has been marked as
-				# missing, deregister it
-				if self.disappeared[objectID] > self.maxDisappeared:
-					self.deregister(objectID)
+			# mark every existing tracked object as disappeared,
+			# deregistering the ones missing for too long
+			self._mark_disappeared(slice(0, self.count))
 
 			# return early as there are no centroids or tracking info
 			# to update
-			return self.objects
+			return self._publish()
 
-		# initialize an array of input centroids for the current frame
-		inputCentroids = np.zeros((len(rects), 2), dtype="int")
-
-		# loop over the bounding box rectangles
-		for (i, (startX, startY, endX, endY)) in enumerate(rects):
-			# use the bounding box coordinates to derive the centroid
-			cX = int((startX + endX) / 2.0)
-			cY = int((startY + endY) / 2.0)
-			inputCentroids[i] = (cX, cY)
+		# use the bounding box coordinates to derive the centroids of
+		# the current frame
+		rects = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+		inputCentroids = ((rects[:, :2] + rects[:, 2:]) / 2.0).astype(int)
 
 		# if we are currently not tracking any objects take the input
 		# centroids and register each of them
-		if len(self.objects) == 0:
-			for i in range(0, len(inputCentroids)):
-				self.register(inputCentroids[i])
-
-		# otherwise, are are currently tracking objects so we need to
-		# try to match the input centroids to existing object
-		# centroids
-		else:
-			# grab the set of object IDs and corresponding centroids
-			objectIDs = list(self.objects.keys())
-			objectCentroids = list(self.objects.values())
-
-			# compute the distance between each pair of object
-			# centroids and input centroids, respectively -- our
-			# goal will be to match an input centroid to an existing
-			# object centroid
-			D = dist.cdist(np.array(objectCentroids), inputCentroids)
-
-			# in order to perform this matching we must (1) find the
-			# smallest value in each row and then (2) sort the row
-			# indexes based on their minimum values so that the row
-			# with the smallest value as at the *front* of the index
-			# list
-			rows = D.min(axis=1).argsort()
-
-			# next, we perform a similar process on the columns by
-			# finding the smallest value in each column and then
-			# sorting using the previously computed row index list
-			cols = D.argmin(axis=1)[rows]
-
-			# in order to determine if we need to update, register,
-			# or deregister an object we need to keep track of which
-			# of the rows and column indexes we have already examined
-			usedRows = set()
-			usedCols = set()
-
-			# loop over the combination of the (row, column) index
-			# tuples
-			for (row, col) in zip(rows, cols):
-				# if we have already examined either the row or
-				# column value before, ignore it
-				if row in usedRows or col in usedCols:
-					continue
-
-				# if the distance between centroids is greater than
-				# the maximum distance, do not associate the two
-				# centroids to the same object
-				if D[row, col] > self.maxDistance:
-					continue
-
-				# otherwise, grab the object ID for the current row,
-				# set its new centroid, and reset the disappeared
-				# counter
-				objectID = objectIDs[row]
-				self.objects[objectID] = inputCentroids[col]
-				self.disappeared[objectID] = 0
-
-				# indicate that we have examined each of the row and
-				# column indexes, respectively
-				usedRows.add(row)
-				usedCols.add(col)
-
-			# compute both the row and column index we have NOT yet
-			# examined
-			unusedRows = set(range(0, D.shape[0])).difference(usedRows)
-			unusedCols = set(range(0, D.shape[1])).difference(usedCols)
-
-			# in the event that the number of object centroids is
-			# equal or greater than the number of input centroids
-			# we need to check and see if some of these objects have
-			# potentially disappeared
-			if D.shape[0] >= D.shape[1]:
-				# loop over the unused row indexes
-				for row in unusedRows:
-					# grab the object ID for the corresponding row
-					# index and increment the disappeared counter
-					objectID = objectIDs[row]
-					self.disappeared[objectID] += 1
-
-					# check to see if the number of consecutive
-					# frames the object has been marked "disappeared"
-					# for warrants deregistering the object
-					if self.disappeared[objectID] > self.maxDisappeared:
-						self.deregister(objectID)
-
-			# otherwise, if the number of input centroids is greater
-			# than the number of existing object centroids we need to
-			# register each new input centroid as a trackable object
-			else:
-				for col in unusedCols:
-					self.register(inputCentroids[col])
+		if self.count == 0:
+			self._register(inputCentroids)
+			return self._publish()
+
+		# otherwise, match the input centroids to the existing object
+		# centroids, update the matched objects and reset their
+		# disappeared counters
+		(rows, cols) = self.match(self.centroids[:self.count], inputCentroids)
+		self.centroids[rows] = inputCentroids[cols]
+		self.disappearedFrames[rows] = 0
+
+		# every object left without a match may have disappeared and
+		# every input centroid left without a match is a new object
+		unusedRows = np.ones(self.count, dtype=bool)
+		unusedRows[rows] = False
+		unusedCols = np.ones(len(inputCentroids), dtype=bool)
+		unusedCols[cols] = False
+
+		self._mark_disappeared(np.flatnonzero(unusedRows))
+		self._register(inputCentroids[unusedCols])
 
 		# return the set of trackable objects
-		return self.objects
\ No newline at end of file
+		return self._publish()
@@ -0,0 +1,150 @@
+# import the necessary packages
+from detector.postprocess import box_iou
+from scipy.optimize import linear_sum_assignment
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import threading
+import dlib
+
+# thread pools shared by every tracker set of the process (one per pool
+# size), so several cameras do not each spawn a pool per core
+_EXECUTORS = {}
+_EXECUTORS_LOCK = threading.Lock()
+
+def _shared_executor(threads):
+	with _EXECUTORS_LOCK:
+		if threads not in _EXECUTORS:
+			_EXECUTORS[threads] = ThreadPoolExecutor(max_workers=threads,
+				thread_name_prefix="tracker")
+		return _EXECUTORS[threads]
+
+def _update_trackers(trackers, rgb):
+	# update a slice of the trackers, returning (confidence, startX,
+	# startY, endX, endY) per tracker -- dlib releases the GIL inside
+	# update(), so slices running on different threads use several cores
+	results = []
+	for tracker in trackers:
+		confidence = tracker.update(rgb)
+		pos = tracker.get_position()
+		results.append((confidence, pos.left(), pos.top(),
+			pos.right(), pos.bottom()))
+	return results
+
+class CorrelationTrackerSet:
+	def __init__(self, threads=1):
+		# initialize the list of dlib correlation trackers along with
+		# the (N, 4) array holding their last known positions
+		self.trackers = []
+		self.boxes = np.empty((0, 4), dtype=int)
+		self.confidences = np.empty((0,), dtype=np.float32)
+
+		# with more than one thread the updates are fanned out across a
+		# shared pool, one contiguous slice of trackers per thread
+		self.threads = max(1, int(threads or 1))
+		self.executor = _shared_executor(self.threads) if self.threads > 1 else None
+
+		# running totals of what happened to the trackers on detection
+		# frames, to see how much state is reused
+		self.counters = {"kept": 0, "reseeded": 0, "retired": 0, "created": 0}
+
+	def __len__(self):
+		return len(self.trackers)
+
+	def _start(self, rgb, box):
+		# construct a dlib rectangle object from the bounding box
+		# coordinates and then start the dlib correlation tracker
+		(startX, startY, endX, endY) = [int(v) for v in box]
+		tracker = dlib.correlation_tracker()
+		tracker.start_track(rgb, dlib.rectangle(startX, startY, endX, endY))
+		return tracker
+
+	def reset(self, rgb, boxes):
+		# drop every tracker and start a new one for each detected box
+		self.counters["retired"] += len(self.trackers)
+		self.counters["created"] += len(boxes)
+		self.trackers = [self._start(rgb, box) for box in boxes]
+		self.boxes = np.asarray(boxes, dtype=int).reshape(-1, 4)
+		self.confidences = np.empty((0,), dtype=np.float32)
+
+	def update(self, rgb):
+		# update every tracker, keeping the peak-to-sidelobe confidence
+		# dlib returns, and grab the updated positions
+		slices = min(self.threads, len(self.trackers))
+		if slices <= 1:
+			results = _update_trackers(self.trackers, rgb)
+		else:
+			# map() yields the slices in submission order, so the boxes
+			# come back in the same order as the trackers
+			bounds = np.linspace(0, len(self.trackers), slices + 1).astype(int)
+			parts = [self.trackers[start:end]
+				for (start, end) in zip(bounds[:-1], bounds[1:])]
+			results = [r for part in self.executor.map(_update_trackers,
+				parts, [rgb] * slices) for r in part]
+
+		results = np.array(results, dtype=np.float64).reshape(-1, 5)
+		self.boxes = results[:, 1:].astype(int)
+		self.confidences = results[:, 0].astype(np.float32)
+		return self.rects()
+
+	def min_confidence(self):
+		# lowest tracker confidence of the last update, None if unknown
+		return float(self.confidences.min()) if len(self.confidences) else None
+
+	def retain(self, mask):
+		# keep only the trackers selected by the boolean `mask`
+		mask = np.asarray(mask, dtype=bool)
+		self.trackers = [t for (t, keep) in zip(self.trackers, mask) if keep]
+		self.boxes = self.boxes[mask]
+		if len(self.confidences) == len(mask):
+			self.confidences = self.confidences[mask]
+
+	def rects(self):
+		# return the current positions as a list of (startX, startY,
+		# endX, endY) tuples, the format the centroid tracker expects
+		return [tuple(box) for box in self.boxes.tolist()]
+
+	def reconcile(self, rgb, boxes, iouThreshold=0.3, reseedIoU=0.6):
+		# merge a set of detections into the running trackers: trackers
+		# overlapping a detection are kept (or re-seeded on the detection
+		# when they have drifted from it), trackers without a matching
+		# detection are retired and only unmatched detections start new
+		# trackers
+		boxes = np.asarray(boxes, dtype=int).reshape(-1, 4)
+		if len(self.trackers) == 0 or len(boxes) == 0:
+			self.reset(rgb, boxes)
+			return
+
+		# solve the optimal one-to-one matching on the IoU matrix and
+		# discard pairs that do not overlap enough
+		iou = box_iou(self.boxes, boxes)
+		(rows, cols) = linear_sum_assignment(-iou)
+		matched = iou[rows, cols] >= iouThreshold
+		(rows, cols) = (rows[matched], cols[matched])
+
+		# a matched tracker overlapping its detection less than
+		# `reseedIoU` has drifted: restart it on the detected box, which
+		# keeps its slot (and so the object ID downstream) but drops the
+		# drift
+		reseed = iou[rows, cols] < reseedIoU
+		trackers = []
+		for (row, col, drifted) in zip(rows, cols, reseed):
+			trackers.append(self._start(rgb, boxes[col]) if drifted
+				else self.trackers[row])
+		kept = [np.where(reseed[:, np.newaxis], boxes[cols], self.boxes[rows])]
+
+		unmatched = np.setdiff1d(np.arange(len(boxes)), cols)
+		for col in unmatched:
+			trackers.append(self._start(rgb, boxes[col]))
+		kept.append(boxes[unmatched])
+
+		self.counters["kept"] += int(len(rows) - reseed.sum())
+		self.counters["reseeded"] += int(reseed.sum())
+		self.counters["retired"] += len(self.trackers) - len(rows)
+		self.counters["created"] += len(unmatched)
+
+		self.trackers = trackers
+		self.boxes = np.concatenate(kept).astype(int).reshape(-1, 4)
+		self.confidences = np.empty((0,), dtype=np.float32)
+
+	def stats(self):
+		return dict(self.counters)
@@ -0,0 +1,168 @@
+# import the necessary packages
+from detector.postprocess import box_iou
+from scipy.optimize import linear_sum_assignment
+import numpy as np
+
+# constant velocity model over the state (centerX, centerY, area,
+# aspect ratio, vX, vY, vArea) -- the aspect ratio is assumed constant
+F = np.eye(7)
+F[0, 4] = F[1, 5] = F[2, 6] = 1.0
+
+# only the box itself (centerX, centerY, area, aspect ratio) is measured
+H = np.eye(4, 7)
+
+# measurement and process noise, along with the initial uncertainty of a
+# new track (high for the unobserved velocities)
+R = np.diag([1.0, 1.0, 10.0, 10.0])
+Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001])
+P0 = np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4])
+
+def boxes_to_measurements(boxes):
+	# convert (N, 4) boxes in (startX, startY, endX, endY) format to
+	# (N, 4) measurements in (centerX, centerY, area, aspect) format
+	boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+	w = np.maximum(boxes[:, 2] - boxes[:, 0], 1.0)
+	h = np.maximum(boxes[:, 3] - boxes[:, 1], 1.0)
+	return np.stack([boxes[:, 0] + w / 2.0, boxes[:, 1] + h / 2.0,
+		w * h, w / h], axis=1)
+
+def states_to_boxes(states):
+	# convert the (N, 7) states back to (N, 4) integer boxes
+	area = np.maximum(states[:, 2], 1.0)
+	aspect = np.maximum(states[:, 3], 1e-3)
+	w = np.sqrt(area * aspect)
+	h = area / w
+	return np.stack([states[:, 0] - w / 2.0, states[:, 1] - h / 2.0,
+		states[:, 0] + w / 2.0, states[:, 1] + h / 2.0],
+		axis=1).astype(int).reshape(-1, 4)
+
+class KalmanTrackerSet:
+	def __init__(self):
+		# every track lives in a row of the (N, 7) state array and the
+		# (N, 7, 7) covariance array, so a whole frame is advanced with
+		# a handful of batched matrix products instead of one Python
+		# call per person
+		#
+		# tracks are only corrected on detection frames and otherwise
+		# extrapolated at constant velocity, so they drift away from
+		# people who turn or stop: keep the detection interval short
+		# (the service caps it with `kalman_max_skip`)
+		self.states = np.empty((0, 7), dtype=np.float64)
+		self.covariances = np.empty((0, 7, 7), dtype=np.float64)
+		self.boxes = np.empty((0, 4), dtype=int)
+		self.confidences = np.empty((0,), dtype=np.float32)
+
+		# running totals of what happened to the tracks on detection
+		# frames (a motion model is corrected, never re-seeded)
+		self.counters = {"kept": 0, "reseeded": 0, "retired": 0, "created": 0}
+
+	def __len__(self):
+		return len(self.states)
+
+	def _start(self, boxes):
+		# build the initial states (zero velocity) and covariances of a
+		# set of detections
+		states = np.zeros((len(boxes), 7), dtype=np.float64)
+		states[:, :4] = boxes_to_measurements(boxes)
+		covariances = np.repeat(P0[np.newaxis], len(boxes), axis=0)
+		return (states, covariances)
+
+	def reset(self, rgb, boxes):
+		# drop every track and start a new one for each detected box
+		boxes = np.asarray(boxes, dtype=int).reshape(-1, 4)
+		self.counters["retired"] += len(self.states)
+		self.counters["created"] += len(boxes)
+		(self.states, self.covariances) = self._start(boxes)
+		self.boxes = boxes
+		self.confidences = np.empty((0,), dtype=np.float32)
+
+	def update(self, rgb):
+		# predict every track one frame ahead; the motion model does
+		# not look at the frame, which is what makes it cheap
+		if len(self.states) > 0:
+			# do not let the predicted area become negative
+			shrinking = self.states[:, 2] + self.states[:, 6] <= 0
+			self.states[shrinking, 6] = 0.0
+
+			self.states = self.states @ F.T
+			self.covariances = F @ self.covariances @ F.T + Q
+			self.boxes = states_to_boxes(self.states)
+		return self.rects()
+
+	def min_confidence(self):
+		# a motion model has no appearance score to report
+		return None
+
+	def retain(self, mask):
+		# keep only the tracks selected by the boolean `mask`
+		mask = np.asarray(mask, dtype=bool)
+		self.states = self.states[mask]
+		self.covariances = self.covariances[mask]
+		self.boxes = self.boxes[mask]
+
+	def rects(self):
+		# return the current positions as a list of (startX, startY,
+		# endX, endY) tuples, the format the centroid tracker expects
+		return [tuple(box) for box in self.boxes.tolist()]
+
+	def _correct(self, rows, boxes):
+		# batched Kalman correction of the tracks in `rows` with their
+		# matched detections
+		z = boxes_to_measurements(boxes)
+		x = self.states[rows]
+		P = self.covariances[rows]
+
+		y = z - x @ H.T
+		S = H @ P @ H.T + R
+		K = P @ H.T @ np.linalg.inv(S)
+		self.states[rows] = x + np.einsum("nij,nj->ni", K, y)
+		self.covariances[rows] = (np.eye(7) - K @ H) @ P
+
+	def reconcile(self, rgb, boxes, iouThreshold=0.3, reseedIoU=None):
+		# merge a set of detections into the running tracks: matched
+		# tracks are corrected with their detection, tracks without a
+		# matching detection are retired and only unmatched detections
+		# start new tracks (`reseedIoU` only matters to the correlation
+		# trackers, a corrected track never needs re-seeding)
+		boxes = np.asarray(boxes, dtype=int).reshape(-1, 4)
+		if len(self.states) == 0 or len(boxes) == 0:
+			self.reset(rgb, boxes)
+			return
+
+		# solve the optimal one-to-one matching on the IoU matrix and
+		# discard pairs that do not overlap enough
+		iou = box_iou(self.boxes, boxes)
+		(rows, cols) = linear_sum_assignment(-iou)
+		matched = iou[rows, cols] >= iouThreshold
+		(rows, cols) = (rows[matched], cols[matched])
+
+		# between sparse detections a prediction may have drifted off its
+		# person (the velocity of a new track is unknown), so the tracks
+		# left over are matched by centroid distance, gated by the
+		# diagonal of the track box
+		leftRows = np.setdiff1d(np.arange(len(self.states)), rows)
+		leftCols = np.setdiff1d(np.arange(len(boxes)), cols)
+		if len(leftRows) > 0 and len(leftCols) > 0:
+			centers = boxes_to_measurements(boxes[leftCols])[:, :2]
+			D = np.linalg.norm(self.states[leftRows, np.newaxis, :2] -
+				centers[np.newaxis], axis=2)
+			(r, c) = linear_sum_assignment(D)
+			wh = self.boxes[leftRows[r], 2:] - self.boxes[leftRows[r], :2]
+			gated = D[r, c] <= np.linalg.norm(wh, axis=1)
+			rows = np.concatenate([rows, leftRows[r[gated]]])
+			cols = np.concatenate([cols, leftCols[c[gated]]])
+
+		self._correct(rows, boxes[cols])
+		unmatched = np.setdiff1d(np.arange(len(boxes)), cols)
+		(states, covariances) = self._start(boxes[unmatched])
+		self.counters["kept"] += len(rows)
+		self.counters["retired"] += len(self.states) - len(rows)
+		self.counters["created"] += len(unmatched)
+
+		self.states = np.concatenate([self.states[rows], states])
+		self.covariances = np.concatenate([self.covariances[rows], covariances])
+		self.boxes = states_to_boxes(self.states)
+		self.confidences = np.empty((0,), dtype=np.float32)
+
+	def stats(self):
+		return dict(self.counters)
@@ -1,10 +1,229 @@
+from collections import deque
+import numpy as np
+
 class TrackableObject:
-	def __init__(self, objectID, centroid):
-		# store the object ID, then initialize a list of centroids
-		# using the current centroid
+	__slots__ = ("objectID", "centroids", "ySum", "counted")
+
+	def __init__(self, objectID, centroid, maxHistory=32):
+		# store the object ID, then initialize a bounded history of
+		# centroids (a ring buffer: the oldest centroid is dropped once
+		# `maxHistory` are stored) using the current centroid
 		self.objectID = objectID
-		self.centroids = [centroid]
+		self.centroids = deque([centroid], maxlen=maxHistory)
+
+		# running sum of the y-coordinates in the history, so their
+		# mean costs O(1) however long the person stays in view
+		self.ySum = float(centroid[1])
 
 		# initialize a boolean used to indicate if the object has
 		# already been counted or not
-		self.counted = False
\ No newline at end of file
+		self.counted = False
+
+	def mean_y(self):
+		# mean y-coordinate of the centroids in the history
+		return self.ySum / len(self.centroids)
+
+	def update(self, centroid):
+		# the difference between the y-coordinate of the *current*
+		# centroid and the mean of the *previous* centroids tells us in
+		# which direction the object is moving (negative for 'up' and
+		# positive for 'down'); then add the centroid to the history
+		direction = centroid[1] - self.mean_y()
+		if len(self.centroids) == self.centroids.maxlen:
+			self.ySum -= self.centroids[0][1]
+		self.centroids.append(centroid)
+		self.ySum += centroid[1]
+		return direction
+
+class TrackableView:
+	__slots__ = ("store", "objectID")
+
+	def __init__(self, store, objectID):
+		# a thin handle on one object of a TrackableStore, exposing the
+		# same attributes as a TrackableObject
+		self.store = store
+		self.objectID = objectID
+
+	@property
+	def row(self):
+		return self.store.rows[self.objectID]
+
+	@property
+	def counted(self):
+		return bool(self.store.counted[self.row])
+
+	@counted.setter
+	def counted(self, value):
+		self.store.counted[self.row] = value
+
+	@property
+	def centroids(self):
+		# the centroids in the history, oldest first
+		row = self.row
+		n = self.store.historyLength[row]
+		start = (self.store.historyPos[row] - n) % self.store.maxHistory
+		order = (start + np.arange(n)) % self.store.maxHistory
+		return [tuple(c) for c in self.store.history[row, order].tolist()]
+
+	@property
+	def crossedAt(self):
+		# timestamp of the frame the object was counted, None if not
+		t = self.store.crossedAt[self.row]
+		return None if np.isnan(t) else float(t)
+
+	def mean_y(self):
+		row = self.row
+		return self.store.ySum[row] / self.store.historyLength[row]
+
+class TrackableStore:
+	# the per-object column arrays
+	COLUMNS = ("ids", "counted", "lastCentroid", "previousCentroid",
+		"crossedAt", "zoneState", "history", "historyPos", "historyLength",
+		"ySum")
+
+	def __init__(self, maxHistory=32, capacity=64, zones=0):
+		# struct-of-arrays store of every trackable object: row `i` of
+		# each array belongs to the object `ids[i]`, the first `count`
+		# rows are live and `rows` maps an object ID to its row
+		self.maxHistory = int(maxHistory)
+		self.count = 0
+		self.rows = {}
+		self.ids = np.empty((capacity,), dtype=np.int64)
+		self.counted = np.zeros((capacity,), dtype=bool)
+		self.lastCentroid = np.zeros((capacity, 2), dtype=np.int64)
+		self.previousCentroid = np.zeros((capacity, 2), dtype=np.int64)
+		self.crossedAt = np.full((capacity,), np.nan)
+
+		# last direction each object was counted in for each counting
+		# zone (0: not counted, 1: entry, 2: exit)
+		self.zoneState = np.zeros((capacity, max(int(zones), 1)), dtype=np.int8)
+
+		# ring buffer of the recent centroids of each object along with
+		# the running sum of their y-coordinates (the direction
+		# accumulator)
+		self.history = np.zeros((capacity, self.maxHistory, 2), dtype=np.int64)
+		self.historyPos = np.zeros((capacity,), dtype=np.int64)
+		self.historyLength = np.zeros((capacity,), dtype=np.int64)
+		self.ySum = np.zeros((capacity,), dtype=np.float64)
+
+	def __len__(self):
+		return self.count
+
+	def __contains__(self, objectID):
+		return objectID in self.rows
+
+	def get(self, objectID, default=None):
+		if objectID not in self.rows:
+			return default
+		return TrackableView(self, objectID)
+
+	def __getitem__(self, objectID):
+		if objectID not in self.rows:
+			raise KeyError(objectID)
+		return TrackableView(self, objectID)
+
+	def _grow(self, needed):
+		# double the capacity of the arrays until `needed` rows fit
+		capacity = len(self.ids)
+		while capacity < needed:
+			capacity *= 2
+		if capacity == len(self.ids):
+			return
+		for name in self.COLUMNS:
+			old = getattr(self, name)
+			new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+			new[:self.count] = old[:self.count]
+			setattr(self, name, new)
+
+	def _add(self, objectIDs, centroids):
+		# append new objects, each one with its first centroid
+		m = len(objectIDs)
+		self._grow(self.count + m)
+		rows = np.arange(self.count, self.count + m)
+		self.ids[rows] = objectIDs
+		self.counted[rows] = False
+		self.lastCentroid[rows] = centroids
+		self.previousCentroid[rows] = centroids
+		self.crossedAt[rows] = np.nan
+		self.zoneState[rows] = 0
+		self.history[rows, 0] = centroids
+		self.historyPos[rows] = 1 % self.maxHistory
+		self.historyLength[rows] = 1
+		self.ySum[rows] = centroids[:, 1]
+		for (objectID, row) in zip(objectIDs.tolist(), rows.tolist()):
+			self.rows[objectID] = row
+		self.count += m
+
+	def update(self, objectIDs, centroids):
+		# record the centroids of the objects seen in this frame and
+		# return (rows, direction): the y-coordinate of each centroid
+		# minus the mean of the object's recent centroids (negative for
+		# 'up', positive for 'down'), NaN for objects seen for the first
+		# time -- `previousCentroid[rows]` then holds the centroid of
+		# the previous update (the current one for new objects)
+		objectIDs = np.asarray(objectIDs, dtype=np.int64).reshape(-1)
+		centroids = np.asarray(centroids, dtype=np.int64).reshape(-1, 2)
+		rows = np.fromiter((self.rows.get(i, -1) for i in objectIDs.tolist()),
+			dtype=np.int64, count=len(objectIDs))
+		known = rows >= 0
+		direction = np.full(len(objectIDs), np.nan)
+
+		# advance the ring buffers of the known objects: evict the
+		# oldest centroid from the running sum once the ring is full
+		r = rows[known]
+		y = centroids[known, 1]
+		direction[known] = y - self.ySum[r] / self.historyLength[r]
+		full = self.historyLength[r] == self.maxHistory
+		self.ySum[r[full]] -= self.history[r[full], self.historyPos[r[full]], 1]
+		self.history[r, self.historyPos[r]] = centroids[known]
+		self.historyPos[r] = (self.historyPos[r] + 1) % self.maxHistory
+		self.historyLength[r] = np.minimum(self.historyLength[r] + 1, self.maxHistory)
+		self.ySum[r] += y
+		self.previousCentroid[r] = self.lastCentroid[r]
+		self.lastCentroid[r] = centroids[known]
+
+		# register the objects seen for the first time
+		if not known.all():
+			start = self.count
+			self._add(objectIDs[~known], centroids[~known])
+			rows[~known] = np.arange(start, self.count)
+
+		return (rows, direction)
+
+	def get_state(self):
+		# copy of the live rows of every column, e.g. to snapshot them
+		state = {name: getattr(self, name)[:self.count].copy() for name in self.COLUMNS}
+		state["maxHistory"] = np.int64(self.maxHistory)
+		return state
+
+	def set_state(self, state):
+		# restore a state produced by `get_state`; it must come from a
+		# store with the same history length and number of zones
+		if (int(state["maxHistory"]) != self.maxHistory or
+			state["zoneState"].shape[1:] != self.zoneState.shape[1:]):
+			raise ValueError("incompatible trackable store state")
+		count = len(state["ids"])
+		self.count = 0
+		self._grow(count)
+		for name in self.COLUMNS:
+			getattr(self, name)[:count] = state[name]
+		self.count = count
+		self.rows = {objectID: row for (row, objectID) in enumerate(state["ids"].tolist())}
+
+	def mark_counted(self, rows, timestamp):
+		# flag the objects in `rows` as counted at `timestamp`
+		self.counted[rows] = True
+		self.crossedAt[rows] = timestamp
+
+	def remove(self, objectID):
+		# drop an object, moving the last row into its place
+		row = self.rows.pop(objectID, None)
+		if row is None:
+			return
+		last = self.count - 1
+		if row != last:
+			for name in self.COLUMNS:
+				array = getattr(self, name)
+				array[row] = array[last]
+			self.rows[int(self.ids[row])] = row
+		self.count = last
@@ -0,0 +1,40 @@
+import numpy as np
+
+from utils.journal import ENTRADA, SALIDA
+
+
+def line_crossings(counted, direction, centroids, line):
+    """ Counting rule of the horizontal line `line`, for all the objects.
+
+    Returns the (exits, entries) masks of the objects not counted yet
+    that move up above the line or down below it. New objects have a
+    NaN direction and never pass the comparisons.
+    """
+    pending = ~counted
+    up = pending & (direction < 0) & (centroids[:, 1] < line)
+    down = pending & (direction > 0) & (centroids[:, 1] > line)
+    return up, down
+
+
+def zone_crossings(store, zones, rows, centroids, timestamp):
+    """ Counting-zone crossings of the store objects `rows`.
+
+    Crossings come from the previous -> current move of each object; an
+    object is only counted again in a zone when it crosses it the other
+    way. The crossings are marked in the store and in the zone totals,
+    and returned as a list of (object index, zone, ENTRADA | SALIDA).
+    """
+    previous = store.previousCentroid[rows]
+    entries, exits = zones.crossings(previous, centroids)
+    state = store.zoneState[rows, :len(zones)]
+    entries &= state != 1
+    exits &= state != 2
+    crossings = []
+    for (t, z) in zip(*(a.tolist() for a in np.nonzero(entries | exits))):
+        entered = bool(entries[t, z])
+        direction = ENTRADA if entered else SALIDA
+        store.zoneState[rows[t], z] = 1 if entered else 2
+        store.mark_counted(rows[t], timestamp)
+        zones.record(z, direction)
+        crossings.append((t, z, direction))
+    return crossings
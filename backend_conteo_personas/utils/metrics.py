@@ -0,0 +1,58 @@
+from collections import Counter
+import threading
+
+import numpy as np
+
+
+class RollingWindow:
+    """ Fixed-size window of the most recent samples (e.g. latencies).
+
+    Samples are stored in a preallocated ring, so recording is O(1) and
+    allocation free; percentiles are computed on demand over the window.
+    """
+
+    def __init__(self, size=1000):
+        self.samples = np.zeros(int(size), dtype=np.float64)
+        self.index = 0
+        self.count = 0
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def add(self, value):
+        with self.lock:
+            self.samples[self.index] = value
+            self.index = (self.index + 1) % len(self.samples)
+            self.count = min(self.count + 1, len(self.samples))
+            self.total += 1
+
+    def values(self):
+        with self.lock:
+            return self.samples[:self.count].copy()
+
+    def summary(self, scale=1.0, digits=2, percentiles=(50, 95, 99)):
+        # mean and percentiles of the window, multiplied by `scale`
+        # (e.g. 1000 to report seconds as milliseconds)
+        values = self.values()
+        if len(values) == 0:
+            return {"count": self.total}
+        stats = {"count": self.total,
+                 "mean": round(float(values.mean()) * scale, digits)}
+        for (p, v) in zip(percentiles, np.percentile(values, percentiles)):
+            stats["p{}".format(p)] = round(float(v) * scale, digits)
+        return stats
+
+
+class Histogram:
+    """ Thread-safe counter of discrete values (e.g. batch sizes). """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def add(self, value):
+        with self.lock:
+            self.counts[value] += 1
+
+    def as_dict(self):
+        with self.lock:
+            return {str(k): v for (k, v) in sorted(self.counts.items())}
@@ -0,0 +1,99 @@
+from collections import deque
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """ Cheap motion detector deciding whether a frame needs the DNN.
+
+    Every frame is downscaled to `width` pixels, converted to grayscale
+    and compared against a running-average background. The motion score
+    is the fraction of pixels that differ from the background by more
+    than `pixel_delta`. Once the score crosses `threshold` the gate stays
+    open for `hold_frames` frames so people slowing down near the line are
+    not lost.
+    """
+
+    def __init__(self, width=160, threshold=0.01, pixel_delta=25,
+                 alpha=0.05, hold_frames=15, history=120):
+        self.width = int(width)
+        self.threshold = float(threshold)
+        self.pixel_delta = int(pixel_delta)
+        self.alpha = float(alpha)
+        self.hold_frames = int(hold_frames)
+
+        # buffers are allocated on the first frame and reused afterwards
+        self.size = None
+        self.small = None
+        self.gray = None
+        self.background = None
+        self.reference = None
+        self.diff = None
+
+        self.score = 0.0
+        self.scores = deque(maxlen=history)
+        self.hold = 0
+        self.frames = 0
+        self.skipped = 0
+
+    @classmethod
+    def from_config(cls, settings):
+        return cls(width=settings.get("width", 160),
+                   threshold=settings.get("threshold", 0.01),
+                   pixel_delta=settings.get("pixel_delta", 25),
+                   alpha=settings.get("alpha", 0.05),
+                   hold_frames=settings.get("hold_frames", 15))
+
+    def _measure(self, frame):
+        if self.size is None:
+            (h, w) = frame.shape[:2]
+            self.size = (self.width, max(1, int(h * self.width / float(w))))
+        self.small = cv2.resize(frame, self.size, dst=self.small,
+                                interpolation=cv2.INTER_AREA)
+        self.gray = cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        cv2.GaussianBlur(self.gray, (5, 5), 0, dst=self.gray)
+
+        if self.background is None:
+            # the first frame becomes the background, there is nothing
+            # to compare it with yet
+            self.background = self.gray.astype(np.float32)
+            self.reference = np.empty_like(self.gray)
+            self.diff = np.empty_like(self.gray)
+            return 1.0
+
+        # pixels that changed with respect to the background, then fold
+        # the current frame into the running average
+        cv2.convertScaleAbs(self.background, dst=self.reference)
+        cv2.absdiff(self.gray, self.reference, dst=self.diff)
+        cv2.threshold(self.diff, self.pixel_delta, 255, cv2.THRESH_BINARY,
+                      dst=self.diff)
+        changed = cv2.countNonZero(self.diff)
+        cv2.accumulateWeighted(self.gray, self.background, self.alpha)
+        return changed / float(self.diff.size)
+
+    def update(self, frame):
+        # returns True when detection and tracking should run on `frame`
+        self.frames += 1
+        self.score = self._measure(frame)
+        self.scores.append(round(self.score, 4))
+        if self.score >= self.threshold:
+            self.hold = self.hold_frames
+            return True
+        if self.hold > 0:
+            self.hold -= 1
+            return True
+        self.skipped += 1
+        return False
+
+    @property
+    def skip_rate(self):
+        return self.skipped / float(self.frames) if self.frames else 0.0
+
+    def stats(self):
+        return {
+            "score": round(self.score, 4),
+            "scores": list(self.scores),
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "skip_rate": round(self.skip_rate, 4),
+        }
@@ -0,0 +1,189 @@
+from collections import deque
+import threading
+import time
+
+from utils.metrics import RollingWindow
+
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+DROP_POLICIES = (BLOCK, DROP_OLDEST)
+
+
+class StageQueue:
+    """ Bounded queue between two pipeline stages.
+
+    When the queue is full, `put()` either waits for room (`block`, the
+    backpressure reaches the producing stage and, in the end, the
+    capture) or evicts the oldest item (`drop_oldest`, the freshest
+    items win); evicted items are handed to `on_drop`, e.g. to recycle
+    their buffers.
+
+    A `freshest` queue always hands the newest item to the consumer and
+    drops the older ones, so a stage that falls behind jumps straight to
+    the latest frame instead of working through a backlog.
+
+    The depth is sampled on every `put()` to report its mean and maximum.
+    """
+
+    def __init__(self, name, maxsize=2, policy=BLOCK, on_drop=None, freshest=False):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Política de cola desconocida '{policy}' ({', '.join(DROP_POLICIES)})")
+        self.name = name
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self.on_drop = on_drop
+        self.freshest = freshest
+        self.items = deque()
+        self.cond = threading.Condition()
+
+        self.puts = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.depth_sum = 0
+        self.max_depth = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def put(self, item, stop_event=None, timeout=0.1):
+        # returns False if `stop_event` was set while waiting for room
+        dropped = None
+        with self.cond:
+            if len(self.items) >= self.maxsize:
+                if self.policy == DROP_OLDEST:
+                    dropped = self.items.popleft()
+                    self.dropped += 1
+                else:
+                    self.blocked += 1
+                    while len(self.items) >= self.maxsize:
+                        if stop_event is not None and stop_event.is_set():
+                            return False
+                        self.cond.wait(timeout)
+            self.items.append(item)
+            self.puts += 1
+            self.depth_sum += len(self.items)
+            self.max_depth = max(self.max_depth, len(self.items))
+            self.cond.notify_all()
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped)
+        return True
+
+    def get(self, timeout=0.1):
+        # next item (the newest one for a freshest queue), or None if
+        # nothing arrived within `timeout`
+        stale = []
+        with self.cond:
+            if not self.items and not self.cond.wait_for(lambda: self.items, timeout):
+                return None
+            if self.freshest:
+                while len(self.items) > 1:
+                    stale.append(self.items.popleft())
+                self.dropped += len(stale)
+            item = self.items.popleft()
+            self.cond.notify_all()
+        if self.on_drop is not None:
+            for old in stale:
+                self.on_drop(old)
+        return item
+
+    def stats(self):
+        return {
+            "depth": len(self.items),
+            "max_depth": self.max_depth,
+            "mean_depth": round(self.depth_sum / float(self.puts), 3) if self.puts else 0.0,
+            "capacity": self.maxsize,
+            "policy": self.policy,
+            "freshest": self.freshest,
+            "puts": self.puts,
+            "dropped": self.dropped,
+            "blocked": self.blocked,
+        }
+
+
+class PipelineStage:
+    """ Worker thread running one stage of the frame pipeline.
+
+    The worker takes items from `inbox` (or calls `work(None)` in a loop
+    for a source stage without inbox), runs `work(item)` and puts every
+    result that is not None into `outbox`, until `stop_event` is set. An
+    exception stops the whole pipeline and is kept in `error`.
+    """
+
+    def __init__(self, name, work, stop_event, inbox=None, outbox=None, history=500):
+        self.name = name
+        self.work = work
+        self.stop_event = stop_event
+        self.inbox = inbox
+        self.outbox = outbox
+        self.thread = threading.Thread(target=self._run, name=f"stage-{name}", daemon=True)
+        self.error = None
+
+        self.processed = 0
+        self.busy = RollingWindow(history)
+        self.started = None
+        self.busy_seconds = 0.0
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.thread.start()
+        return self
+
+    def join(self, timeout=None):
+        self.thread.join(timeout)
+
+    def is_alive(self):
+        return self.thread.is_alive()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            item = None
+            if self.inbox is not None:
+                item = self.inbox.get()
+                if item is None:
+                    continue
+            start = time.perf_counter()
+            try:
+                result = self.work(item)
+            except Exception as e:
+                self.error = e
+                self.stop_event.set()
+                return
+            elapsed = time.perf_counter() - start
+            self.busy.add(elapsed)
+            self.busy_seconds += elapsed
+            if result is None:
+                continue
+            self.processed += 1
+            if self.outbox is not None:
+                self.outbox.put(result, self.stop_event)
+
+    def stats(self):
+        # throughput (items/s) since the start and fraction of the time
+        # the stage spent working rather than waiting for input or room
+        elapsed = time.perf_counter() - self.started if self.started else 0.0
+        return {
+            "processed": self.processed,
+            "fps": round(self.processed / elapsed, 2) if elapsed else 0.0,
+            "utilization": round(self.busy_seconds / elapsed, 3) if elapsed else 0.0,
+            "work_ms": self.busy.summary(scale=1000, digits=3),
+        }
+
+
+class FrameSlot:
+    """ Buffers of one frame travelling through the pipeline.
+
+    Slots are preallocated and recycled: the capture stage takes a free
+    slot, copies the camera frame into `raw`, and the slot goes back to
+    the free list once the last stage needing the pixels is done (or
+    when a queue drops it). `timestamp` is the capture time of the frame
+    (`time.monotonic()`), carried along to measure its age.
+    """
+
+    __slots__ = ("raw", "frame", "rgb", "moving", "timestamp")
+
+    def __init__(self):
+        self.raw = None
+        self.frame = None
+        self.rgb = None
+        self.moving = True
+        self.timestamp = None
@@ -0,0 +1,132 @@
+import time
+
+import cv2
+import numpy as np
+
+from utils.metrics import RollingWindow
+
+
+class FramePreprocessor:
+    """ Per-camera resize, color conversion and detector blob.
+
+    The frame is resized to `width` pixels (keeping the aspect ratio, as
+    `imutils.resize` does) and converted to RGB into buffers that are
+    allocated once per stream geometry and then reused through the `dst`
+    arguments of OpenCV, so a frame costs no new array. The returned
+    arrays are only valid until the next frame. The RGB conversion is a
+    separate step so frames that skip tracking (e.g. while the motion
+    gate is closed) do not pay for it. Callers keeping several frames in
+    flight (the staged pipeline) pass their own `dst` buffers instead.
+
+    `blob()` builds the detector input from the already-resized buffers
+    (the RGB one when the network swaps channels, so the conversion is
+    shared) into a preallocated float32 blob, with the same scaling and
+    mean subtraction as `cv2.dnn.blobFromImage`. Without an RGB buffer
+    (e.g. a frame copy handed to a detection worker) the channels are
+    swapped while filling the blob. There is a single blob buffer, so at
+    most one detection per camera may be building it at a time.
+
+    `allocations` counts every buffer (re)allocation: once the stream
+    geometry is known it must stay flat.
+    """
+
+    def __init__(self, width=500, interpolation=cv2.INTER_AREA, history=500):
+        self.width = int(width)
+        self.interpolation = interpolation
+        self.source = None
+        self.size = None
+        self.frame = None
+        self.rgb = None
+
+        # blob buffers, keyed by the shape of the image they come from
+        self.blobSource = None
+        self.blobInput = None
+        self.blobBuffer = None
+
+        self.frames = 0
+        self.conversions = 0
+        self.blobs = 0
+        self.allocations = 0
+        self.resize_time = RollingWindow(history)
+        self.convert_time = RollingWindow(history)
+        self.blob_time = RollingWindow(history)
+
+    def _buffer(self, buffer, shape, dtype=np.uint8):
+        # reuse `buffer` if it fits, otherwise allocate a new one
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            self.allocations += 1
+            buffer = np.empty(shape, dtype=dtype)
+        return buffer
+
+    def setup(self, shape):
+        # compute the resize geometry once per stream geometry
+        if self.source == shape[:2]:
+            return
+        self.source = shape[:2]
+        (h, w) = self.source
+        self.size = (self.width, int(h * self.width / float(w)))
+        self.frame = self._buffer(self.frame, (self.size[1], self.size[0], 3))
+        self.rgb = self._buffer(self.rgb, self.frame.shape)
+
+    def resize(self, frame, dst=None):
+        # resized BGR frame, written to `dst` if given (and it fits)
+        start = time.perf_counter()
+        self.setup(frame.shape)
+        dst = self.frame if dst is None else self._buffer(dst, self.frame.shape)
+        cv2.resize(frame, self.size, dst=dst, interpolation=self.interpolation)
+        self.frames += 1
+        self.resize_time.add(time.perf_counter() - start)
+        return dst
+
+    def to_rgb(self, frame=None, dst=None):
+        # RGB version of `frame`, by default the last resized frame
+        start = time.perf_counter()
+        if frame is None:
+            (frame, dst) = (self.frame, self.rgb)
+        else:
+            dst = self._buffer(dst, frame.shape)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=dst)
+        self.conversions += 1
+        self.convert_time.add(time.perf_counter() - start)
+        return dst
+
+    def blob(self, detector, frame, rgb=None):
+        # blob of the (possibly cropped) resized frame for `detector`,
+        # equivalent to detector.preprocess(frame)
+        start = time.perf_counter()
+        image = rgb if detector.swapRB and rgb is not None else frame
+        channels = (2, 1, 0) if detector.swapRB and rgb is None else (0, 1, 2)
+        (h, w) = image.shape[:2]
+        (W, H) = detector.inputSize or (w, h)
+        if self.blobSource != (h, w, W, H):
+            self.blobSource = (h, w, W, H)
+            self.blobBuffer = self._buffer(self.blobBuffer, (1, 3, H, W), np.float32)
+            if (W, H) != (w, h):
+                self.blobInput = self._buffer(self.blobInput, (H, W, 3))
+        if (W, H) != (w, h):
+            # blobFromImage resizes with bilinear interpolation
+            image = cv2.resize(image, (W, H), dst=self.blobInput,
+                               interpolation=cv2.INTER_LINEAR)
+
+        # (image - mean) * scale, one channel at a time so every write
+        # goes to a contiguous plane of the (1, C, H, W) blob
+        mean = np.resize(np.asarray(detector.mean, dtype=np.float32).reshape(-1), 3)
+        for (c, channel) in enumerate(channels):
+            plane = self.blobBuffer[0, c]
+            np.subtract(image[:, :, channel], mean[c], out=plane)
+            np.multiply(plane, detector.scale, out=plane)
+        self.blobs += 1
+        self.blob_time.add(time.perf_counter() - start)
+        return self.blobBuffer
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "conversions": self.conversions,
+            "blobs": self.blobs,
+            "allocations": self.allocations,
+            "allocations_per_frame": round(self.allocations / float(self.frames), 6) if self.frames else None,
+            "resize_ms": self.resize_time.summary(scale=1000, digits=3),
+            "convert_ms": self.convert_time.summary(scale=1000, digits=3),
+            "blob_ms": self.blob_time.summary(scale=1000, digits=3),
+        }
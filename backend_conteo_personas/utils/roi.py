@@ -0,0 +1,80 @@
+import numpy as np
+
+
+class DetectionROI:
+    """ Region of interest around the counting line.
+
+    The region is either a horizontal `band` (fraction of the frame
+    height on each side of the line at H // 2) or a `polygon` given in
+    relative [x, y] coordinates. The detector only sees the bounding
+    rectangle of the region and boxes are mapped back to frame space;
+    boxes whose centroid falls outside the region are discarded.
+    """
+
+    def __init__(self, band=None, polygon=None):
+        if band is None and polygon is None:
+            raise ValueError("La ROI necesita 'band' o 'polygon'")
+        self.band = band
+        self.relative = np.asarray(polygon, dtype=np.float32) if polygon is not None else None
+        self.shape = None
+        self.polygon = None
+        self.rect = None
+
+    @classmethod
+    def from_config(cls, settings):
+        if not settings.get("enabled", False):
+            return None
+        return cls(band=settings.get("band"), polygon=settings.get("polygon"))
+
+    def setup(self, W, H):
+        # compute the region in pixels once per stream geometry
+        if self.shape == (W, H):
+            return
+        self.shape = (W, H)
+        if self.relative is not None:
+            polygon = self.relative * np.array([W, H], dtype=np.float32)
+        else:
+            half = self.band * H
+            (top, bottom) = (H // 2 - half, H // 2 + half)
+            polygon = np.array([[0, top], [W, top], [W, bottom], [0, bottom]],
+                               dtype=np.float32)
+        polygon[:, 0] = np.clip(polygon[:, 0], 0, W)
+        polygon[:, 1] = np.clip(polygon[:, 1], 0, H)
+        self.polygon = polygon
+
+        (x0, y0) = np.floor(polygon.min(axis=0)).astype(int)
+        (x1, y1) = np.ceil(polygon.max(axis=0)).astype(int)
+        self.rect = (int(x0), int(y0), int(x1), int(y1))
+
+    def crop(self, frame):
+        # view (no copy) of the part of the frame fed to the detector
+        (x0, y0, x1, y1) = self.rect
+        return frame[y0:y1, x0:x1]
+
+    def to_frame(self, boxes):
+        # map boxes detected on the crop back into frame coordinates
+        (x0, y0, _, _) = self.rect
+        return np.asarray(boxes, dtype=int).reshape(-1, 4) + np.array([x0, y0, x0, y0])
+
+    def contains(self, boxes):
+        # boolean mask of the boxes whose centroid lies inside the
+        # region (vectorized even-odd ray casting)
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        cx = (boxes[:, 0] + boxes[:, 2]) / 2.0
+        cy = (boxes[:, 1] + boxes[:, 3]) / 2.0
+        (xa, ya) = (self.polygon[:, 0], self.polygon[:, 1])
+        (xb, yb) = (np.roll(xa, -1), np.roll(ya, -1))
+
+        crosses = (ya[None, :] > cy[:, None]) != (yb[None, :] > cy[:, None])
+        dy = np.where(yb == ya, 1e-9, yb - ya)
+        xcross = xa[None, :] + (cy[:, None] - ya[None, :]) * (xb - xa)[None, :] / dy[None, :]
+        inside = crosses & (cx[:, None] < xcross)
+        return (inside.sum(axis=1) % 2) == 1
+
+    def area_ratio(self):
+        # fraction of the frame pixels the detector actually sees
+        if self.rect is None:
+            return None
+        (x0, y0, x1, y1) = self.rect
+        (W, H) = self.shape
+        return round((x1 - x0) * (y1 - y0) / float(W * H), 4)
@@ -0,0 +1,71 @@
+import datetime
+import os
+import time
+
+import numpy as np
+
+SNAPSHOT_DIR = "utils/data/snapshots"
+
+
+def snapshot_path(camera, directory=SNAPSHOT_DIR):
+    return os.path.join(directory, "camera_{}.npz".format(camera))
+
+
+class StateSnapshotter:
+    """ Periodic binary snapshots of the tracker and counter state.
+
+    The state is a flat dict of NumPy arrays written with `np.savez` to a
+    temporary file that then atomically replaces the previous snapshot,
+    so a crash while saving never leaves a truncated file behind.
+    `maybe_save()` costs a single clock comparison between snapshots.
+
+    `load()` only returns a snapshot taken less than `max_age` seconds
+    ago and on the same day, as the counters are daily totals.
+    """
+
+    def __init__(self, path, interval=5.0, max_age=120.0):
+        self.path = path
+        self.interval = float(interval)
+        self.max_age = float(max_age)
+        self.last_save = time.monotonic()
+        self.saves = 0
+        self.last_save_ms = None
+        self.restored_age = None
+
+    def save(self, state):
+        start = time.perf_counter()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, saved_at=np.float64(time.time()), **state)
+        os.replace(tmp, self.path)
+        self.last_save = time.monotonic()
+        self.saves += 1
+        self.last_save_ms = round((time.perf_counter() - start) * 1000, 3)
+
+    def maybe_save(self, get_state):
+        # `get_state` is only called when a snapshot is due
+        if time.monotonic() - self.last_save >= self.interval:
+            self.save(get_state())
+            return True
+        return False
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with np.load(self.path) as data:
+            state = {key: data[key] for key in data.files}
+        saved_at = float(state.pop("saved_at"))
+        age = time.time() - saved_at
+        same_day = datetime.date.fromtimestamp(saved_at) == datetime.date.today()
+        if age > self.max_age or not same_day:
+            return None
+        self.restored_age = round(age, 3)
+        return state
+
+    def stats(self):
+        return {
+            "saves": self.saves,
+            "last_save_ms": self.last_save_ms,
+            "restored_age_seconds": self.restored_age,
+        }
@@ -0,0 +1,151 @@
+import numpy as np
+
+from utils.journal import ENTRADA
+
+
+def _cross(ux, uy, vx, vy):
+    # z component of the 2D cross product u x v
+    return ux * vy - uy * vx
+
+
+class CountingZones:
+    """ Counting zones of a camera: line segments and polygons.
+
+    Each zone is a dict with a `name`, a `type` ("line" or "polygon")
+    and its `points` in relative [x, y] coordinates:
+
+    - a line counts an entry when a track crosses it towards its
+      `inside` side ("right" or "left", as seen walking from the first
+      point to the second one on screen) and an exit the other way;
+    - a polygon counts an entry when a track moves into it and an exit
+      when it moves out.
+
+    Crossings are computed for every (track, zone) pair at once from the
+    previous -> current centroid of each track: one batched
+    segment-intersection test against all the lines and one batched
+    even-odd test against all the polygon edges.
+    """
+
+    def __init__(self, zones):
+        if len(zones) == 0:
+            raise ValueError("Se necesita al menos una zona de conteo")
+        self.names = []
+        lines, inside, polygons = [], [], []
+        self.kinds = []
+        for zone in zones:
+            kind = zone.get("type", "line")
+            points = np.asarray(zone["points"], dtype=np.float64).reshape(-1, 2)
+            if kind == "line":
+                if len(points) != 2:
+                    raise ValueError(f"La línea '{zone.get('name')}' necesita 2 puntos")
+                if zone.get("inside", "right") not in ("right", "left"):
+                    raise ValueError(f"'inside' de la línea '{zone.get('name')}' debe ser 'right' o 'left'")
+                lines.append(points)
+                inside.append(1.0 if zone.get("inside", "right") == "right" else -1.0)
+            elif kind == "polygon":
+                if len(points) < 3:
+                    raise ValueError(f"El polígono '{zone.get('name')}' necesita al menos 3 puntos")
+                polygons.append(points)
+            else:
+                raise ValueError(f"Tipo de zona desconocido '{kind}' (line o polygon)")
+            self.kinds.append(kind)
+            self.names.append(zone.get("name", f"zona_{len(self.names)}"))
+
+        # zone columns of the lines and of the polygons
+        kinds = np.array(self.kinds)
+        self.lineZones = np.flatnonzero(kinds == "line")
+        self.polygonZones = np.flatnonzero(kinds == "polygon")
+
+        self.relativeLines = np.array(lines).reshape(-1, 2, 2)
+        self.inside = np.array(inside)
+        self.relativePolygons = polygons
+
+        # every polygon edge, grouped by polygon: edges of polygon `i`
+        # start at `edgeStarts[i]`
+        sizes = [len(p) for p in polygons]
+        self.edgeStarts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(int) if sizes else np.zeros(0, int)
+        self.shape = None
+        self.counts = np.zeros((len(self.names), 2), dtype=np.int64)
+
+    @classmethod
+    def from_config(cls, zones):
+        if not zones:
+            return None
+        return cls(zones)
+
+    def __len__(self):
+        return len(self.names)
+
+    def setup(self, W, H):
+        # compute the zones in pixels once per stream geometry
+        if self.shape == (W, H):
+            return
+        self.shape = (W, H)
+        scale = np.array([W, H], dtype=np.float64)
+        self.lines = self.relativeLines * scale
+        if self.relativePolygons:
+            vertices = np.concatenate(self.relativePolygons) * scale
+            nxt = np.arange(len(vertices)) + 1
+            ends = np.concatenate([self.edgeStarts[1:], [len(vertices)]])
+            nxt[ends - 1] = self.edgeStarts
+            (self.edgeA, self.edgeB) = (vertices, vertices[nxt])
+        else:
+            (self.edgeA, self.edgeB) = (np.empty((0, 2)), np.empty((0, 2)))
+
+    def _inside_polygons(self, points):
+        # (T, P) boolean matrix: is each point inside each polygon
+        # (even-odd ray casting over all the edges at once)
+        (px, py) = (points[:, 0:1], points[:, 1:2])
+        (xa, ya) = (self.edgeA[:, 0], self.edgeA[:, 1])
+        (xb, yb) = (self.edgeB[:, 0], self.edgeB[:, 1])
+        crosses = (ya > py) != (yb > py)
+        dy = np.where(yb == ya, 1e-9, yb - ya)
+        xcross = xa + (py - ya) * (xb - xa) / dy
+        hits = (crosses & (px < xcross)).astype(np.int64)
+        return (np.add.reduceat(hits, self.edgeStarts, axis=1) % 2) == 1
+
+    def crossings(self, previous, current):
+        # return (entries, exits), two (T, Z) boolean matrices telling
+        # which of the T tracks entered or left each of the Z zones
+        # while moving from `previous` to `current`
+        previous = np.asarray(previous, dtype=np.float64).reshape(-1, 2)
+        current = np.asarray(current, dtype=np.float64).reshape(-1, 2)
+        entries = np.zeros((len(current), len(self)), dtype=bool)
+        exits = np.zeros_like(entries)
+        if len(current) == 0:
+            return (entries, exits)
+
+        if len(self.lineZones) > 0:
+            # side of each line each endpoint of the move lies on, and
+            # side of the move each end of the line lies on: the move
+            # crosses the segment when both pairs are on opposite sides
+            (ax, ay) = (self.lines[:, 0, 0], self.lines[:, 0, 1])
+            (dx, dy) = (self.lines[:, 1, 0] - ax, self.lines[:, 1, 1] - ay)
+            (p, q) = (previous[:, np.newaxis, :], current[:, np.newaxis, :])
+            sideP = _cross(dx, dy, p[..., 0] - ax, p[..., 1] - ay) * self.inside
+            sideQ = _cross(dx, dy, q[..., 0] - ax, q[..., 1] - ay) * self.inside
+            (mx, my) = (q[..., 0] - p[..., 0], q[..., 1] - p[..., 1])
+            endA = _cross(mx, my, ax - p[..., 0], ay - p[..., 1])
+            endB = _cross(mx, my, ax + dx - p[..., 0], ay + dy - p[..., 1])
+            within = endA * endB <= 0
+
+            # a point on the line counts as outside, so a track stopping
+            # on it is only counted once it really moves in
+            entries[:, self.lineZones] = within & (sideP <= 0) & (sideQ > 0)
+            exits[:, self.lineZones] = within & (sideP > 0) & (sideQ <= 0)
+
+        if len(self.polygonZones) > 0:
+            wasInside = self._inside_polygons(previous)
+            isInside = self._inside_polygons(current)
+            entries[:, self.polygonZones] = ~wasInside & isInside
+            exits[:, self.polygonZones] = wasInside & ~isInside
+
+        return (entries, exits)
+
+    def record(self, zone, direction):
+        # add a counted crossing to the per-zone totals
+        self.counts[zone, 0 if direction == ENTRADA else 1] += 1
+
+    def stats(self):
+        return {name: {"entradas": int(counts[0]), "salidas": int(counts[1])}
+                for (name, counts) in zip(self.names, self.counts)}
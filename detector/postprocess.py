@@ -0,0 +1,68 @@
+# import the necessary packages
+import numpy as np
+
+# initialize the list of class labels MobileNet SSD was trained to detect
+CLASSES = ["fondo", "aeroplane", "bicycle", "bird", "boat",
+	"bottle", "bus", "car", "cat", "chair", "cow", "diningtable",
+	"dog", "horse", "motorbike", "person", "pottedplant", "sheep",
+	"sofa", "train", "tvmonitor"]
+PERSON_CLASS = CLASSES.index("person")
+
+def box_iou(boxesA, boxesB):
+	# compute the intersection over union between every box in `boxesA`
+	# (N, 4) and every box in `boxesB` (M, 4), returning an (N, M) matrix
+	boxesA = np.asarray(boxesA, dtype=np.float32).reshape(-1, 4)
+	boxesB = np.asarray(boxesB, dtype=np.float32).reshape(-1, 4)
+	xA = np.maximum(boxesA[:, None, 0], boxesB[None, :, 0])
+	yA = np.maximum(boxesA[:, None, 1], boxesB[None, :, 1])
+	xB = np.minimum(boxesA[:, None, 2], boxesB[None, :, 2])
+	yB = np.minimum(boxesA[:, None, 3], boxesB[None, :, 3])
+	inter = np.clip(xB - xA, 0, None) * np.clip(yB - yA, 0, None)
+
+	areaA = (boxesA[:, 2] - boxesA[:, 0]) * (boxesA[:, 3] - boxesA[:, 1])
+	areaB = (boxesB[:, 2] - boxesB[:, 0]) * (boxesB[:, 3] - boxesB[:, 1])
+	union = areaA[:, None] + areaB[None, :] - inter
+	return inter / np.maximum(union, 1e-6)
+
+def non_max_suppression(boxes, scores, threshold):
+	# greedy non-maximum suppression: keep the highest scoring box, drop
+	# every remaining box overlapping it by more than `threshold` and
+	# repeat; each step is a single vectorized IoU computation
+	order = np.argsort(scores)[::-1]
+	keep = []
+	while order.size > 0:
+		best = order[0]
+		keep.append(best)
+		if order.size == 1:
+			break
+		overlap = box_iou(boxes[best], boxes[order[1:]])[0]
+		order = order[1:][overlap <= threshold]
+	return np.array(keep, dtype=np.intp)
+
+def filter_detections(detections, W, H, confidence=0.4,
+	classID=PERSON_CLASS, nmsThreshold=0.45):
+	# turn the raw SSD output, shaped (1, 1, N, 7) with rows of
+	# [imageID, classID, score, startX, startY, endX, endY] in relative
+	# coordinates, into a compact (N, 4) int array of pixel boxes
+	rows = detections.reshape(-1, 7)
+
+	# filter on class and confidence in a single mask
+	mask = (rows[:, 2] > confidence) & (rows[:, 1] == classID)
+	if not mask.any():
+		return np.empty((0, 4), dtype=int)
+	rows = rows[mask]
+
+	# scale all boxes to frame coordinates at once and clip them to the
+	# frame, dropping any box that ends up empty
+	boxes = rows[:, 3:7] * np.array([W, H, W, H], dtype=np.float32)
+	np.clip(boxes[:, 0::2], 0, W - 1, out=boxes[:, 0::2])
+	np.clip(boxes[:, 1::2], 0, H - 1, out=boxes[:, 1::2])
+	valid = (boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])
+	boxes = boxes[valid]
+	scores = rows[valid, 2]
+
+	# suppress duplicated boxes around the same person
+	if nmsThreshold is not None and len(boxes) > 1:
+		boxes = boxes[non_max_suppression(boxes, scores, nmsThreshold)]
+
+	return boxes.astype(int)
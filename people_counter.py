@@ -1,11 +1,11 @@
 from tracker.centroidtracker import CentroidTracker
 from tracker.trackableobject import TrackableObject
+from detector.backends import create_detector, configure_opencv_threads
 from imutils.video import VideoStream
-from itertools import zip_longest
+from utils.journal import CountingJournal, ENTRADA, SALIDA
 from utils.mailer import Mailer
 from imutils.video import FPS
 from utils import thread
-import numpy as np
 import threading
 import argparse
 import datetime
@@ -15,7 +15,6 @@ import imutils
 import time
 import dlib
 import json
-import csv
 import cv2
 import subprocess
 import platform
@@ -56,29 +55,26 @@ def send_mail():
 	# function to send the email alerts
 	Mailer().send(config["Email_Receive"])
 
-def log_data(move_in, in_time, move_out, out_time):
-	# function to log the counting data
-	data = [move_in, in_time, move_out, out_time]
-	# transpose the data to align the columns properly
-	export_data = zip_longest(*data, fillvalue = '')
-
-	with open('utils/data/logs/counting_data.csv', 'w', newline = '') as myfile:
-		wr = csv.writer(myfile, quoting = csv.QUOTE_ALL)
-		if myfile.tell() == 0: # check if header rows are already existing
-			wr.writerow(("Entradas", "Hora Entrada", "Salidas", "Hora Salida"))
-			wr.writerows(export_data)
+def open_journal():
+	# function to open the append-only counting journal (one record per
+	# crossing, flushed in batches); rows carry a camera id, never the
+	# stream URL, which may embed credentials
+	return CountingJournal(camera = config.get("camera_id", "0"),
+		batch_size = config.get("log_batch_size", 32),
+		max_delay = config.get("log_flush_seconds", 2.0))
 
 def people_counter():
 	# main function for people_counter.py
 	args = parse_arguments()
-	# initialize the list of class labels MobileNet SSD was trained to detect
-	CLASSES = ["fondo", "aeroplane", "bicycle", "bird", "boat",
-		"bottle", "bus", "car", "cat", "chair", "cow", "diningtable",
-		"dog", "horse", "motorbike", "person", "pottedplant", "sheep",
-		"sofa", "train", "tvmonitor"]
 
-	# load our serialized model from disk
-	net = cv2.dnn.readNetFromCaffe(args["prototxt"], args["model"])
+	# load our serialized model from disk using the detector backend
+	# selected in the config (the command line paths take precedence)
+	settings = dict(config.get("detector", {}))
+	if args["prototxt"] is not None:
+		settings["prototxt"] = args["prototxt"]
+	settings["model"] = args["model"]
+	detector = create_detector(settings, confidence = args["confidence"])
+	configure_opencv_threads(settings.get("threads", 0))
 
 	# if a video path was not supplied, grab a reference to the ip camera
 	if not args.get("input", False):
@@ -102,9 +98,12 @@ def people_counter():
 	# instantiate our centroid tracker, then initialize a list to store
 	# each of our dlib correlation trackers, followed by a dictionary to
 	# map each unique object ID to a TrackableObject
-	ct = CentroidTracker(maxDisappeared=40, maxDistance=50)
-	trackers = []
+	# (a trackable object is dropped as soon as the centroid tracker
+	# deregisters its ID, so memory stays flat over long sessions)
 	trackableObjects = {}
+	ct = CentroidTracker(maxDisappeared=40, maxDistance=50,
+		onDeregister=lambda objectID: trackableObjects.pop(objectID, None))
+	trackers = []
 
 	# initialize the total number of frames processed thus far, along
 	# with the total number of objects that have moved either up or down
@@ -118,31 +117,29 @@ def people_counter():
 	out_time = []
 	in_time = []
 
+	# open the counting journal if logging is enabled
+	journal = open_journal() if config["Log"] else None
+
 	# start the frames per second throughput estimator
 	fps = FPS().start()
 
 	if config["Thread"]:
-		vs = thread.ThreadingClass(config["url"])
+		vs = thread.ThreadingClass(config["url"], fps=config.get("capture_fps"))
 
 	# loop over frames from the video stream
 	while True:
-		# grab the next frame and handle if we are reading from either
-		# VideoCapture or VideoStream
-		frame = vs.read()
-		frame = frame[1] if args.get("input", False) else frame
-
-		# if we are viewing a video and we did not grab a frame then we
-		# have reached the end of the video
-		if args["input"] is not None and frame is None:
+		# grab the next frame: VideoCapture and ThreadingClass both
+		# return a (ret, frame) tuple, the latter with the latest frame
+		# of its ring buffer; if we did not grab a frame then we have
+		# reached the end of the video (or lost the camera)
+		ret, frame = vs.read()
+		if not ret or frame is None:
+			print("⚠ No se pudo capturar el frame de la cámara.")
 			break
 
 		# resize the frame to have a maximum width of 500 pixels (the
 		# less data we have, the faster we can process it), then convert
 		# the frame from BGR to RGB for dlib
-		ret, frame = vs.read()
-		if not ret or frame is None:
-			print("⚠ No se pudo capturar el frame de la cámara.")
-			return
 		frame = imutils.resize(frame, width = 500)
 		rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
@@ -170,44 +167,23 @@ def people_counter():
 			status = "Detectando"
 			trackers = []
 
-			# convert the frame to a blob and pass the blob through the
-			# network and obtain the detections
-			blob = cv2.dnn.blobFromImage(frame, 0.007843, (W, H), 127.5)
-			net.setInput(blob)
-			detections = net.forward()
-
-			# loop over the detections
-			for i in np.arange(0, detections.shape[2]):
-				# extract the confidence (i.e., probability) associated
-				# with the prediction
-				confidence = detections[0, 0, i, 2]
-
-				# filter out weak detections by requiring a minimum
-				# confidence
-				if confidence > args["confidence"]:
-					# extract the index of the class label from the
-					# detections list
-					idx = int(detections[0, 0, i, 1])
-
-					# if the class label is not a person, ignore it
-					if CLASSES[idx] != "person":
-						continue
-
-					# compute the (x, y)-coordinates of the bounding box
-					# for the object
-					box = detections[0, 0, i, 3:7] * np.array([W, H, W, H])
-					(startX, startY, endX, endY) = box.astype("int")
-
-					# construct a dlib rectangle object from the bounding
-					# box coordinates and then start the dlib correlation
-					# tracker
-					tracker = dlib.correlation_tracker()
-					rect = dlib.rectangle(startX, startY, endX, endY)
-					tracker.start_track(rgb, rect)
-
-					# add the tracker to our list of trackers so we can
-					# utilize it during skip frames
-					trackers.append(tracker)
+			# pass the frame through the detector to obtain the boxes of
+			# the confident 'person' detections, scaled to frame
+			# coordinates and with duplicates suppressed
+			boxes = detector.detect(frame)
+
+			# loop over the detected boxes
+			for (startX, startY, endX, endY) in boxes:
+				# construct a dlib rectangle object from the bounding
+				# box coordinates and then start the dlib correlation
+				# tracker
+				tracker = dlib.correlation_tracker()
+				rect = dlib.rectangle(int(startX), int(startY), int(endX), int(endY))
+				tracker.start_track(rgb, rect)
+
+				# add the tracker to our list of trackers so we can
+				# utilize it during skip frames
+				trackers.append(tracker)
 
 		# otherwise, we should utilize our object *trackers* rather than
 		# object *detectors* to obtain a higher frame processing throughput
@@ -235,7 +211,7 @@ def people_counter():
 		# object crosses this line we will determine whether they were
 		# moving 'up' or 'down'
 		cv2.line(frame, (0, H // 2), (W, H // 2), (0, 0, 0), 3)
-		cv2.putText(frame, "Línea de conteo - Entrada", (10, H - ((i * 20) + 200)),
+		cv2.putText(frame, "Línea de conteo - Entrada", (10, H // 2 - 10),
 			cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
 
 		# use the centroid tracker to associate the (1) old object
@@ -250,18 +226,17 @@ def people_counter():
 
 			# if there is no existing trackable object, create one
 			if to is None:
-				to = TrackableObject(objectID, centroid)
+				to = TrackableObject(objectID, centroid,
+					maxHistory=config.get("track_history", 32))
 
 			# otherwise, there is a trackable object so we can utilize it
 			# to determine direction
 			else:
 				# the difference between the y-coordinate of the *current*
-				# centroid and the mean of *previous* centroids will tell
+				# centroid and the mean of the recent centroids will tell
 				# us in which direction the object is moving (negative for
 				# 'up' and positive for 'down')
-				y = [c[1] for c in to.centroids]
-				direction = centroid[1] - np.mean(y)
-				to.centroids.append(centroid)
+				direction = to.update(centroid)
 
 				# check to see if the object has been counted or not
 				if not to.counted:
@@ -273,6 +248,8 @@ def people_counter():
 						date_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
 						move_out.append(totalUp)
 						out_time.append(date_time)
+						if journal is not None:
+							journal.append(SALIDA, objectID)
 						to.counted = True
 
 					# if the direction is positive (indicating the object
@@ -283,6 +260,8 @@ def people_counter():
 						date_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
 						move_in.append(totalDown)
 						in_time.append(date_time)
+						if journal is not None:
+							journal.append(ENTRADA, objectID)
 						# if the people limit exceeds over threshold, send an email alert
 						if sum(total) >= config["Threshold"]:
 							cv2.putText(frame, "-ALERTA: Límite de personas superado-", (10, frame.shape[0] - 80),
@@ -328,9 +307,9 @@ def people_counter():
 			text = "{}: {}".format(k, v)
 			cv2.putText(frame, text, (265, H - ((i * 20) + 60)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
 
-		# initiate a simple log to save the counting data
-		if config["Log"]:
-			log_data(move_in, in_time, move_out, out_time)
+		# flush the journal if the pending crossings are old enough
+		if journal is not None:
+			journal.maybe_flush()
 
 		# check to see if we should write the frame to disk
 		if writer is not None:
@@ -370,6 +349,12 @@ def people_counter():
 	fps.stop()
 	logger.info("Tiempo transcurrido: {:.2f}".format(fps.elapsed()))
 	logger.info("FPS aproximado: {:.2f}".format(fps.fps()))
+	if config["Thread"]:
+		logger.info("Captura: {}".format(vs.stats()))
+
+	# write any pending crossings to disk
+	if journal is not None:
+		journal.close()
 
 	# release the camera device/resource (issue 15)
 	if config["Thread"]:
@@ -1,4 +1,3 @@
-import csv
 import smtplib
 import json
 from email.mime.text import MIMEText
@@ -6,9 +5,10 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
 from datetime import datetime
+from utils.journal import JOURNAL_PATH, count_events
 import os
 
-CSV_PATH = "utils/data/logs/counting_data.csv"
+CSV_PATH = JOURNAL_PATH
 CONFIG_PATH = "utils/schedule_config.json"
 EMAIL_CONFIG_PATH = "utils/config.json"
 
@@ -24,16 +24,8 @@ def generar_resumen():
     if not os.path.exists(CSV_PATH):
         return "<p>No hay datos disponibles para hoy.</p>"
 
-    entradas = 0
-    salidas = 0
-
-    with open(CSV_PATH, newline='') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if row.get("Entradas"):
-                entradas += int(row["Entradas"])
-            if row.get("Salidas"):
-                salidas += int(row["Salidas"])
+    # el diario acumula todos los días: el reporte solo resume los cruces de hoy
+    entradas, salidas = count_events(CSV_PATH, day=datetime.now().date())
 
     total = entradas - salidas
     fecha = datetime.now().strftime('%d/%m/%Y')
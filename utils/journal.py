@@ -0,0 +1,129 @@
+import csv
+import datetime
+import os
+import threading
+import time
+
+JOURNAL_PATH = "utils/data/logs/counting_events.csv"
+JOURNAL_HEADER = ("Hora", "Direccion", "ID", "Camara")
+
+ENTRADA = "entrada"
+SALIDA = "salida"
+
+
+class CountingJournal:
+    """ Append-only journal with one CSV record per line crossing.
+
+    Durability policy: records are buffered in memory and written in
+    batches. A batch is flushed (write + flush + fsync) as soon as
+    `batch_size` records are pending or the oldest pending record is
+    `max_delay` seconds old, and always on `close()`. A crash or power
+    loss can therefore lose at most one batch, i.e. `batch_size` records
+    or `max_delay` seconds of crossings, whichever comes first. Setting
+    `batch_size=1` gives a synchronous, fully durable journal.
+
+    The cost of logging is O(events): frames without crossings only pay
+    for `maybe_flush()`, which is a single clock comparison.
+    """
+
+    def __init__(self, path=JOURNAL_PATH, camera="0", batch_size=32,
+                 max_delay=2.0, fsync=True):
+        self.path = path
+        self.camera = str(camera)
+        self.batch_size = max(1, int(batch_size))
+        self.max_delay = float(max_delay)
+        self.fsync = fsync
+        self.pending = []
+        self.first_pending = None
+        self.lock = threading.Lock()
+        self.file = None
+        self.writer = None
+        self._open()
+
+    def _open(self):
+        # the journal is only ever appended to; the header is written
+        # once, when the file is created (or recreated after a report
+        # deleted it)
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.file = open(self.path, "a", newline="")
+        self.writer = csv.writer(self.file, quoting=csv.QUOTE_ALL)
+        if self.file.tell() == 0:
+            self.writer.writerow(JOURNAL_HEADER)
+            self._sync()
+
+    def _sync(self):
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def append(self, direction, object_id, timestamp=None):
+        # record a single crossing; `direction` is ENTRADA or SALIDA
+        if timestamp is None:
+            timestamp = datetime.datetime.now()
+        record = (timestamp.strftime("%Y-%m-%d %H:%M:%S"), direction,
+                  int(object_id), self.camera)
+        with self.lock:
+            if not self.pending:
+                self.first_pending = time.monotonic()
+            self.pending.append(record)
+            if len(self.pending) >= self.batch_size:
+                self._flush_locked()
+
+    def maybe_flush(self):
+        # cheap enough to call once per frame: only flushes when the
+        # oldest pending record has waited longer than `max_delay`
+        if self.first_pending is None:
+            return
+        if time.monotonic() - self.first_pending >= self.max_delay:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self.pending or self.file is None:
+            return
+        # the daily report removes the journal after sending it, start a
+        # new file instead of writing into the unlinked one
+        if not os.path.exists(self.path):
+            self.file.close()
+            self._open()
+        self.writer.writerows(self.pending)
+        self._sync()
+        self.pending = []
+        self.first_pending = None
+
+    def close(self):
+        with self.lock:
+            self._flush_locked()
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def count_events(path=JOURNAL_PATH, day=None):
+    # summarise a journal file as (entradas, salidas), only counting the
+    # records of `day` (a datetime.date) if given -- the journal is
+    # append-only, so it may hold the crossings of several days
+    entradas = 0
+    salidas = 0
+    prefix = day.strftime("%Y-%m-%d") if day is not None else ""
+    with open(path, newline="") as file:
+        for row in csv.DictReader(file):
+            if not (row.get("Hora") or "").startswith(prefix):
+                continue
+            direction = (row.get("Direccion") or "").strip()
+            if direction == ENTRADA:
+                entradas += 1
+            elif direction == SALIDA:
+                salidas += 1
+    return entradas, salidas
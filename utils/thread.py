@@ -1,31 +1,127 @@
-import cv2, threading, queue
+import cv2, threading, time
+from collections import deque
+import numpy as np
 
 class ThreadingClass:
   # initiate threading class
-  def __init__(self, name):
+  def __init__(self, name, slots=3, latencyWindow=256, fps=None):
     self.cap = cv2.VideoCapture(name)
-	  # define an empty queue and thread
-    self.q = queue.Queue()
-    t = threading.Thread(target=self._reader)
-    t.daemon = True
-    t.start()
+    # with a target processing rate (`fps`) every frame is grab()bed to
+    # keep the stream drained, but only up to `fps` frames per second are
+    # retrieve()d (decoded); a newer decoded frame replaces one the
+    # consumer has not taken yet, so it always gets the freshest frame
+    self.interval = 1.0 / fps if fps else 0.0
+    self.lastDecode = 0.0
+    # a small ring of frame buffers that the reader decodes into in
+    # place: one holds the latest published frame, one is owned by the
+    # consumer until its next read() and the others are free to write,
+    # so no array is allocated per frame once the ring is warm
+    self.slots = max(int(slots), 3)
+    self.frames = [None] * self.slots
+    self.timestamps = [0.0] * self.slots
+    self.latest = -1     # slot of the latest published frame
+    self.reading = -1    # slot currently held by the consumer
+    self.seq = 0         # sequence number of the latest published frame
+    self.lastSeq = 0     # sequence number of the last frame consumed
+    self.lastTimestamp = None
+    self.ended = False
+    self.stopped = False
+    self.cond = threading.Condition()
+
+    # capture and consume counters
+    self.captured = 0
+    self.grabbed = 0
+    self.consumed = 0
+    self.dropped = 0
+    self.latencies = deque(maxlen=latencyWindow)
+
+    self.t = threading.Thread(target=self._reader)
+    self.t.daemon = True
+    self.t.start()
 
   # read the frames as soon as they are available
   # this approach removes OpenCV's internal buffer and reduces the frame lag
   def _reader(self):
-    while True:
-      ret, frame = self.cap.read() # read the frames and ---
+    while not self.stopped:
+      with self.cond:
+        # pick a slot that is neither the latest frame nor the one the
+        # consumer is holding
+        slot = next(i for i in range(self.slots)
+          if i != self.latest and i != self.reading)
+      if self.interval:
+        ret = self.cap.grab() # drain the stream without decoding ---
+        timestamp = time.monotonic()
+        if not ret:
+          break
+        self.grabbed += 1
+        if timestamp - self.lastDecode < self.interval:
+          continue
+        self.lastDecode = timestamp
+        ret, frame = self.cap.retrieve(self.frames[slot]) # --- decode into the slot ---
+      else:
+        ret, frame = self.cap.read(self.frames[slot]) # decode into the slot ---
+        timestamp = time.monotonic()
+        self.grabbed += ret
       if not ret:
         break
-      if not self.q.empty():
-        try:
-          self.q.get_nowait()
-        except queue.Empty:
-          pass
-      self.q.put(frame) # --- store them in a queue (instead of the buffer)
+      with self.cond:
+        # --- and publish it (OpenCV returns a new array if the stream
+        # geometry changed, which then becomes the slot buffer)
+        self.frames[slot] = frame
+        self.timestamps[slot] = timestamp
+        self.latest = slot
+        self.seq += 1
+        self.captured += 1
+        self.cond.notify_all()
+    with self.cond:
+      self.ended = True
+      self.cond.notify_all()
+
+  def read_frame(self, timeout=None):
+    # wait for a frame newer than the last one consumed and return
+    # (ret, frame, seq, timestamp); `frame` is the ring buffer itself,
+    # valid until the next call, and frames published in between are
+    # counted as dropped (latest-frame semantics)
+    with self.cond:
+      if not self.cond.wait_for(lambda: self.seq > self.lastSeq or self.ended, timeout):
+        return (False, None, self.lastSeq, None)
+      if self.seq == self.lastSeq:
+        return (False, None, self.lastSeq, None)
+      self.dropped += self.seq - self.lastSeq - 1
+      self.reading = self.latest
+      self.lastSeq = self.seq
+      self.lastTimestamp = self.timestamps[self.reading]
+      frame = self.frames[self.reading]
+      self.consumed += 1
+    self.latencies.append(time.monotonic() - self.lastTimestamp)
+    return (True, frame, self.lastSeq, self.lastTimestamp)
+
+  def read(self, timeout=None):
+    # same (ret, frame) contract as cv2.VideoCapture.read()
+    (ret, frame, _, _) = self.read_frame(timeout)
+    return (ret, frame)
+
+  def isOpened(self):
+    return self.cap.isOpened()
 
-  def read(self):
-    return self.q.get() # fetch frames from the queue one by one
+  def stats(self):
+    # dropped frames and capture-to-consume latency (ms) of the stream
+    latencies = np.array(self.latencies) * 1000.0
+    return {
+      "grabbed": self.grabbed,
+      "captured": self.captured,
+      "decode_ratio": round(self.captured / self.grabbed, 3) if self.grabbed else None,
+      "consumed": self.consumed,
+      "dropped": self.dropped,
+      "latency_ms": {
+        "p50": round(float(np.percentile(latencies, 50)), 3),
+        "p95": round(float(np.percentile(latencies, 95)), 3),
+        "max": round(float(latencies.max()), 3),
+      } if len(latencies) > 0 else None,
+    }
 
   def release(self):
-    return self.cap.release() # release the hw resource
+    # stop the reader, then release the hw resource
+    self.stopped = True
+    self.t.join(timeout=1.0)
+    return self.cap.release()